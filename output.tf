@@ -8,6 +8,11 @@ locals {
       subnet_ids                 = aws_msk_serverless_cluster.this.vpc_config[0].subnet_ids
       tags                       = aws_msk_serverless_cluster.this.tags
     }
+    kafka_access = {
+      producer_topic_prefixes = var.producer_topic_prefixes
+      consumer_topic_prefixes = var.consumer_topic_prefixes
+      consumer_group_names    = var.consumer_group_names
+    }
     cloudwatch = {
       log_group_name = coalesce(
         try(aws_cloudwatch_log_group.msk_broker[0].name, null),
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""Benchmark the tfvars load/emit pipeline in load_terraform_config.py.
+
+Synthetic payloads stress one shape each (wide maps, deep nesting, long
+lists, heredocs, workflow directives, escape-heavy strings). Every payload is
+timed through the parser engines, the single-pass ``_parse_payload`` (tfvars
+plus ``workflow.*`` directives), ``_dump_tfvars``, the ``.tfvars.json``
+writer and the full ``main()``. The streaming parse is timed on the raw file
+and on each packed (base64 + gzip/zstd) secret encoding, to compare decode
+plus parse time with the raw path. Results are written to a JSON file so
+runs can be compared. A depth sweep times ``_dump_tfvars`` on increasingly nested
+objects to check that the emitter scales linearly with nesting depth.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import load_terraform_config as loader  # noqa: E402
+
+
+# Payload generators ---------------------------------------------------------
+def gen_wide_map(scale: int) -> str:
+    entries = "\n".join(f'  "Key{i:06d}" = "value-{i}"' for i in range(scale * 200))
+    return f'region = "eu-south-1"\n\ntags = {{\n{entries}\n}}\n'
+
+
+def gen_deep_nested(scale: int) -> str:
+    depth = min(40 + scale * 4, 400)
+    lines: list[str] = ["policy = {"]
+    for level in range(1, depth + 1):
+        pad = "  " * level
+        lines.append(f'{pad}name_{level} = "level-{level}"')
+        lines.append(f"{pad}child_{level} = {{")
+    for level in range(depth, 0, -1):
+        lines.append("  " * level + "}")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def gen_long_list(scale: int) -> str:
+    items = ",\n".join(f'  "subnet-{i:017x}"' for i in range(scale * 300))
+    numbers = ", ".join(str(i * 1.5 if i % 3 else i) for i in range(scale * 300))
+    return f"subnet_ids = [\n{items}\n]\n\nweights = [{numbers}]\n"
+
+
+def gen_heredoc(scale: int) -> str:
+    body = "\n".join(f"  line {i}: {{\"k\": \"v{i}\"}}" for i in range(scale * 400))
+    return f"document = <<EOF\n{body}\nEOF\n\nindented = <<-EOT\n{body}\n  EOT\n"
+
+
+def gen_directives(scale: int) -> str:
+    lines = ['region = "eu-south-1"']
+    for i in range(scale * 100):
+        lines.append(f'# workflow.custom.entry_{i} = "value-{i}"')
+        lines.append(f"// workflow.flags.flag_{i} = {'true' if i % 2 else 'false'}")
+        lines.append(f'setting_{i} = "v{i}" # trailing comment {i}')
+    lines.append('# workflow.backend.bucket = "terraform-state-bucket"')
+    lines.append('# workflow.backend.key    = "cluster/prod/terraform.tfstate"')
+    return "\n".join(lines) + "\n"
+
+
+def gen_escapes(scale: int) -> str:
+    lines = []
+    for i in range(scale * 150):
+        lines.append(
+            f'escaped_{i} = "tab\\there \\"quoted\\" path\\\\to\\\\{i} \\u00e9\\n line\\/{i}"'
+        )
+    return "\n".join(lines) + "\n"
+
+
+GENERATORS: dict[str, Callable[[int], str]] = {
+    "wide_map": gen_wide_map,
+    "deep_nested": gen_deep_nested,
+    "long_list": gen_long_list,
+    "heredoc": gen_heredoc,
+    "directives": gen_directives,
+    "escapes": gen_escapes,
+}
+
+
+# Measurement helpers --------------------------------------------------------
+def _time(func: Callable[[], Any], repeat: int) -> list[float]:
+    samples: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _peak_memory(func: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def _measure(func: Callable[[], Any], size: int, repeat: int) -> dict[str, Any]:
+    samples = _time(func, repeat)
+    best = min(samples)
+    return {
+        "best_s": best,
+        "mean_s": statistics.fmean(samples),
+        "throughput_mb_s": (size / 1_000_000) / best if best > 0 else None,
+        "peak_memory_bytes": _peak_memory(func),
+    }
+
+
+@contextmanager
+def _pipeline_env(payload: str) -> Iterator[Path]:
+    keys = (
+        "TERRAFORM_TFVARS",
+        "TERRAFORM_TFVARS_JSON",
+        "TERRAFORM_TFVARS_PACKED",
+        "GITHUB_ENV",
+        "TF_VARS_FILE",
+        "TF_BACKEND_FILE",
+        "TFVARS_CACHE",
+    )
+    saved = {key: os.environ.get(key) for key in keys}
+    with tempfile.TemporaryDirectory(prefix="tfvars-bench-") as workdir:
+        root = Path(workdir)
+        os.environ.pop("TERRAFORM_TFVARS_JSON", None)
+        os.environ.pop("TERRAFORM_TFVARS_PACKED", None)
+        os.environ["TERRAFORM_TFVARS"] = payload
+        os.environ["GITHUB_ENV"] = str(root / "github_env")
+        os.environ["TF_VARS_FILE"] = str(root / "ci.auto.tfvars")
+        os.environ["TF_BACKEND_FILE"] = str(root / "backend.auto.tfbackend")
+        # Repeats must run the whole pipeline, not replay ~/.cache/load_terraform_config.
+        os.environ["TFVARS_CACHE"] = "off"
+        try:
+            yield root
+        finally:
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+
+def _stream_parse(source: str | loader.PackedPayload) -> None:
+    parser_cls = loader.PARSER_ENGINES[loader.DEFAULT_PARSER_ENGINE]
+    with loader._open_input_reader(source) as reader:
+        for _ in parser_cls("", reader=reader).iter_assignments(directives=True):
+            pass
+
+
+def bench_packed(payload: str, size: int, repeat: int) -> tuple[dict[str, int], dict[str, Any]]:
+    """Time the streaming parse of the raw file and of every packed encoding."""
+
+    encodings = loader._pack_encodings(payload.encode("utf-8"))
+    sizes = {name: len(encoded) for name, encoded in encodings.items()}
+    phases: dict[str, Any] = {}
+    with tempfile.TemporaryDirectory(prefix="tfvars-bench-") as workdir:
+        raw_file = Path(workdir) / "payload.tfvars"
+        raw_file.write_text(payload, encoding="utf-8")
+        phases["stream_parse[raw]"] = _measure(lambda: _stream_parse(str(raw_file)), size, repeat)
+    for name, encoded in encodings.items():
+        if name == "raw":
+            continue
+        packed = loader.PackedPayload(encoded.split(":", 1)[1], name, name)
+        phases[f"stream_parse[{name}]"] = _measure(lambda packed=packed: _stream_parse(packed), size, repeat)
+    return sizes, phases
+
+
+def _run_main(root: Path) -> None:
+    # Start each run from an empty GITHUB_ENV so appends do not accumulate.
+    (root / "github_env").write_text("", encoding="utf-8")
+    # The synthetic payloads do not match variables.tf.
+    loader.main(["--no-validate", "--no-cache"])
+
+
+def bench_payload(name: str, payload: str, repeat: int) -> dict[str, Any]:
+    size = len(payload.encode("utf-8"))
+    result: dict[str, Any] = {"payload": name, "bytes": size, "phases": {}}
+    phases = result["phases"]
+    for engine, parser_cls in loader.PARSER_ENGINES.items():
+        phases[f"parse_assignments[{engine}]"] = _measure(
+            lambda cls=parser_cls: cls(payload).parse_assignments(), size, repeat
+        )
+    tfvars = loader.PARSER_ENGINES[loader.DEFAULT_PARSER_ENGINE](payload).parse_assignments()
+    phases["parse_payload"] = _measure(lambda: loader._parse_payload(payload), size, repeat)
+    phases["dump_tfvars"] = _measure(lambda: loader._dump_tfvars(tfvars), size, repeat)
+    phases["dump_tfvars_json"] = _measure(
+        lambda: loader._write_tfvars_json(tfvars, io.StringIO()), size, repeat
+    )
+    result["encoded_bytes"], packed_phases = bench_packed(payload, size, repeat)
+    phases.update(packed_phases)
+    with _pipeline_env(payload) as root:
+        phases["main"] = _measure(lambda: _run_main(root), size, repeat)
+    return result
+
+
+DEPTH_SWEEP = (25, 50, 100, 200, 400)
+
+
+def _nested_value(depth: int) -> dict[str, Any]:
+    value: dict[str, Any] = {"leaf": ["a", "b", 1, 2.5, True, None]}
+    for level in range(depth, 0, -1):
+        value = {f"name_{level}": f"level-{level}", "tags": {"Env": "prod"}, f"child_{level}": value}
+    return value
+
+
+def bench_depth_scaling(repeat: int) -> list[dict[str, Any]]:
+    rows: list[dict[str, Any]] = []
+    for depth in DEPTH_SWEEP:
+        tfvars = {"policy": _nested_value(depth)}
+        best = min(_time(lambda: loader._dump_tfvars(tfvars), repeat))
+        rows.append({"depth": depth, "dump_s": best, "per_level_us": best / depth * 1_000_000})
+    return rows
+
+
+def _print_table(results: list[dict[str, Any]]) -> None:
+    print(f"{'payload':<14} {'phase':<28} {'bytes':>10} {'best ms':>10} {'MB/s':>9} {'peak KiB':>10}")
+    for entry in results:
+        for phase, stats in entry["phases"].items():
+            throughput = stats["throughput_mb_s"]
+            print(
+                f"{entry['payload']:<14} {phase:<28} {entry['bytes']:>10} "
+                f"{stats['best_s'] * 1000:>10.2f} "
+                f"{throughput if throughput is not None else float('nan'):>9.2f} "
+                f"{stats['peak_memory_bytes'] / 1024:>10.1f}"
+            )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=10, help="Payload size multiplier (default: 10)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per phase (default: 5)")
+    parser.add_argument(
+        "--payload",
+        action="append",
+        choices=sorted(GENERATORS),
+        help="Payload generator to run (repeatable; default: all)",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=Path("bench_results.json"),
+        help="Where to write the JSON results (default: bench_results.json)",
+    )
+    args = parser.parse_args(argv)
+
+    names = args.payload or list(GENERATORS)
+    results = [bench_payload(name, GENERATORS[name](args.scale), args.repeat) for name in names]
+    depth_scaling = bench_depth_scaling(args.repeat)
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": args.scale,
+        "repeat": args.repeat,
+        "results": results,
+        "depth_scaling": depth_scaling,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    _print_table(results)
+    print(f"\n{'depth':>6} {'dump ms':>10} {'us/level':>10}")
+    for row in depth_scaling:
+        print(f"{row['depth']:>6} {row['dump_s'] * 1000:>10.3f} {row['per_level_us']:>10.2f}")
+    print(f"\nWrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
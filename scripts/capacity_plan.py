@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""Check expected Kafka traffic against the MSK Serverless quotas.
+
+The plan takes the expected traffic for each ``producer_topic_prefixes``
+entry: topics under the prefix, messages per second per topic, average
+message size and, optionally, partitions per topic. It also takes the
+fan-out of each ``consumer_group_names`` entry, which is how many times the
+group reads every message. From these it computes the partitions each topic
+needs and the cluster's ingress, egress and partition headroom. It flags
+anything that MSK Serverless would throttle, or that runs above the target
+utilization.
+
+The inputs live in the tfvars payload as ``workflow.capacity`` directives,
+so the loader prints the report while it parses the payload::
+
+    # workflow.capacity.topics  = { "exchg." = { topics = 40, messages_per_second = 2000, message_bytes = 600 } }
+    # workflow.capacity.fan_out = { crypto-readers = 2 }
+
+Run this script directly to plan from a tfvars file or a JSON spec of the
+same shape::
+
+    python3 scripts/capacity_plan.py --tfvars terraform.tfvars
+    python3 scripts/capacity_plan.py --spec capacity.json --format json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+# MSK Serverless quotas, in bytes per second. MB is read as 10**6 bytes,
+# which is the conservative reading of the documented MBps figures.
+MB = 1_000_000
+PARTITION_INGRESS_QUOTA = 5 * MB
+PARTITION_EGRESS_QUOTA = 10 * MB
+CLUSTER_INGRESS_QUOTA = 200 * MB
+CLUSTER_EGRESS_QUOTA = 400 * MB
+CLUSTER_PARTITION_QUOTA = 2400
+MAX_MESSAGE_BYTES = 8 * 1024 * 1024
+
+DEFAULT_TARGET_UTILIZATION = 0.8
+# variables.tf defaults, used when the payload leaves the variables unset.
+DEFAULT_PRODUCER_PREFIXES = ("exchg.",)
+DEFAULT_CONSUMER_GROUPS = ("crypto-readers",)
+
+
+class CapacitySpecError(ValueError):
+    """Raised when the capacity inputs are missing or malformed."""
+
+
+@dataclass
+class PrefixLoad:
+    """Expected traffic for the topics under one producer topic prefix."""
+
+    prefix: str
+    topics: int
+    messages_per_second: float
+    message_bytes: float
+    partitions: int | None
+    reads: int = 0
+
+    @property
+    def topic_ingress(self) -> float:
+        return self.messages_per_second * self.message_bytes
+
+    @property
+    def topic_egress(self) -> float:
+        return self.topic_ingress * self.reads
+
+    def required_partitions(self, target: float) -> int:
+        """Partitions per topic that keep both per-partition quotas under ``target``."""
+
+        needed = max(
+            self.topic_ingress / (PARTITION_INGRESS_QUOTA * target),
+            self.topic_egress / (PARTITION_EGRESS_QUOTA * target),
+        )
+        return max(1, math.ceil(needed))
+
+
+@dataclass
+class Finding:
+    """One quota check that failed: ``throttled`` over the quota, ``tight`` over the target."""
+
+    level: str
+    message: str
+
+
+@dataclass
+class CapacityPlan:
+    loads: list[PrefixLoad]
+    target: float
+    findings: list[Finding] = field(default_factory=list)
+    notes: list[str] = field(default_factory=list)
+
+    @property
+    def throttled(self) -> bool:
+        return any(finding.level == "throttled" for finding in self.findings)
+
+    def partitions(self, load: PrefixLoad) -> int:
+        return load.partitions or load.required_partitions(self.target)
+
+    @property
+    def ingress(self) -> float:
+        return sum(load.topic_ingress * load.topics for load in self.loads)
+
+    @property
+    def egress(self) -> float:
+        return sum(load.topic_egress * load.topics for load in self.loads)
+
+    @property
+    def partition_count(self) -> int:
+        return sum(self.partitions(load) * load.topics for load in self.loads)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "target_utilization": self.target,
+            "prefixes": [
+                {
+                    "prefix": load.prefix,
+                    "topics": load.topics,
+                    "messages_per_second": load.messages_per_second,
+                    "message_bytes": load.message_bytes,
+                    "reads": load.reads,
+                    "topic_ingress_bytes_per_s": load.topic_ingress,
+                    "topic_egress_bytes_per_s": load.topic_egress,
+                    "partitions": load.partitions,
+                    "recommended_partitions": load.required_partitions(self.target),
+                }
+                for load in self.loads
+            ],
+            "cluster": {
+                "ingress_bytes_per_s": self.ingress,
+                "ingress_quota": CLUSTER_INGRESS_QUOTA,
+                "egress_bytes_per_s": self.egress,
+                "egress_quota": CLUSTER_EGRESS_QUOTA,
+                "partitions": self.partition_count,
+                "partition_quota": CLUSTER_PARTITION_QUOTA,
+            },
+            "findings": [{"level": finding.level, "message": finding.message} for finding in self.findings],
+            "notes": self.notes,
+        }
+
+
+def _number(value: Any, where: str, *, integer: bool = False, minimum: float = 0) -> Any:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise CapacitySpecError(f"{where} must be a number, got {value!r}")
+    if not math.isfinite(value):
+        raise CapacitySpecError(f"{where} must be a finite number, got {value!r}")
+    if integer and value != int(value):
+        raise CapacitySpecError(f"{where} must be a whole number, got {value!r}")
+    if value < minimum:
+        raise CapacitySpecError(f"{where} must be at least {minimum}, got {value!r}")
+    return int(value) if integer else value
+
+
+def _fan_out_entry(group: str, entry: Any) -> tuple[int, list[str] | None]:
+    """Return the reads per message and the prefixes (None: all) of a fan_out entry."""
+
+    where = f"fan_out[{json.dumps(group)}]"
+    if not isinstance(entry, dict):
+        return _number(entry, where, integer=True), None
+    reads = _number(entry.get("reads", 1), f"{where}.reads", integer=True)
+    read_prefixes = entry.get("prefixes")
+    if read_prefixes is not None and (
+        not isinstance(read_prefixes, list) or not all(isinstance(item, str) for item in read_prefixes)
+    ):
+        # A bare string would match by substring: "exchg." in "exchg.orders.".
+        raise CapacitySpecError(f"{where}.prefixes must be a list of strings, got {read_prefixes!r}")
+    return reads, read_prefixes
+
+
+def _scopes(tfvars: dict[str, Any]) -> tuple[list[str], list[str]]:
+    prefixes = tfvars.get("producer_topic_prefixes") or list(DEFAULT_PRODUCER_PREFIXES)
+    groups = tfvars.get("consumer_group_names") or list(DEFAULT_CONSUMER_GROUPS)
+    return [str(prefix) for prefix in prefixes], [str(group) for group in groups]
+
+
+def build_plan(spec: Any, tfvars: dict[str, Any]) -> CapacityPlan:
+    """Validate ``spec`` (the ``workflow.capacity`` object) and check it against the quotas.
+
+    ``tfvars`` supplies ``producer_topic_prefixes`` and ``consumer_group_names``.
+    """
+
+    if not isinstance(spec, dict):
+        raise CapacitySpecError("expected an object with 'topics' and optional 'fan_out'")
+    prefixes, groups = _scopes(tfvars)
+    target = _number(spec.get("target_utilization", DEFAULT_TARGET_UTILIZATION), "target_utilization")
+    if not 0 < target <= 1:
+        raise CapacitySpecError(f"target_utilization must be in (0, 1], got {target!r}")
+    plan = CapacityPlan([], target)
+
+    topics = spec.get("topics")
+    if not isinstance(topics, dict) or not topics:
+        raise CapacitySpecError("'topics' must map each producer topic prefix to its expected traffic")
+    for prefix, entry in topics.items():
+        where = f"topics[{json.dumps(prefix)}]"
+        if not isinstance(entry, dict):
+            raise CapacitySpecError(f"{where} must be an object")
+        if "messages_per_second" not in entry or "message_bytes" not in entry:
+            raise CapacitySpecError(f"{where} needs messages_per_second and message_bytes")
+        partitions = entry.get("partitions")
+        plan.loads.append(
+            PrefixLoad(
+                prefix=prefix,
+                topics=_number(entry.get("topics", 1), f"{where}.topics", integer=True, minimum=1),
+                messages_per_second=_number(entry["messages_per_second"], f"{where}.messages_per_second"),
+                message_bytes=_number(entry["message_bytes"], f"{where}.message_bytes", minimum=1),
+                partitions=None
+                if partitions is None
+                else _number(partitions, f"{where}.partitions", integer=True, minimum=1),
+            )
+        )
+        if prefix not in prefixes:
+            plan.findings.append(
+                Finding("warning", f"Prefix '{prefix}' is not in producer_topic_prefixes; the producer policy denies it.")
+            )
+    for prefix in prefixes:
+        if prefix not in topics:
+            plan.notes.append(f"No traffic estimate for producer prefix '{prefix}'.")
+
+    # Every configured group reads each message once unless fan_out says otherwise.
+    fan_out = spec.get("fan_out") or {}
+    if not isinstance(fan_out, dict):
+        raise CapacitySpecError("'fan_out' must map consumer group names to reads per message")
+    # Check every entry, including groups the consumer policy does not know.
+    entries = {group: _fan_out_entry(group, entry) for group, entry in fan_out.items()}
+    for group in groups:
+        reads, read_prefixes = entries.get(group, (1, None))
+        for load in plan.loads:
+            if read_prefixes is None or load.prefix in read_prefixes:
+                load.reads += reads
+    for group in fan_out:
+        if group not in groups:
+            plan.findings.append(
+                Finding("warning", f"Group '{group}' is not in consumer_group_names; the consumer policy denies it.")
+            )
+
+    _check(plan)
+    return plan
+
+
+def _grade(plan: CapacityPlan, used: float, quota: float, what: str) -> None:
+    utilization = used / quota
+    if utilization > 1:
+        plan.findings.append(Finding("throttled", f"{what}: {utilization:.0%} of the quota."))
+    elif utilization > plan.target:
+        plan.findings.append(
+            Finding("tight", f"{what}: {utilization:.0%} of the quota, above the {plan.target:.0%} target.")
+        )
+
+
+def _check(plan: CapacityPlan) -> None:
+    for load in plan.loads:
+        partitions = plan.partitions(load)
+        if load.message_bytes > MAX_MESSAGE_BYTES:
+            plan.findings.append(
+                Finding("throttled", f"'{load.prefix}' messages of {load.message_bytes:.0f} bytes exceed the 8 MiB limit.")
+            )
+        _grade(plan, load.topic_ingress / partitions, PARTITION_INGRESS_QUOTA, f"'{load.prefix}' partition ingress")
+        _grade(plan, load.topic_egress / partitions, PARTITION_EGRESS_QUOTA, f"'{load.prefix}' partition egress")
+        recommended = load.required_partitions(plan.target)
+        if load.partitions is not None and load.partitions < recommended:
+            plan.notes.append(
+                f"'{load.prefix}' topics need {recommended} partitions to stay under the target; planned {load.partitions}."
+            )
+    _grade(plan, plan.ingress, CLUSTER_INGRESS_QUOTA, "Cluster ingress")
+    _grade(plan, plan.egress, CLUSTER_EGRESS_QUOTA, "Cluster egress")
+    _grade(plan, plan.partition_count, CLUSTER_PARTITION_QUOTA, "Cluster partitions")
+
+
+def format_plan(plan: CapacityPlan) -> list[str]:
+    """Return the report table for ``plan`` (findings are reported separately)."""
+
+    lines = [
+        f"MSK Serverless capacity plan (target utilization {plan.target:.0%})",
+        f"{'prefix':<16} {'topics':>6} {'msg/s':>9} {'bytes':>8} {'reads':>5} "
+        f"{'in MB/s':>9} {'out MB/s':>9} {'partitions':>10} {'needed':>6}",
+    ]
+    for load in plan.loads:
+        planned = str(load.partitions) if load.partitions is not None else "-"
+        lines.append(
+            f"{load.prefix:<16} {load.topics:>6} {load.messages_per_second:>9.0f} {load.message_bytes:>8.0f} "
+            f"{load.reads:>5} {load.topic_ingress * load.topics / MB:>9.2f} {load.topic_egress * load.topics / MB:>9.2f} "
+            f"{planned:>10} {load.required_partitions(plan.target):>6}"
+        )
+    for name, used, quota, unit, digits in (
+        ("ingress", plan.ingress / MB, CLUSTER_INGRESS_QUOTA / MB, " MB/s", 2),
+        ("egress", plan.egress / MB, CLUSTER_EGRESS_QUOTA / MB, " MB/s", 2),
+        ("partitions", plan.partition_count, CLUSTER_PARTITION_QUOTA, "", 0),
+    ):
+        lines.append(
+            f"cluster {name:<10} {used:>10.{digits}f} of {quota:g}{unit} "
+            f"({used / quota:.0%}, headroom {quota - used:.{digits}f}{unit})"
+        )
+    lines.extend(plan.notes)
+    return lines
+
+
+def print_plan(plan: CapacityPlan) -> None:
+    """Print the report to stdout and each finding as a workflow warning."""
+
+    print("\n".join(format_plan(plan)))
+    for finding in plan.findings:
+        level = "" if finding.level == "warning" else f" ({finding.level})"
+        print(f"::warning::Capacity{level}: {finding.message}", file=sys.stderr)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument(
+        "--tfvars",
+        type=Path,
+        help="tfvars payload with workflow.capacity directives (default: $TF_VAR_FILE or terraform.tfvars)",
+    )
+    source.add_argument("--spec", type=Path, help="JSON file with the workflow.capacity object")
+    parser.add_argument("--format", choices=("text", "json"), default="text", help="Report format (default: text)")
+    parser.add_argument("--strict", action="store_true", help="Exit 1 when anything would be throttled")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    # Imported here: the loader imports this module to print its report.
+    import load_terraform_config as loader
+
+    try:
+        if args.spec is not None:
+            spec, tfvars = json.loads(args.spec.read_text(encoding="utf-8")), {}
+        else:
+            path = args.tfvars or Path(os.environ.get("TF_VAR_FILE") or "terraform.tfvars")
+            tfvars, metadata = loader._parse_payload(path.read_text(encoding="utf-8"))
+            if "capacity" not in metadata:
+                loader._error(f"{path} has no workflow.capacity directives.")
+                return 1
+            spec = metadata["capacity"]
+        plan = build_plan(spec, tfvars)
+    except (OSError, ValueError) as exc:
+        loader._error(f"Unable to build the capacity plan: {exc}")
+        return 1
+    if args.format == "json":
+        print(json.dumps(plan.as_dict(), indent=2))
+    else:
+        print_plan(plan)
+    if plan.throttled and (args.strict or spec.get("strict") is True):
+        loader._error("The planned traffic exceeds MSK Serverless quotas.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Check that the loader's built-in tfvars formatter matches terraform fmt.
+
+The loader skips the ``terraform fmt`` subprocess because its emitter already
+produces canonical output. This check renders representative payloads with
+``_dump_tfvars`` and fails when ``terraform fmt -check`` would change any of
+them.
+"""
+
+from __future__ import annotations
+
+import argparse
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import bench_load_terraform_config as bench  # noqa: E402
+import load_terraform_config as loader  # noqa: E402
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+MIXED_PAYLOAD = """
+region = "eu-south-1"
+vpc_id = "vpc-0abc123def4567890"
+subnet_ids = ["subnet-0aaabbbbcccc11111", "subnet-0ddddeeeeffff22222"]
+empty_list = []
+empty_map = {}
+log_retention_days = 3
+log_kms_key_arn = null
+tags = {
+  Project = "Data"
+  "cost-center" = "1234"
+  nested = { a = 1, bbb = [true, false] }
+  Env = "prod"
+  after_nested = 2.5
+}
+policies = [
+  { name = "a", actions = ["kafka-cluster:Connect"] },
+  { name = "bb", actions = [] },
+]
+document = <<-EOT
+  line one
+  line "two"
+  EOT
+"""
+
+
+def _payloads(scale: int) -> dict[str, str]:
+    payloads = {name: generator(scale) for name, generator in bench.GENERATORS.items()}
+    payloads["mixed"] = MIXED_PAYLOAD
+    example = REPO_ROOT / "terraform.tfvars.example"
+    if example.is_file():
+        payloads["example"] = example.read_text(encoding="utf-8")
+    return payloads
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1, help="Generated payload size multiplier (default: 1)")
+    args = parser.parse_args(argv)
+
+    terraform = shutil.which("terraform")
+    if not terraform:
+        print("::error::terraform CLI is required to check the tfvars formatter.", file=sys.stderr)
+        return 1
+
+    failures = 0
+    with tempfile.TemporaryDirectory(prefix="tfvars-fmt-") as workdir:
+        for name, payload in _payloads(args.scale).items():
+            path = Path(workdir) / f"{name}.tfvars"
+            path.write_text(loader._dump_tfvars(loader.TfvarsParser(payload).parse_assignments()), encoding="utf-8")
+            result = subprocess.run(
+                [terraform, "fmt", "-check", "-diff", str(path)],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
+            if result.returncode == 0:
+                print(f"ok       {name}")
+                continue
+            failures += 1
+            print(f"MISMATCH {name}")
+            print((result.stdout + result.stderr).rstrip())
+    if failures:
+        print(f"::error::{failures} payload(s) differ from terraform fmt output.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""Detect whether the Terraform inputs changed since the last successful apply.
+
+The fingerprint covers the generated var-file, the ``.tf`` files, the
+provider lock file, naming.yml and the environment the ``# workflow.*``
+directives export (``USE_EXISTING`` and friends), which the var-file no
+longer contains. The var-file is parsed with the loader's
+``TfvarsParser`` and normalized, so formatting, comments and key order do
+not count as changes. Only hashes are stored. The semantic diff names the
+variables (and nested map keys) that changed, never their values, because
+the payload holds secrets.
+
+``check`` compares against the stored fingerprint and exports
+``NO_CHANGES=true|false`` to ``GITHUB_ENV`` and ``GITHUB_OUTPUT``.
+``record`` stores the current fingerprint after a successful apply.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import load_terraform_config as loader  # noqa: E402
+
+FINGERPRINT_VERSION = 2
+DEFAULT_LOCAL_STORE = ".terraform/change-fingerprint.json"
+# Files outside *.tf that change what Terraform does.
+_EXTRA_INPUTS = (".terraform.lock.hcl", "naming.yml")
+# Var files Terraform loads without -var-file; hashed as files unless parsed.
+_AUTO_VAR_FILES = ("terraform.tfvars", "terraform.tfvars.json", "*.auto.tfvars", "*.auto.tfvars.json")
+# Environment that selects which state the fingerprint belongs to.
+_BACKEND_ENV = ("TF_BACKEND_BUCKET", "TF_BACKEND_KEY", "TF_BACKEND_REGION")
+# Environment exported by the loader or the workflow that changes the
+# arguments Terraform runs with (use_existing selects -var=existing_* args).
+_WORKFLOW_ENV = ("USE_EXISTING", "VPC_ID", "TF_CLI_ARGS", "TF_CLI_ARGS_plan", "TF_CLI_ARGS_apply")
+
+
+class ChangeDetectionError(Exception):
+    """Raised when the fingerprint cannot be computed or stored."""
+
+
+def _error(message: str) -> None:
+    print(f"::error::{message}", file=sys.stderr)
+
+
+# Fingerprint ------------------------------------------------------------------
+def _digest(value: Any) -> str:
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _flatten(prefix: str, value: Any, out: dict[str, str]) -> None:
+    """Hash ``value`` per leaf so the diff can name nested map keys."""
+
+    if isinstance(value, dict) and value:
+        for key, item in value.items():
+            _flatten(f"{prefix}[{json.dumps(key)}]", item, out)
+        return
+    out[prefix] = _digest(value)
+
+
+def _read_tfvars(path: Path) -> dict[str, Any]:
+    text = path.read_text(encoding="utf-8")
+    try:
+        if loader._is_json_payload(text):
+            return json.loads(text)
+        return loader.TfvarsParser(text).parse_assignments()
+    except (ValueError, loader.TfvarsParseError) as exc:
+        raise ChangeDetectionError(f"Unable to parse {path}: {exc}") from exc
+
+
+def input_fingerprint(workdir: Path, tf_vars_file: Path) -> dict[str, Any]:
+    """Return per-variable and per-file hashes of the Terraform inputs."""
+
+    variables: dict[str, str] = {}
+    if tf_vars_file.is_file():
+        for key, value in _read_tfvars(tf_vars_file).items():
+            _flatten(key, value, variables)
+    inputs = sorted(workdir.glob("*.tf")) + sorted(workdir.glob("*.tf.json"))
+    inputs += [workdir / name for name in _EXTRA_INPUTS if (workdir / name).is_file()]
+    parsed = tf_vars_file.resolve()
+    inputs += [
+        path
+        for pattern in _AUTO_VAR_FILES
+        for path in sorted(workdir.glob(pattern))
+        if path.resolve() != parsed
+    ]
+    files = {
+        path.relative_to(workdir).as_posix(): hashlib.sha256(path.read_bytes()).hexdigest()
+        for path in inputs
+    }
+    return {
+        "version": FINGERPRINT_VERSION,
+        "backend": {name: os.environ.get(name, "") for name in _BACKEND_ENV},
+        # Hashes only: TF_CLI_ARGS can carry -var values.
+        "workflow": {name: _digest(os.environ.get(name, "")) for name in _WORKFLOW_ENV},
+        "variables": variables,
+        "files": files,
+    }
+
+
+def _diff(previous: dict[str, Any], current: dict[str, Any]) -> list[str]:
+    lines: list[str] = []
+    if previous.get("version") != current["version"]:
+        return ["~ fingerprint format changed"]
+    if previous.get("backend") != current["backend"]:
+        lines.append("~ backend (TF_BACKEND_BUCKET/KEY/REGION)")
+    before_env: dict[str, str] = previous.get("workflow") or {}
+    for name in sorted(before_env.keys() | current["workflow"].keys()):
+        if before_env.get(name) != current["workflow"].get(name):
+            lines.append(f"~ env {name}")
+    for section, label in (("variables", "var"), ("files", "file")):
+        before: dict[str, str] = previous.get(section) or {}
+        after: dict[str, str] = current[section]
+        for name in sorted(before.keys() | after.keys()):
+            if name not in before:
+                lines.append(f"+ {label} {name}")
+            elif name not in after:
+                lines.append(f"- {label} {name}")
+            elif before[name] != after[name]:
+                lines.append(f"~ {label} {name}")
+    return lines
+
+
+# Store --------------------------------------------------------------------------
+def _default_store() -> str:
+    configured = os.environ.get("CHANGE_FINGERPRINT_URI")
+    if configured:
+        return configured
+    bucket = os.environ.get("TF_BACKEND_BUCKET")
+    key = os.environ.get("TF_BACKEND_KEY")
+    if bucket and key:
+        # Next to the state it describes, so it shares the state's lifecycle.
+        return f"s3://{bucket}/{key}.fingerprint.json"
+    return DEFAULT_LOCAL_STORE
+
+
+def _load_stored(store: str) -> dict[str, Any] | None:
+    if not store.startswith("s3://"):
+        try:
+            return json.loads(Path(store).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            print(f"::warning::Ignoring unreadable fingerprint {store}", file=sys.stderr)
+            return None
+    result = subprocess.run(
+        ["aws", "s3", "cp", "--only-show-errors", store, "-"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if result.returncode != 0:
+        # A missing object (first run) and an access error both mean "unknown".
+        print(f"No stored fingerprint at {store}: {result.stderr.strip()}", file=sys.stderr)
+        return None
+    try:
+        return json.loads(result.stdout)
+    except ValueError:
+        print(f"::warning::Ignoring unreadable fingerprint {store}", file=sys.stderr)
+        return None
+
+
+def _store(store: str, fingerprint: dict[str, Any]) -> None:
+    payload = json.dumps(fingerprint, indent=2, sort_keys=True) + "\n"
+    if not store.startswith("s3://"):
+        path = Path(store)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(payload, encoding="utf-8")
+        return
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as handle:
+        handle.write(payload)
+    try:
+        result = subprocess.run(
+            ["aws", "s3", "cp", "--only-show-errors", handle.name, store],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+    finally:
+        os.unlink(handle.name)
+    if result.returncode != 0:
+        raise ChangeDetectionError(f"Unable to upload the fingerprint to {store}: {result.stderr.strip()}")
+
+
+def _export(no_changes: bool) -> None:
+    line = f"NO_CHANGES={'true' if no_changes else 'false'}\n"
+    for name in ("GITHUB_ENV", "GITHUB_OUTPUT"):
+        target = os.environ.get(name)
+        if target:
+            with open(target, "a", encoding="utf-8") as handle:
+                handle.write(line)
+    print(line, end="")
+
+
+# CLI ----------------------------------------------------------------------------
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("check", "record"))
+    parser.add_argument(
+        "--store",
+        help=(
+            "Fingerprint location: a path or s3:// URI (default: $CHANGE_FINGERPRINT_URI, "
+            f"else <backend key>.fingerprint.json in the state bucket, else {DEFAULT_LOCAL_STORE})"
+        ),
+    )
+    parser.add_argument(
+        "--working-dir",
+        type=Path,
+        default=Path(os.environ.get("TF_WORKING_DIR") or "."),
+        help="Terraform configuration directory (default: $TF_WORKING_DIR or .)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Report changes even when the fingerprint matches (same as CHANGE_DETECTION=off)",
+    )
+    return parser.parse_args(argv)
+
+
+def _check(args: argparse.Namespace, store: str, current: dict[str, Any]) -> None:
+    forced = args.force or (os.environ.get("CHANGE_DETECTION") or "").strip().lower() in {
+        "0",
+        "off",
+        "false",
+        "no",
+    }
+    previous = _load_stored(store)
+    if previous is None:
+        print("No previous fingerprint; treating everything as changed.")
+        _export(False)
+        return
+    changes = _diff(previous, current)
+    if changes:
+        print(f"Changes since the last apply ({len(changes)}):")
+        for line in changes:
+            print(f"  {line}")
+    else:
+        print("No changes to the tfvars, .tf files or lock file since the last apply.")
+    if forced and not changes:
+        print("Change detection is off; running the full workflow anyway.")
+    _export(not changes and not forced)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv)
+    store = args.store or _default_store()
+    tf_vars_file = Path(os.environ.get("TF_VARS_FILE") or "ci.auto.tfvars")
+    try:
+        current = input_fingerprint(args.working_dir, tf_vars_file)
+        if args.command == "check":
+            _check(args, store, current)
+        else:
+            _store(store, current)
+            print(f"Recorded the input fingerprint at {store}.")
+    except (ChangeDetectionError, OSError) as exc:
+        _error(str(exc))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""Discover pre-existing stack resources once and cache the answer.
+
+``make plan-use-existing``, ``apply-use-existing`` and ``check-existing``
+all need to know which security groups, log group, IAM role, instance profile
+and IAM policies already exist. This command runs those lookups concurrently
+in one process, using the same AWS CLI runner as ``rebuild_tfstate.py``, and
+caches the result as JSON. The cache key covers the account, region, VPC,
+naming.yml hash and resolved names. Within the TTL, the targets read the
+cache and make no AWS calls.
+
+Print the ``-var`` flags for ``terraform plan``/``apply``::
+
+    EXISTING_ARGS=$(python3 scripts/existing_resources.py --format args)
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import naming_index  # noqa: E402
+from rebuild_tfstate import CommandRunner, RebuildError, _exists, _is_missing, _lookup_security_group  # noqa: E402
+
+DEFAULT_TTL = 15 * 60
+DEFAULT_REGION = "ap-south-1"
+
+# Index key -> (Terraform variable, check-existing label), in report order.
+EXISTING_VARS = {
+    "collector_sg": ("existing_collector_security_group_id", "collector SG"),
+    "consumer_sg": ("existing_consumer_security_group_id", "consumer SG"),
+    "broker_sg": ("existing_msk_broker_security_group_id", "broker SG"),
+    "broker_log_group": ("existing_broker_log_group_name", "log group"),
+    "collector_role": ("existing_collector_role_name", "role exists"),
+    "collector_instance_profile": ("existing_collector_instance_profile_name", "profile exists"),
+    "control_policy": ("existing_msk_control_policy_arn", "ctl policy ARN"),
+    "producer_policy": ("existing_producer_policy_arn", "prod policy ARN"),
+    "consumer_policy": ("existing_consumer_policy_arn", "cons policy ARN"),
+}
+
+
+def _error(message: str) -> None:
+    print(f"::error::{message}", file=sys.stderr)
+
+
+# Cache ------------------------------------------------------------------------
+def _cache_dir() -> Path:
+    configured = os.environ.get("EXISTING_RESOURCES_CACHE_DIR")
+    if configured:
+        return Path(configured)
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "existing_resources"
+
+
+def _cache_path(kind: str, material: dict[str, Any]) -> Path:
+    digest = hashlib.sha256(json.dumps(material, sort_keys=True).encode("utf-8")).hexdigest()
+    return _cache_dir() / f"{kind}-{digest[:32]}.json"
+
+
+def _read_cache(entry: Path, ttl: int) -> dict[str, Any] | None:
+    if ttl <= 0:
+        return None
+    try:
+        cached = json.loads(entry.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or time.time() - cached.get("discovered_at", 0) > ttl:
+        return None
+    return cached
+
+
+def _write_cache(entry: Path, cached: dict[str, Any]) -> None:
+    try:
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        temp = entry.with_name(f".{entry.name}.{os.getpid()}.tmp")
+        temp.write_text(json.dumps(cached, indent=2), encoding="utf-8")
+        os.replace(temp, entry)
+    except OSError as exc:
+        print(f"::warning::Unable to update the discovery cache {entry}: {exc}", file=sys.stderr)
+
+
+# Discovery --------------------------------------------------------------------
+def _account_id(runner: CommandRunner, ttl: int) -> str:
+    """Return the AWS account ID from AWS_ACCOUNT_ID or a cached STS call."""
+
+    configured = os.environ.get("AWS_ACCOUNT_ID")
+    if configured:
+        return configured
+    # The credentials decide the account; hash them rather than storing them.
+    entry = _cache_path(
+        "account",
+        {
+            name: hashlib.sha256(os.environ.get(name, "").encode("utf-8")).hexdigest()
+            for name in ("AWS_PROFILE", "AWS_ACCESS_KEY_ID", "AWS_SESSION_TOKEN", "AWS_ROLE_ARN")
+        },
+    )
+    cached = _read_cache(entry, ttl)
+    if cached and cached.get("account_id"):
+        return cached["account_id"]
+    try:
+        account = runner.aws(
+            "sts get-caller-identity", "sts", "get-caller-identity", "--query", "Account", "--output", "text"
+        )
+    except RebuildError as exc:
+        print(f"::warning::{exc}; skipping the IAM policy checks", file=sys.stderr)
+        return ""
+    account = "" if _is_missing(account) else account or ""
+    if account and ttl > 0:
+        _write_cache(entry, {"discovered_at": time.time(), "account_id": account})
+    return account
+
+
+def _probe(func: Any, *args: Any) -> tuple[str | None, str | None]:
+    """Run one lookup; return ``(value, error)`` instead of raising."""
+
+    try:
+        value = func(*args)
+    except RebuildError as exc:
+        return None, str(exc)
+    return (None if _is_missing(value) else value), None
+
+
+def discover(
+    runner: CommandRunner, names: dict[str, str], vpc_id: str, account_id: str, index: dict[str, Any]
+) -> tuple[dict[str, str | None], list[str]]:
+    """Look up every resource in :data:`EXISTING_VARS` concurrently.
+
+    Returns the identifiers found (None when missing) and the lookups that
+    failed for a reason other than "not found".
+    """
+
+    log_group = names["broker_log_group"]
+    tasks: dict[str, tuple[Any, ...]] = {
+        f"{role}_sg": (_lookup_security_group, runner, names[f"{role}_sg"], vpc_id)
+        for role in ("collector", "consumer", "broker")
+    }
+    tasks["broker_log_group"] = (
+        runner.aws,
+        "logs describe-log-groups",
+        "logs",
+        "describe-log-groups",
+        "--log-group-name-prefix",
+        log_group,
+        "--query",
+        f"logGroups[?logGroupName=='{log_group}'].logGroupName | [0]",
+        "--output",
+        "text",
+    )
+    tasks["collector_role"] = (
+        _exists,
+        runner,
+        "iam get-role",
+        names["collector_role"],
+        "iam",
+        "get-role",
+        "--role-name",
+        names["collector_role"],
+    )
+    tasks["collector_instance_profile"] = (
+        _exists,
+        runner,
+        "iam get-instance-profile",
+        names["collector_instance_profile"],
+        "iam",
+        "get-instance-profile",
+        "--instance-profile-name",
+        names["collector_instance_profile"],
+    )
+    if account_id:
+        for policy in naming_index.POLICIES:
+            arn = naming_index.policy_arn(index, policy, account_id)
+            label = f"iam get-policy ({names[policy]})"
+            tasks[policy] = (_exists, runner, label, arn, "iam", "get-policy", "--policy-arn", arn)
+
+    with ThreadPoolExecutor(max_workers=len(tasks)) as pool:
+        futures = {key: pool.submit(_probe, *task) for key, task in tasks.items()}
+    found: dict[str, str | None] = {key: None for key in EXISTING_VARS}
+    errors: list[str] = []
+    for key, future in futures.items():
+        found[key], error = future.result()
+        if error:
+            errors.append(error)
+    return found, errors
+
+
+def load(ttl: int, naming_file: Path, runner: CommandRunner, refresh: bool = False) -> dict[str, Any]:
+    """Return the discovery result, from the cache when it is younger than ``ttl``.
+
+    ``refresh`` skips the cache read but still stores the new result.
+    """
+
+    vpc_id = os.environ.get("VPC_ID")
+    if not vpc_id:
+        raise RebuildError("Set VPC_ID to the VPC ID")
+    region = os.environ.get("AWS_REGION") or DEFAULT_REGION
+    # The CLI reads the region from the environment, like rebuild_tfstate.py.
+    os.environ["AWS_REGION"] = region
+    index = naming_index.load_index(naming_file)
+    names = naming_index.resource_names(index)
+    account_id = _account_id(runner, ttl)
+    naming_hash = hashlib.sha256(naming_file.read_bytes()).hexdigest() if naming_file.is_file() else ""
+    entry = _cache_path(
+        "resources",
+        {"account": account_id, "region": region, "vpc": vpc_id, "naming": naming_hash, "names": names},
+    )
+    cached = None if refresh else _read_cache(entry, ttl)
+    if cached is not None:
+        age = int(time.time() - cached["discovered_at"])
+        print(f"Using discovery cached {age}s ago ({entry}).", file=sys.stderr)
+        return cached
+
+    found, errors = discover(runner, names, vpc_id, account_id, index)
+    result = {"discovered_at": time.time(), "account_id": account_id, "region": region, "found": found}
+    for error in errors:
+        print(f"::warning::{error}; treating it as not found", file=sys.stderr)
+    # A partial answer would be served for the whole TTL; only cache clean runs.
+    if ttl > 0 and not errors:
+        _write_cache(entry, result)
+    return result
+
+
+def _format_args(found: dict[str, str | None]) -> str:
+    return " ".join(
+        f"-var={variable}={found[key]}" for key, (variable, _) in EXISTING_VARS.items() if found.get(key)
+    )
+
+
+def _format_report(found: dict[str, str | None]) -> str:
+    return "\n".join(f"{label + ':':<17}{found.get(key) or 'None'}" for key, (_, label) in EXISTING_VARS.items())
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--format",
+        choices=("args", "report", "json"),
+        default="args",
+        help="args: -var flags for terraform; report: check-existing listing; json: the cache entry (default: args)",
+    )
+    parser.add_argument(
+        "--ttl",
+        type=int,
+        default=int(os.environ.get("EXISTING_CACHE_TTL") or DEFAULT_TTL),
+        help=f"Seconds a cached discovery stays valid; 0 always queries AWS (default: $EXISTING_CACHE_TTL or {DEFAULT_TTL})",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Query AWS even when the cache is fresh, and update it",
+    )
+    parser.add_argument(
+        "--naming-file",
+        type=Path,
+        default=naming_index.DEFAULT_NAMING_FILE,
+        help="naming.yml with the resource names (default: the repository's naming.yml)",
+    )
+    parser.add_argument("--aws", default=os.environ.get("AWS_CLI", "aws"), help="AWS CLI binary (default: aws)")
+    args = parser.parse_args(argv)
+
+    # Only the aws side of the runner is used.
+    runner = CommandRunner(args.aws, os.environ.get("TF", "terraform"))
+    try:
+        result = load(args.ttl, args.naming_file, runner, refresh=args.refresh)
+    except RebuildError as exc:
+        _error(str(exc))
+        return 1
+    if args.format == "args":
+        print(_format_args(result["found"]))
+    elif args.format == "report":
+        print(_format_report(result["found"]))
+    else:
+        print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""Generate tuned Kafka client properties from the infrastructure summary.
+
+The summary gives the bootstrap brokers (SASL/IAM on :9098), the producer
+and consumer topic prefixes and the consumer group names. ``generate``
+writes a producer file and one consumer file per group for each profile:
+
+* ``low-latency``: no linger, small batches, no compression, small fetches;
+* ``balanced``: short linger, zstd, medium batches and fetches;
+* ``max-throughput``: long linger, large zstd batches, large fetches.
+
+Every profile keeps ``acks=all`` and idempotence with at most five in-flight
+requests, so retries never reorder or duplicate messages. ``--dialect``
+chooses between Java client names (``java``, the default) and librdkafka
+names (``librdkafka``, for confluent-kafka, kcat and other librdkafka
+clients).
+
+``validate`` benchmarks each profile against a local Kafka-compatible broker
+with the ``kafka_load_test.py`` harness and compares the results::
+
+    python3 scripts/kafka_client_config.py generate --output-dir kafka-clients
+    python3 scripts/kafka_client_config.py validate --bootstrap localhost:9092
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import kafka_load_test  # noqa: E402
+
+DEFAULT_OUTPUT_DIR = "kafka-clients"
+DEFAULT_CONSUMER_PREFIXES = ("exchg.",)
+
+# Settings shared by every profile: no duplicates or reordering on retry.
+_SAFE_PRODUCER = {
+    "acks": "all",
+    "enable.idempotence": True,
+    "max.in.flight.requests.per.connection": 5,
+}
+
+# Java client names; _librdkafka() translates them.
+PROFILES: dict[str, dict[str, dict[str, Any]]] = {
+    "low-latency": {
+        "producer": {
+            **_SAFE_PRODUCER,
+            "linger.ms": 0,
+            "batch.size": 16384,
+            "compression.type": "none",
+        },
+        "consumer": {
+            "fetch.min.bytes": 1,
+            "fetch.max.wait.ms": 10,
+            "max.partition.fetch.bytes": 1048576,
+            "fetch.max.bytes": 52428800,
+            "max.poll.records": 100,
+        },
+    },
+    "balanced": {
+        "producer": {
+            **_SAFE_PRODUCER,
+            "linger.ms": 10,
+            "batch.size": 131072,
+            "compression.type": "zstd",
+        },
+        "consumer": {
+            "fetch.min.bytes": 16384,
+            "fetch.max.wait.ms": 100,
+            "max.partition.fetch.bytes": 2097152,
+            "fetch.max.bytes": 52428800,
+            "max.poll.records": 500,
+        },
+    },
+    "max-throughput": {
+        "producer": {
+            **_SAFE_PRODUCER,
+            "linger.ms": 50,
+            "batch.size": 1048576,
+            "compression.type": "zstd",
+        },
+        "consumer": {
+            "fetch.min.bytes": 1048576,
+            "fetch.max.wait.ms": 500,
+            "max.partition.fetch.bytes": 10485760,
+            "fetch.max.bytes": 67108864,
+            "max.poll.records": 2000,
+        },
+    },
+}
+
+# librdkafka spells some settings differently and has no max.poll.records:
+# the application chooses the batch size when it calls consume().
+_LIBRDKAFKA_NAMES = {"fetch.max.wait.ms": "fetch.wait.max.ms", "max.poll.records": None}
+
+_IAM_SETTINGS = {
+    "java": {
+        "security.protocol": "SASL_SSL",
+        "sasl.mechanism": "AWS_MSK_IAM",
+        "sasl.jaas.config": "software.amazon.msk.auth.iam.IAMLoginModule required;",
+        "sasl.client.callback.handler.class": "software.amazon.msk.auth.iam.IAMClientCallbackHandler",
+    },
+    "librdkafka": {
+        "security.protocol": "SASL_SSL",
+        "sasl.mechanism": "OAUTHBEARER",
+    },
+}
+_IAM_NOTES = {
+    "java": "IAM authentication needs the aws-msk-iam-auth library on the classpath.",
+    "librdkafka": (
+        "IAM authentication needs an OAUTHBEARER token callback from aws-msk-iam-sasl-signer, "
+        "as in scripts/kafka_load_test.py."
+    ),
+}
+_GROUP_FILE_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def _error(message: str) -> None:
+    print(f"::error::{message}", file=sys.stderr)
+
+
+def _librdkafka(properties: dict[str, Any]) -> dict[str, Any]:
+    translated = {}
+    for name, value in properties.items():
+        renamed = _LIBRDKAFKA_NAMES.get(name, name)
+        if renamed is not None:
+            translated[renamed] = value
+    return translated
+
+
+def profile_properties(profile: str, role: str, dialect: str) -> dict[str, Any]:
+    """Return the tuning settings of ``profile`` for a ``producer`` or ``consumer``."""
+
+    properties = PROFILES[profile][role]
+    return _librdkafka(properties) if dialect == "librdkafka" else dict(properties)
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _cluster_scopes(summary: dict[str, Any]) -> dict[str, Any]:
+    """Return the bootstrap brokers, topic prefixes and groups in the summary."""
+
+    cluster = summary.get("msk_cluster") or {}
+    bootstrap = cluster.get("bootstrap_brokers_sasl_iam")
+    if not bootstrap:
+        raise kafka_load_test.LoadTestError("The infrastructure summary has no msk_cluster.bootstrap_brokers_sasl_iam.")
+    access = summary.get("kafka_access")
+    if not isinstance(access, dict):
+        # Summaries from before kafka_access was added: use the variables.tf defaults.
+        print(
+            "::warning::The infrastructure summary has no kafka_access; using the default topic prefixes and groups",
+            file=sys.stderr,
+        )
+        access = {}
+    return {
+        "arn": cluster.get("arn", ""),
+        "bootstrap": bootstrap,
+        "producer_topic_prefixes": access.get("producer_topic_prefixes")
+        or [kafka_load_test.DEFAULT_TOPIC_PREFIX],
+        "consumer_topic_prefixes": access.get("consumer_topic_prefixes") or list(DEFAULT_CONSUMER_PREFIXES),
+        "consumer_group_names": access.get("consumer_group_names") or list(kafka_load_test.DEFAULT_GROUPS),
+    }
+
+
+def render(scopes: dict[str, Any], profile: str, role: str, dialect: str, group: str | None = None) -> str:
+    """Return one client properties file."""
+
+    if role == "producer":
+        scope = f"# Topics: create and write topics starting with {', '.join(scopes['producer_topic_prefixes'])}"
+    else:
+        scope = f"# Topics: read topics starting with {', '.join(scopes['consumer_topic_prefixes'])}"
+    lines = [
+        f"# Kafka {role} settings, profile {profile} ({dialect} client names).",
+        "# Generated by scripts/kafka_client_config.py from the infrastructure summary.",
+    ]
+    if scopes["arn"]:
+        lines.append(f"# Cluster: {scopes['arn']}")
+    lines += [scope, f"# {_IAM_NOTES[dialect]}", f"bootstrap.servers={scopes['bootstrap']}"]
+    lines += [f"{name}={value}" for name, value in _IAM_SETTINGS[dialect].items()]
+    if group is not None:
+        lines.append(f"group.id={group}")
+    lines += [f"{name}={_format_value(value)}" for name, value in profile_properties(profile, role, dialect).items()]
+    return "\n".join(lines) + "\n"
+
+
+def generate(scopes: dict[str, Any], profiles: list[str], dialect: str, output_dir: Path | None) -> None:
+    files: list[tuple[str, str]] = []
+    for profile in profiles:
+        files.append((f"{profile}/producer.properties", render(scopes, profile, "producer", dialect)))
+        for group in scopes["consumer_group_names"]:
+            name = _GROUP_FILE_RE.sub("_", group)
+            files.append((f"{profile}/consumer-{name}.properties", render(scopes, profile, "consumer", dialect, group)))
+    if output_dir is None:
+        print("\n".join(f"### {name}\n{text}" for name, text in files), end="")
+        return
+    for name, text in files:
+        path = output_dir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+    print(f"Wrote {len(files)} client configurations for {', '.join(profiles)} to {output_dir}.")
+
+
+def validate(profiles: list[str], load_test_argv: list[str]) -> int:
+    """Run the load-test harness once per profile against a local broker."""
+
+    results = {}
+    for profile in profiles:
+        print(f"\n== {profile}")
+        args = kafka_load_test._parse_args(["--local", *load_test_argv])
+        results[profile] = kafka_load_test.run(
+            args,
+            {name: _format_value(value) for name, value in profile_properties(profile, "producer", "librdkafka").items()},
+            {name: _format_value(value) for name, value in profile_properties(profile, "consumer", "librdkafka").items()},
+        )
+    print(
+        f"\n{'profile':<16} {'MB/s':>9} {'msg/s':>10} {'ack p50':>9} {'ack p99':>9} "
+        f"{'e2e p50':>9} {'e2e p99':>9} {'e2e p999':>9}"
+    )
+    failed = []
+    for profile, report in results.items():
+        produce = report["produce"]
+        # The slowest group bounds what a consumer of this profile sees.
+        consume = max(report["consume"].values(), key=lambda stats: stats["latency_ms"]["p99"] or 0)
+        values = [produce["latency_ms"]["p50"], produce["latency_ms"]["p99"]]
+        values += [consume["latency_ms"][name] for name in ("p50", "p99", "p999")]
+        print(
+            f"{profile:<16} {produce['mb_per_s'] or 0:>9.2f} {produce['messages_per_s'] or 0:>10.1f} "
+            + " ".join(f"{value if value is not None else float('nan'):>9.2f}" for value in values)
+        )
+        expected = report["settings"]["messages"]
+        if produce["errors"] or any(stats["messages"] < expected for stats in report["consume"].values()):
+            failed.append(profile)
+    for profile in failed:
+        _error(f"Profile {profile} lost or failed messages during validation.")
+    return 1 if failed else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("generate", "validate"))
+    parser.add_argument(
+        "--profile",
+        action="append",
+        choices=sorted(PROFILES),
+        help="Profile to generate or validate (repeatable; default: all)",
+    )
+    parser.add_argument(
+        "--dialect",
+        choices=("java", "librdkafka"),
+        default="java",
+        help="generate: property names for Java clients or librdkafka-based clients (default: java)",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        help=f"generate: write <profile>/<role>.properties files here instead of stdout (e.g. {DEFAULT_OUTPUT_DIR})",
+    )
+    parser.add_argument(
+        "--summary",
+        default=kafka_load_test.DEFAULT_SUMMARY,
+        help=(
+            f"generate: infrastructure summary JSON file or s3:// URI (default: {kafka_load_test.DEFAULT_SUMMARY}, "
+            "else s3://$INFRA_SUMMARY_BUCKET/$INFRA_SUMMARY_KEY, else terraform output)"
+        ),
+    )
+    parser.add_argument(
+        "--working-dir",
+        type=Path,
+        default=Path(os.environ.get("TF_WORKING_DIR") or "."),
+        help="Terraform configuration directory (default: $TF_WORKING_DIR or .)",
+    )
+    args, load_test_argv = parser.parse_known_args(argv)
+    if load_test_argv and args.command != "validate":
+        parser.error(f"unrecognized arguments: {' '.join(load_test_argv)}")
+    profiles = args.profile or list(PROFILES)
+
+    try:
+        if args.command == "validate":
+            # Everything else (--bootstrap, --messages, --message-size, ...) goes to the harness.
+            return validate(profiles, load_test_argv)
+        scopes = _cluster_scopes(kafka_load_test._infrastructure_summary(args.summary, args.working_dir))
+        generate(scopes, profiles, args.dialect, args.output_dir)
+    except (kafka_load_test.LoadTestError, OSError) as exc:
+        _error(str(exc))
+        return 1
+    except kafka_load_test._KAFKA_ERRORS as exc:
+        _error(f"Kafka error: {exc}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
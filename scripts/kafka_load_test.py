@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+"""Measure produce/consume throughput and latency on the MSK cluster.
+
+Producer threads write fixed-size messages to load-test topics under the
+first ``producer_topic_prefixes`` entry (``exchg.`` by default). Consumers
+in each of the ``consumer_group_names`` groups read the messages back. Every
+message carries the run ID and its send time, so the harness reports:
+
+* produce MB/s and messages/s, and the broker acknowledgement latency;
+* consume messages/s per group, and the end-to-end latency from send to
+  receive as p50, p99 and p99.9.
+
+The bootstrap endpoint comes from ``--bootstrap``, ``$KAFKA_BOOTSTRAP_SERVERS``,
+the ``resources.json`` summary written by apply, or ``terraform output
+infrastructure_summary_json``, in that order. Against MSK the clients
+authenticate with IAM on :9098. ``--local`` targets a plaintext
+Kafka-compatible broker on ``localhost:9092`` instead (Apache Kafka, Redpanda),
+so the harness also works offline.
+
+Needs ``pip install confluent-kafka``; IAM authentication also needs
+``pip install aws-msk-iam-sasl-signer-python``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import platform
+import re
+import struct
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+try:
+    import confluent_kafka
+    from confluent_kafka.admin import AdminClient, NewTopic
+
+    _KAFKA_ERRORS: tuple[type[BaseException], ...] = (confluent_kafka.KafkaException,)
+except ImportError:  # pragma: no cover - optional dependency
+    confluent_kafka = None
+    _KAFKA_ERRORS = ()
+
+try:
+    from aws_msk_iam_sasl_signer import MSKAuthTokenProvider
+except ImportError:  # pragma: no cover - optional dependency
+    MSKAuthTokenProvider = None
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import load_terraform_config as loader  # noqa: E402
+
+LOCAL_BOOTSTRAP = "localhost:9092"
+DEFAULT_TOPIC_PREFIX = "exchg."
+DEFAULT_GROUPS = ("crypto-readers",)
+DEFAULT_SUMMARY = "resources.json"
+PERCENTILES = (("p50", 0.50), ("p99", 0.99), ("p999", 0.999))
+
+# Run ID (8 bytes) and send time in ns since the epoch; the rest is padding.
+_HEADER = struct.Struct("!8sQ")
+_ARN_REGION_RE = re.compile(r"^arn:aws[\w-]*:kafka:([\w-]+):")
+
+
+class LoadTestError(Exception):
+    """Raised when the harness cannot be configured or the cluster fails."""
+
+
+def _error(message: str) -> None:
+    print(f"::error::{message}", file=sys.stderr)
+
+
+@dataclass
+class LatencyStats:
+    """Message, byte and latency counters for one producer or consumer group."""
+
+    messages: int = 0
+    bytes: int = 0
+    errors: int = 0
+    last_at: float = 0.0
+    latencies_ns: list[int] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, size: int, latency_ns: int) -> None:
+        with self.lock:
+            self.messages += 1
+            self.bytes += size
+            self.last_at = time.perf_counter()
+            self.latencies_ns.append(latency_ns)
+
+    def summary(self, seconds: float) -> dict[str, Any]:
+        ordered = sorted(self.latencies_ns)
+        return {
+            "messages": self.messages,
+            "bytes": self.bytes,
+            "errors": self.errors,
+            "seconds": round(seconds, 4),
+            "mb_per_s": round(self.bytes / seconds / 1e6, 3) if seconds else None,
+            "messages_per_s": round(self.messages / seconds, 1) if seconds else None,
+            "latency_ms": {name: _percentile(ordered, rank) for name, rank in PERCENTILES},
+        }
+
+
+def _percentile(ordered: list[int], rank: float) -> float | None:
+    """Nearest-rank percentile of sorted nanosecond values, in milliseconds."""
+
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, math.ceil(rank * len(ordered)) - 1))
+    return round(ordered[index] / 1e6, 3)
+
+
+# Stack settings ----------------------------------------------------------------
+def _stack_defaults(tf_vars_file: Path) -> tuple[str, list[str]]:
+    """Return the first producer topic prefix and the consumer groups.
+
+    They come from the generated var-file when it exists, else from the
+    defaults in variables.tf.
+    """
+
+    tfvars: dict[str, Any] = {}
+    if tf_vars_file.is_file():
+        text = tf_vars_file.read_text(encoding="utf-8")
+        try:
+            if loader._is_json_payload(text):
+                tfvars = json.loads(text)
+            else:
+                tfvars = loader.TfvarsParser(text).parse_assignments()
+        except (ValueError, loader.TfvarsParseError) as exc:
+            raise LoadTestError(f"Unable to parse {tf_vars_file}: {exc}") from exc
+    prefixes = tfvars.get("producer_topic_prefixes") or [DEFAULT_TOPIC_PREFIX]
+    groups = tfvars.get("consumer_group_names") or list(DEFAULT_GROUPS)
+    return str(prefixes[0]), [str(group) for group in groups]
+
+
+def _infrastructure_summary(location: str, workdir: Path) -> dict[str, Any]:
+    """Read the infrastructure summary from a file, an ``s3://`` URI or terraform output.
+
+    When the file is missing, the copy apply published to
+    ``INFRA_SUMMARY_BUCKET``/``INFRA_SUMMARY_KEY`` is used, then ``terraform output``.
+    """
+
+    bucket = os.environ.get("INFRA_SUMMARY_BUCKET")
+    key = os.environ.get("INFRA_SUMMARY_KEY")
+    if not location.startswith("s3://") and not Path(location).is_file() and bucket and key:
+        location = f"s3://{bucket}/{key}"
+    if location.startswith("s3://"):
+        command = ["aws", "s3", "cp", "--only-show-errors", location, "-"]
+    elif Path(location).is_file():
+        command = []
+    else:
+        command = [os.environ.get("TF", "terraform"), f"-chdir={workdir}", "output", "-json", "infrastructure_summary_json"]
+        location = "terraform output"
+    if command:
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            raise LoadTestError(
+                f"Unable to read the infrastructure summary from {location}: {result.stderr.strip()}. "
+                "Pass --summary or --bootstrap, or --local for a local broker."
+            )
+        text = result.stdout
+    else:
+        text = Path(location).read_text(encoding="utf-8")
+    try:
+        summary = json.loads(text)
+    except ValueError as exc:
+        raise LoadTestError(f"Unable to read the infrastructure summary from {location}: {exc}") from exc
+    if not isinstance(summary, dict):
+        raise LoadTestError(f"The infrastructure summary from {location} is not a JSON object.")
+    return summary
+
+
+def _cluster_endpoint(args: argparse.Namespace) -> tuple[str, str | None]:
+    """Return the bootstrap servers and, for MSK, the cluster's region."""
+
+    if args.local:
+        return args.bootstrap or LOCAL_BOOTSTRAP, None
+    configured = args.bootstrap or os.environ.get("KAFKA_BOOTSTRAP_SERVERS")
+    if configured:
+        return configured, os.environ.get("AWS_REGION")
+    cluster = _infrastructure_summary(args.summary, args.working_dir).get("msk_cluster") or {}
+    bootstrap = cluster.get("bootstrap_brokers_sasl_iam")
+    if not bootstrap:
+        raise LoadTestError("The infrastructure summary has no msk_cluster.bootstrap_brokers_sasl_iam.")
+    match = _ARN_REGION_RE.match(cluster.get("arn") or "")
+    return bootstrap, match.group(1) if match else os.environ.get("AWS_REGION")
+
+
+# Clients -----------------------------------------------------------------------
+def _client_config(bootstrap: str, local: bool, region: str | None) -> dict[str, Any]:
+    config: dict[str, Any] = {"bootstrap.servers": bootstrap, "client.id": "msk-load-test"}
+    if local:
+        return config
+    if MSKAuthTokenProvider is None:
+        raise LoadTestError(
+            "IAM authentication needs the MSK signer: pip install aws-msk-iam-sasl-signer-python "
+            "(or use --local for a plaintext broker)"
+        )
+    if not region:
+        raise LoadTestError("Set AWS_REGION to the cluster's region for IAM authentication.")
+
+    def _token(_config: str) -> tuple[str, float]:
+        token, expiry_ms = MSKAuthTokenProvider.generate_auth_token(region)
+        return token, expiry_ms / 1000
+
+    config.update(
+        {
+            "security.protocol": "SASL_SSL",
+            "sasl.mechanism": "OAUTHBEARER",
+            "oauth_cb": _token,
+        }
+    )
+    return config
+
+
+def _ensure_topics(config: dict[str, Any], topics: list[str], partitions: int, replication: int) -> list[str]:
+    """Create the missing load-test topics; return the ones this run created."""
+
+    admin = AdminClient(config)
+    existing = set(admin.list_topics(timeout=30).topics)
+    missing = [topic for topic in topics if topic not in existing]
+    if not missing:
+        return []
+    futures = admin.create_topics(
+        [NewTopic(topic, num_partitions=partitions, replication_factor=replication) for topic in missing]
+    )
+    for topic, future in futures.items():
+        try:
+            future.result()
+        except confluent_kafka.KafkaException as exc:
+            if exc.args[0].code() != confluent_kafka.KafkaError.TOPIC_ALREADY_EXISTS:
+                raise LoadTestError(f"Unable to create topic {topic}: {exc}") from exc
+    return missing
+
+
+def _delete_topics(config: dict[str, Any], topics: list[str]) -> None:
+    futures = AdminClient(config).delete_topics(topics)
+    for topic, future in futures.items():
+        try:
+            future.result()
+        except confluent_kafka.KafkaException as exc:
+            # The stack's producer policy grants CreateTopic but not DeleteTopic.
+            print(f"::warning::Unable to delete topic {topic}: {exc}", file=sys.stderr)
+
+
+def _produce(
+    config: dict[str, Any],
+    topics: list[str],
+    count: int,
+    payload: bytearray,
+    run_id: bytes,
+    rate: float,
+    stats: LatencyStats,
+) -> None:
+    producer = confluent_kafka.Producer(config)
+
+    def _delivered(err: Any, message: Any) -> None:
+        if err is not None:
+            with stats.lock:
+                stats.errors += 1
+            return
+        _, sent_ns = _HEADER.unpack_from(message.value())
+        stats.record(len(message.value()), time.time_ns() - sent_ns)
+
+    start = time.perf_counter()
+    for seq in range(count):
+        if rate:
+            delay = start + seq / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        _HEADER.pack_into(payload, 0, run_id, time.time_ns())
+        while True:
+            try:
+                producer.produce(topics[seq % len(topics)], bytes(payload), on_delivery=_delivered)
+                break
+            except BufferError:
+                # Local queue full: serve delivery reports until there is room.
+                producer.poll(0.05)
+        producer.poll(0)
+    producer.flush()
+
+
+def _consume(
+    config: dict[str, Any],
+    topics: list[str],
+    run_id: bytes,
+    expected: int,
+    stats: LatencyStats,
+    ready: threading.Event,
+    stop: threading.Event,
+) -> None:
+    consumer = confluent_kafka.Consumer(
+        {**config, "auto.offset.reset": "earliest", "enable.partition.eof": False}
+    )
+    consumer.subscribe(topics, on_assign=lambda _consumer, _partitions: ready.set())
+    try:
+        while not stop.is_set():
+            with stats.lock:
+                if stats.messages >= expected:
+                    return
+            for message in consumer.consume(num_messages=500, timeout=0.2):
+                if message.error():
+                    with stats.lock:
+                        stats.errors += 1
+                    continue
+                value = message.value()
+                if len(value) < _HEADER.size:
+                    continue
+                message_run, sent_ns = _HEADER.unpack_from(value)
+                # Messages from earlier runs on reused topics are not ours.
+                if message_run == run_id:
+                    stats.record(len(value), time.time_ns() - sent_ns)
+    finally:
+        consumer.close()
+
+
+def run(
+    args: argparse.Namespace,
+    producer_properties: dict[str, Any] | None = None,
+    consumer_properties: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """Produce ``args.messages`` messages and read them back in every group.
+
+    The property dicts are librdkafka settings layered over the command-line
+    ones, e.g. a client profile from ``kafka_client_config.py``.
+    """
+
+    if confluent_kafka is None:
+        raise LoadTestError("The load test needs a Kafka client: pip install confluent-kafka")
+    if args.message_size < _HEADER.size:
+        raise LoadTestError(f"--message-size must be at least {_HEADER.size} bytes.")
+    prefix, groups = _stack_defaults(Path(os.environ.get("TF_VARS_FILE") or "ci.auto.tfvars"))
+    prefix = args.topic_prefix or prefix
+    groups = args.group or groups
+    bootstrap, region = _cluster_endpoint(args)
+    config = _client_config(bootstrap, args.local, region)
+    topics = [f"{prefix}loadtest.{index}" for index in range(args.topics)]
+
+    created = _ensure_topics(config, topics, args.partitions, args.replication_factor)
+    print(f"Load test against {bootstrap}: {len(topics)} topics ({len(created)} created), groups {', '.join(groups)}.")
+    run_id = uuid.uuid4().bytes[:8]
+    producer_config = {
+        **config,
+        "acks": args.acks,
+        "enable.idempotence": args.acks == "all",
+        "compression.type": args.compression,
+        "linger.ms": args.linger_ms,
+        **(producer_properties or {}),
+    }
+
+    stop = threading.Event()
+    consumers: list[threading.Thread] = []
+    group_stats = {group: LatencyStats() for group in groups}
+    ready_events = []
+    for group in groups:
+        for index in range(args.consumers_per_group):
+            ready = threading.Event()
+            ready_events.append(ready)
+            consumers.append(
+                threading.Thread(
+                    target=_consume,
+                    args=(
+                        {
+                            **config,
+                            **(consumer_properties or {}),
+                            "group.id": group,
+                            "client.id": f"msk-load-test-{group}-{index}",
+                        },
+                        topics,
+                        run_id,
+                        args.messages,
+                        group_stats[group],
+                        ready,
+                        stop,
+                    ),
+                    daemon=True,
+                )
+            )
+    for thread in consumers:
+        thread.start()
+    # Produce only once every group has partitions, so no messages precede the subscriptions.
+    for ready in ready_events:
+        if not ready.wait(args.timeout):
+            stop.set()
+            raise LoadTestError(f"Consumers were not assigned partitions within {args.timeout}s.")
+
+    produce_stats = LatencyStats()
+    payload = bytearray(os.urandom(args.message_size))
+    shares = [args.messages // args.producers + (index < args.messages % args.producers) for index in range(args.producers)]
+    producers = [
+        threading.Thread(
+            target=_produce,
+            args=(producer_config, topics, share, payload[:], run_id, args.rate / args.producers, produce_stats),
+        )
+        for share in shares
+    ]
+    produce_start = time.perf_counter()
+    for thread in producers:
+        thread.start()
+    for thread in producers:
+        thread.join()
+    produce_seconds = time.perf_counter() - produce_start
+
+    deadline = time.monotonic() + args.timeout
+    for thread in consumers:
+        thread.join(max(0.0, deadline - time.monotonic()))
+    stop.set()
+    for thread in consumers:
+        thread.join()
+
+    if args.delete_topics and created:
+        _delete_topics(config, created)
+    return {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "bootstrap": bootstrap,
+        "topics": topics,
+        "settings": {
+            "messages": args.messages,
+            "message_size": args.message_size,
+            "partitions": args.partitions,
+            "producers": args.producers,
+            "consumers_per_group": args.consumers_per_group,
+            "acks": args.acks,
+            "compression": args.compression,
+            "linger_ms": args.linger_ms,
+            "rate": args.rate,
+            "producer_properties": producer_properties or {},
+            "consumer_properties": consumer_properties or {},
+        },
+        "produce": produce_stats.summary(produce_seconds),
+        # A group's rate runs from the first send to the last message it received.
+        "consume": {
+            group: stats.summary((stats.last_at or time.perf_counter()) - produce_start)
+            for group, stats in group_stats.items()
+        },
+    }
+
+
+def _print_report(report: dict[str, Any]) -> None:
+    print(f"\n{'stage':<28} {'messages':>10} {'MB/s':>9} {'msg/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'p999 ms':>9}")
+    rows = [("produce (ack)", report["produce"])]
+    rows += [(f"consume[{group}] (e2e)", stats) for group, stats in report["consume"].items()]
+    for name, stats in rows:
+        latency = {key: value if value is not None else float("nan") for key, value in stats["latency_ms"].items()}
+        print(
+            f"{name:<28} {stats['messages']:>10} {stats['mb_per_s'] or 0:>9.2f} {stats['messages_per_s'] or 0:>10.1f} "
+            f"{latency['p50']:>9.2f} {latency['p99']:>9.2f} {latency['p999']:>9.2f}"
+        )
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bootstrap", help="Bootstrap servers (default: $KAFKA_BOOTSTRAP_SERVERS or the summary)")
+    parser.add_argument(
+        "--local",
+        action="store_true",
+        help=f"Use a plaintext local broker (default bootstrap {LOCAL_BOOTSTRAP}) instead of MSK with IAM",
+    )
+    parser.add_argument(
+        "--summary",
+        default=DEFAULT_SUMMARY,
+        help=(
+            f"Infrastructure summary JSON file or s3:// URI (default: {DEFAULT_SUMMARY}, else "
+            "s3://$INFRA_SUMMARY_BUCKET/$INFRA_SUMMARY_KEY, else terraform output)"
+        ),
+    )
+    parser.add_argument(
+        "--working-dir",
+        type=Path,
+        default=Path(os.environ.get("TF_WORKING_DIR") or "."),
+        help="Terraform configuration directory (default: $TF_WORKING_DIR or .)",
+    )
+    parser.add_argument("--messages", type=int, default=100_000, help="Messages to produce (default: 100000)")
+    parser.add_argument("--message-size", type=int, default=512, help="Message size in bytes (default: 512)")
+    parser.add_argument("--topics", type=int, default=1, help="Load-test topics to spread messages over (default: 1)")
+    parser.add_argument("--partitions", type=int, default=6, help="Partitions per created topic (default: 6)")
+    parser.add_argument(
+        "--replication-factor",
+        type=int,
+        default=-1,
+        help="Replication factor for created topics; -1 uses the broker default (default: -1)",
+    )
+    parser.add_argument("--producers", type=int, default=4, help="Concurrent producer threads (default: 4)")
+    parser.add_argument(
+        "--consumers-per-group", type=int, default=1, help="Consumer threads in each group (default: 1)"
+    )
+    parser.add_argument(
+        "--topic-prefix",
+        help=f"Topic prefix (default: first producer_topic_prefixes entry in $TF_VARS_FILE, else {DEFAULT_TOPIC_PREFIX})",
+    )
+    parser.add_argument(
+        "--group",
+        action="append",
+        help="Consumer group (repeatable; default: consumer_group_names from $TF_VARS_FILE, else crypto-readers)",
+    )
+    parser.add_argument("--acks", choices=("all", "1", "0"), default="all", help="Producer acks (default: all)")
+    parser.add_argument(
+        "--compression",
+        choices=("none", "gzip", "snappy", "lz4", "zstd"),
+        default="zstd",
+        help="Producer compression (default: zstd)",
+    )
+    parser.add_argument("--linger-ms", type=int, default=10, help="Producer linger.ms (default: 10)")
+    parser.add_argument(
+        "--rate", type=float, default=0, help="Total messages per second across producers; 0 is unthrottled"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=120, help="Seconds to wait for consumers after producing (default: 120)"
+    )
+    parser.add_argument(
+        "--delete-topics",
+        action="store_true",
+        help="Delete the topics this run created; they otherwise stay and accrue partition-hours",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=Path("loadtest_results.json"),
+        help="Where to write the JSON results (default: loadtest_results.json)",
+    )
+    args = parser.parse_args(argv)
+    for name in ("messages", "topics", "partitions", "producers", "consumers_per_group"):
+        if getattr(args, name) < 1:
+            parser.error(f"--{name.replace('_', '-')} must be at least 1")
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv)
+    try:
+        report = run(args)
+    except (LoadTestError, OSError) as exc:
+        _error(str(exc))
+        return 1
+    except _KAFKA_ERRORS as exc:
+        _error(f"Kafka error: {exc}")
+        return 1
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    _print_report(report)
+    print(f"\nWrote {args.output}")
+    missing = [group for group, stats in report["consume"].items() if stats["messages"] < args.messages]
+    for group in missing:
+        _error(
+            f"Group {group} received {report['consume'][group]['messages']} of {args.messages} messages "
+            f"within {args.timeout}s."
+        )
+    return 1 if missing or report["produce"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,20 +3,113 @@
 
 from __future__ import annotations
 
+import argparse
+import base64
+import binascii
+import codecs
+import contextlib
+import difflib
+import gzip
+import hashlib
+import io
+import itertools
 import json
+import math
+import mmap
 import os
+import pickle
+import re
 import shutil
 import subprocess
 import sys
-from dataclasses import dataclass
+import time
+import tracemalloc
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterator, TextIO
+
+# zstd payloads are optional: Python 3.14 ships compression.zstd, older
+# interpreters need the third-party zstandard package.
+try:
+    from compression import zstd as _stdlib_zstd
+except ImportError:
+    _stdlib_zstd = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 
 class TfvarsParseError(Exception):
     """Raised when the tfvars payload cannot be parsed."""
 
 
+class WorkflowDirectiveError(TfvarsParseError):
+    """Raised when a ``# workflow.`` directive comment is malformed."""
+
+
+class PackedPayloadError(TfvarsParseError):
+    """Raised when a packed (base64 + gzip/zstd) payload cannot be decoded."""
+
+
+@dataclass
+class WorkflowDirective:
+    """A ``# workflow.<path> = <value>`` comment captured while parsing."""
+
+    path: str
+    value: Any
+    line: int
+    column: int
+
+
+@dataclass
+class Expression:
+    """An HCL expression that is not a literal, kept as its source text."""
+
+    source: str
+
+
+@dataclass
+class HclAttribute:
+    name: str
+    value: Any
+    line: int
+    column: int
+
+
+@dataclass
+class HclBlock:
+    """A block such as ``variable "x" { ... }``; the file itself is a block with type ""."""
+
+    type: str
+    labels: list[str]
+    line: int
+    column: int
+    attributes: dict[str, HclAttribute] = field(default_factory=dict)
+    blocks: list["HclBlock"] = field(default_factory=list)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        attribute = self.attributes.get(name)
+        return default if attribute is None else attribute.value
+
+    def blocks_of(self, type_: str, *labels: str) -> list["HclBlock"]:
+        """Return the child blocks of ``type_`` whose labels start with ``labels``."""
+
+        return [
+            block
+            for block in self.blocks
+            if block.type == type_ and tuple(block.labels[: len(labels)]) == labels
+        ]
+
+
+# HCL number literals are ASCII only; str.isdigit() and \d also accept
+# characters such as '²' or '٣'.
+_ASCII_DIGITS = frozenset("0123456789")
+
+
 @dataclass
 class ParseState:
     text: str
@@ -26,30 +119,99 @@ class ParseState:
     def length(self) -> int:
         return len(self.text)
 
-    def remaining(self) -> str:
-        return self.text[self.index :]
-
 
 class TfvarsParser:
-    """Very small HCL parser that understands tfvars assignments."""
+    """Very small HCL parser that understands tfvars assignments.
+
+    When ``reader`` is given the parser streams its input: ``reader(size)``
+    returns up to roughly ``size`` more characters ("" at end of input) and
+    only the window holding the current assignment is kept in memory.
+    """
+
+    STREAM_CHUNK_SIZE = 64 * 1024
 
-    def __init__(self, text: str) -> None:
+    def __init__(self, text: str, reader: Callable[[int], str] | None = None) -> None:
         self.state = ParseState(text)
+        self.directives: list[WorkflowDirective] = []
+        self._capture_directives = False
+        self._line_cursor = (0, 1)
+        self._line_base = 0
+        self._reader = reader
 
     # Public API ---------------------------------------------------------
+    def parse_with_directives(self) -> tuple[dict[str, Any], list[WorkflowDirective]]:
+        """Parse assignments and collect workflow directives in one pass."""
+
+        values = dict(self.iter_assignments(directives=True))
+        return values, self.directives
+
     def parse_assignments(self) -> dict[str, Any]:
-        values: dict[str, Any] = {}
-        while True:
-            self._skip_ignored()
-            if self._eof():
-                break
-            key = self._parse_key()
-            self._skip_ignored()
-            self._expect_assignment()
-            value = self._parse_value()
-            values[key] = value
-            self._skip_ignored()
-        return values
+        return dict(self.iter_assignments())
+
+    def iter_assignments(self, *, directives: bool = False) -> Iterator[tuple[str, Any]]:
+        """Yield top-level ``(key, value)`` assignments as they are parsed.
+
+        With ``directives=True`` workflow directives are appended to
+        ``self.directives`` as they are met.
+        """
+
+        self._capture_directives = directives
+        try:
+            while True:
+                start = self.state.index
+                mark = len(self.directives)
+                try:
+                    item = self._parse_next_assignment()
+                except TfvarsParseError:
+                    # The error may only be the window ending mid-assignment.
+                    if self._fill(start, mark):
+                        continue
+                    raise
+                # A token that touches the end of the window may continue in
+                # the next chunk, so only accept it once more input is seen.
+                if self.state.index >= self.state.length and self._fill(start, mark):
+                    continue
+                if item is None:
+                    return
+                yield item
+        finally:
+            self._capture_directives = False
+
+    def _parse_next_assignment(self) -> tuple[str, Any] | None:
+        self._skip_ignored()
+        if self._eof():
+            return None
+        key = self._parse_key()
+        self._skip_ignored()
+        self._expect_assignment()
+        value = self._parse_value()
+        self._skip_ignored()
+        return key, value
+
+    def _fill(self, keep_from: int, directive_mark: int) -> bool:
+        """Drop consumed input before ``keep_from``'s line and read more.
+
+        Returns False once the reader is exhausted (or for in-memory input).
+        The read size doubles with the window, so re-parsing a large value
+        after each refill stays linear overall.
+        """
+
+        if self._reader is None:
+            return False
+        text = self.state.text
+        chunk = self._reader(max(self.STREAM_CHUNK_SIZE, len(text) - keep_from))
+        if not chunk:
+            self._reader = None
+            return False
+        # Keep the whole current line so directive detection and column
+        # numbers still see what precedes ``keep_from`` on that line.
+        line_start = text.rfind("\n", 0, keep_from) + 1
+        self._line_base += text.count("\n", 0, line_start)
+        self.state.text = text[line_start:] + chunk
+        self.state.index = keep_from - line_start
+        self._line_cursor = (0, 1)
+        del self.directives[directive_mark:]
+        return True
 
     def parse_value(self) -> Any:
         self._skip_ignored()
@@ -59,6 +221,143 @@ class TfvarsParser:
             raise TfvarsParseError("Unexpected trailing characters while parsing value")
         return value
 
+    def parse_body(self) -> HclBlock:
+        """Parse a ``.tf``/``.hcl`` body: attributes and labeled blocks.
+
+        Literal attribute values are parsed as in tfvars; anything else
+        (references, function calls, templates) is kept as an
+        :class:`Expression`. Attributes and blocks carry 1-based positions.
+        """
+
+        root = HclBlock("", [], 1, 1)
+        self._parse_block_body(root, nested=False)
+        return root
+
+    # Block parsing --------------------------------------------------------
+    def _parse_block_body(self, block: HclBlock, nested: bool) -> None:
+        while True:
+            self._skip_ignored()
+            if self._eof():
+                if nested:
+                    raise TfvarsParseError(
+                        f"Unterminated block '{block.type}' opened at line {block.line}, column {block.column}"
+                    )
+                return
+            if nested and self._match("}"):
+                return
+            line, column = self._position(self.state.index)
+            name = self._parse_key()
+            self._skip_ignored()
+            if self._match("="):
+                block.attributes[name] = HclAttribute(name, self._parse_expression(), line, column)
+                continue
+            labels: list[str] = []
+            while self._peek() == '"' or self._peek().isalpha() or self._peek() == "_":
+                labels.append(self._parse_key())
+                self._skip_ignored()
+            if not self._match("{"):
+                raise TfvarsParseError(f"Expected '=' or '{{' after '{name}' at line {line}, column {column}")
+            child = HclBlock(name, labels, line, column)
+            self._parse_block_body(child, nested=True)
+            block.blocks.append(child)
+
+    def _parse_expression(self) -> Any:
+        """Parse a literal value, or capture the expression's source text."""
+
+        self._skip_ignored()
+        start = self.state.index
+        try:
+            value = self._parse_value()
+        except TfvarsParseError:
+            value = None
+            self.state.index = start
+        else:
+            if self._at_line_end():
+                source = self.state.text[start : self.state.index]
+                if "${" not in source and "%{" not in source:
+                    return value
+            self.state.index = start
+        self._skip_expression()
+        source = self.state.text[start : self.state.index].rstrip()
+        if not source:
+            raise TfvarsParseError("Expected expression")
+        return Expression(source)
+
+    def _at_line_end(self) -> bool:
+        """True when only blanks, a comment or a closing brace follow on this line."""
+
+        text = self.state.text
+        index = self.state.index
+        while index < len(text) and text[index] in " \t\r":
+            index += 1
+        return index >= len(text) or text[index] in "\n#}" or text.startswith(("//", "/*"), index)
+
+    def _skip_expression(self) -> None:
+        """Advance to the end of the expression at the cursor.
+
+        The expression ends at a newline, comment or unmatched closing
+        bracket outside any brackets, strings and heredocs.
+        """
+
+        depth = 0
+        while not self._eof():
+            ch = self._peek()
+            if ch == '"':
+                self._skip_template()
+                continue
+            if ch == "<" and self.state.text.startswith("<<", self.state.index):
+                self._parse_heredoc()
+                if depth == 0:
+                    # The heredoc consumed its closing line.
+                    return
+                continue
+            if ch == "#" or self.state.text.startswith("//", self.state.index):
+                if depth == 0:
+                    return
+                self._skip_until_newline()
+                continue
+            if self._match("/*"):
+                self._skip_block_comment()
+                continue
+            if ch in "([{":
+                depth += 1
+            elif ch in ")]}":
+                if depth == 0:
+                    return
+                depth -= 1
+            elif ch == "\n" and depth == 0:
+                return
+            self._advance()
+
+    def _skip_template(self) -> None:
+        """Skip a quoted template, including nested ``${ ... }`` interpolations."""
+
+        self._advance()
+        while not self._eof():
+            ch = self._peek()
+            if ch == "\\":
+                self._advance(2)
+                continue
+            if ch == '"':
+                self._advance()
+                return
+            if ch in "$%" and self.state.text.startswith("{", self.state.index + 1):
+                self._advance(2)
+                depth = 1
+                while not self._eof() and depth:
+                    inner = self._peek()
+                    if inner == '"':
+                        self._skip_template()
+                        continue
+                    if inner == "{":
+                        depth += 1
+                    elif inner == "}":
+                        depth -= 1
+                    self._advance()
+                continue
+            self._advance()
+        raise TfvarsParseError("Unterminated string literal")
+
     # Internal helpers ---------------------------------------------------
     def _eof(self) -> bool:
         return self.state.index >= self.state.length
@@ -83,11 +382,11 @@ class TfvarsParser:
             if ch in " \t\r\n":
                 self._advance()
                 continue
-            if self._match("//"):
-                self._skip_until_newline()
-                continue
-            if ch == "#":
+            if ch == "#" or self.state.text.startswith("//", self.state.index):
+                start = self.state.index
                 self._skip_until_newline()
+                if self._capture_directives:
+                    self._record_directive(start)
                 continue
             if self._match("/*"):
                 self._skip_block_comment()
@@ -100,6 +399,60 @@ class TfvarsParser:
         if not self._eof():
             self._advance()
 
+    def _record_directive(self, start: int) -> None:
+        """Capture the comment at ``start`` when it is a workflow directive.
+
+        Only comments that open their own line count, matching how the
+        directives are documented for the ``TERRAFORM_TFVARS`` secret.
+        """
+
+        text = self.state.text
+        line_start = text.rfind("\n", 0, start) + 1
+        if text[line_start:start].strip():
+            return
+        end = text.find("\n", start)
+        if end == -1:
+            end = self.state.length
+        body = text[start + (1 if text[start] == "#" else 2) : end].strip()
+        if not body.startswith("workflow."):
+            return
+        line, column = self._position(start)
+        source = text[line_start:end].strip()
+        if "=" not in body:
+            raise WorkflowDirectiveError(
+                f"Invalid workflow directive (missing '=') at line {line}, column {column}: {source}"
+            )
+        key_path, value_raw = body[len("workflow.") :].split("=", 1)
+        saved_state = self.state
+        self.state = ParseState(value_raw.strip())
+        self._capture_directives = False
+        try:
+            value = self.parse_value()
+        except TfvarsParseError as exc:
+            raise WorkflowDirectiveError(
+                f"Unable to parse workflow directive '{source}' at line {line}, column {column}: {exc}"
+            ) from exc
+        finally:
+            self.state = saved_state
+            self._capture_directives = True
+        self.directives.append(WorkflowDirective(key_path.strip(), value, line, column))
+
+    def _position(self, index: int) -> tuple[int, int]:
+        """Return the 1-based line and column of ``index``.
+
+        Directives are met in increasing order, so newlines are counted
+        incrementally from the previous lookup instead of from the start.
+        """
+
+        text = self.state.text
+        cursor, line = self._line_cursor
+        if index < cursor:
+            cursor, line = 0, 1
+        line += text.count("\n", cursor, index)
+        self._line_cursor = (index, line)
+        column = index - (text.rfind("\n", 0, index) + 1) + 1
+        return self._line_base + line, column
+
     def _skip_block_comment(self) -> None:
         depth = 1
         while not self._eof() and depth > 0:
@@ -211,24 +564,24 @@ class TfvarsParser:
         if self._peek() == '-':
             self._advance()
         digits_seen = False
-        while not self._eof() and self._peek().isdigit():
+        while not self._eof() and self._peek() in _ASCII_DIGITS:
             digits_seen = True
             self._advance()
         if not digits_seen:
             raise TfvarsParseError("Invalid number literal")
         if not self._eof() and self._peek() == '.':
             self._advance()
-            if self._eof() or not self._peek().isdigit():
+            if self._eof() or self._peek() not in _ASCII_DIGITS:
                 raise TfvarsParseError("Invalid number literal")
-            while not self._eof() and self._peek().isdigit():
+            while not self._eof() and self._peek() in _ASCII_DIGITS:
                 self._advance()
         if not self._eof() and self._peek() in {'e', 'E'}:
             self._advance()
             if not self._eof() and self._peek() in {'+', '-'}:
                 self._advance()
-            if self._eof() or not self._peek().isdigit():
+            if self._eof() or self._peek() not in _ASCII_DIGITS:
                 raise TfvarsParseError("Invalid exponent in number literal")
-            while not self._eof() and self._peek().isdigit():
+            while not self._eof() and self._peek() in _ASCII_DIGITS:
                 self._advance()
         raw = self.state.text[start : self.state.index]
         if any(c in raw for c in '.eE'):
@@ -309,10 +662,376 @@ class TfvarsParser:
         return "\n".join(lines)
 
 
+_IGNORED_RE = re.compile(r"(?:[ \t\r\n]+|(?://|#)[^\n]*\n?)*")
+_LINE_COMMENT_RE = re.compile(r"(?://|#)[^\n]*")
+_BLOCK_COMMENT_TOKEN_RE = re.compile(r"/\*|\*/")
+_STRING_CHUNK_RE = re.compile(r'[^"\\]*')
+_IDENTIFIER_RE = re.compile(r"[\w-]+")
+_NUMBER_RE = re.compile(r"-?[0-9]+(?P<frac>\.[0-9]+)?(?P<exp>[eE][+-]?[0-9]+)?")
+_LITERAL_RE = re.compile(r"(?:true|false|null)(?=[ \t\r\n,\]}#/]|\Z)")
+_LITERAL_VALUES = {"true": True, "false": False, "null": None}
+_SIMPLE_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+_HEX_DIGITS = frozenset("0123456789abcdefABCDEF")
+
+
+class RegexTfvarsParser(TfvarsParser):
+    """Tfvars parser whose lexer consumes whole tokens with compiled regexes.
+
+    Produces the same values and ``TfvarsParseError`` messages as
+    :class:`TfvarsParser`, which steps through the input one character at a
+    time and is kept as the reference implementation.
+    """
+
+    def _skip_ignored(self) -> None:
+        text = self.state.text
+        start = self.state.index
+        while True:
+            end = _IGNORED_RE.match(text, start).end()
+            if self._capture_directives and text.find("workflow.", start, end) != -1:
+                for comment in _LINE_COMMENT_RE.finditer(text, start, end):
+                    self._record_directive(comment.start())
+            if not text.startswith("/*", end):
+                break
+            self.state.index = end + 2
+            self._skip_block_comment()
+            start = self.state.index
+        self.state.index = end
+
+    def _skip_block_comment(self) -> None:
+        depth = 1
+        for token in _BLOCK_COMMENT_TOKEN_RE.finditer(self.state.text, self.state.index):
+            depth += 1 if token.group() == "/*" else -1
+            if depth == 0:
+                self.state.index = token.end()
+                return
+        self.state.index = self.state.length
+        raise TfvarsParseError("Unterminated block comment")
+
+    def _parse_identifier(self) -> str:
+        match = _IDENTIFIER_RE.match(self.state.text, self.state.index)
+        if not match:
+            raise TfvarsParseError("Expected identifier")
+        self.state.index = match.end()
+        return match.group()
+
+    def _parse_value(self) -> Any:
+        self._skip_ignored()
+        if self._eof():
+            raise TfvarsParseError("Unexpected end of input while parsing value")
+        ch = self._peek()
+        if ch in "tfn":
+            match = _LITERAL_RE.match(self.state.text, self.state.index)
+            if match:
+                self.state.index = match.end()
+                return _LITERAL_VALUES[match.group()]
+            raise TfvarsParseError("Unsupported expression in tfvars value")
+        return super()._parse_value()
+
+    def _parse_string(self) -> str:
+        if not self._match('"'):
+            raise TfvarsParseError("Expected '\"' to start string")
+        text = self.state.text
+        start = self.state.index
+        end = text.find('"', start)
+        if end != -1 and text.find("\\", start, end) == -1:
+            self.state.index = end + 1
+            return text[start:end]
+        result: list[str] = []
+        index = start
+        length = self.state.length
+        while True:
+            chunk_end = _STRING_CHUNK_RE.match(text, index).end()
+            result.append(text[index:chunk_end])
+            if chunk_end >= length:
+                self.state.index = length
+                raise TfvarsParseError("Unterminated string literal")
+            if text[chunk_end] == '"':
+                self.state.index = chunk_end + 1
+                return "".join(result)
+            # Backslash escape.
+            if chunk_end + 1 >= length:
+                self.state.index = length
+                raise TfvarsParseError("Incomplete escape sequence in string")
+            esc = text[chunk_end + 1]
+            index = chunk_end + 2
+            simple = _SIMPLE_ESCAPES.get(esc)
+            if simple is not None:
+                result.append(simple)
+            elif esc == "u":
+                code = text[index : index + 4]
+                if len(code) != 4 or not _HEX_DIGITS.issuperset(code):
+                    self.state.index = index
+                    raise TfvarsParseError("Invalid unicode escape in string")
+                result.append(chr(int(code, 16)))
+                index += 4
+            else:
+                self.state.index = index
+                raise TfvarsParseError(f"Unsupported escape sequence \\{esc}")
+
+    def _parse_number(self) -> Any:
+        text = self.state.text
+        match = _NUMBER_RE.match(text, self.state.index)
+        if not match:
+            raise TfvarsParseError("Invalid number literal")
+        end = match.end()
+        next_ch = text[end : end + 1]
+        frac, exp = match.group("frac"), match.group("exp")
+        if frac is None and exp is None and next_ch == ".":
+            raise TfvarsParseError("Invalid number literal")
+        if exp is None and next_ch in ("e", "E"):
+            raise TfvarsParseError("Invalid exponent in number literal")
+        self.state.index = end
+        raw = match.group()
+        if frac is not None or exp is not None:
+            return float(raw)
+        return int(raw)
+
+    def _parse_heredoc(self) -> str:
+        if self._match("<<-"):
+            indent = True
+        elif self._match("<<"):
+            indent = False
+        else:
+            raise TfvarsParseError("Expected heredoc introducer")
+        label = self._parse_identifier()
+        text = self.state.text
+        length = self.state.length
+        newline = text.find("\n", self.state.index)
+        index = length if newline == -1 else newline + 1
+        lines: list[str] = []
+        while index < length:
+            end = text.find("\n", index)
+            if end == -1:
+                end = length
+            line = text[index:end]
+            check = line.lstrip("\t ") if indent else line
+            if check == label:
+                self.state.index = min(end + 1, length)
+                return "\n".join(lines)
+            lines.append(line)
+            index = end + 1 if end < length else end
+        self.state.index = length
+        raise TfvarsParseError("Unterminated heredoc")
+
+
+PARSER_ENGINES: dict[str, type[TfvarsParser]] = {
+    "regex": RegexTfvarsParser,
+    "legacy": TfvarsParser,
+}
+DEFAULT_PARSER_ENGINE = "regex"
+
+
+def _parser_engine() -> str:
+    """Return the engine selected by ``TFVARS_PARSER_ENGINE``.
+
+    ``compare`` runs the regex and legacy engines side by side and fails when
+    they disagree.
+    """
+
+    engine = (os.environ.get("TFVARS_PARSER_ENGINE") or DEFAULT_PARSER_ENGINE).strip().lower()
+    if engine != "compare" and engine not in PARSER_ENGINES:
+        choices = ", ".join(sorted([*PARSER_ENGINES, "compare"]))
+        _error(f"Unknown TFVARS_PARSER_ENGINE '{engine}'. Expected one of: {choices}.")
+        raise SystemExit(1)
+    return engine
+
+
+def _run_parser(engine: str, text: str, method: str) -> Any:
+    parser = PARSER_ENGINES[engine](text)
+    return getattr(parser, method)()
+
+
+def _compare_outcome(engine: str, text: str, method: str) -> tuple[str, Any]:
+    try:
+        return "ok", _run_parser(engine, text, method)
+    except (TfvarsParseError, ValueError) as exc:
+        return "error", exc
+
+
+def _parse_with_engine(text: str, method: str = "parse_assignments") -> Any:
+    """Parse ``text`` with the configured engine, raising ``TfvarsParseError``."""
+
+    engine = _parser_engine()
+    if engine != "compare":
+        return _run_parser(engine, text, method)
+    outcomes = {name: _compare_outcome(name, text, method) for name in PARSER_ENGINES}
+    reference = outcomes["legacy"]
+    for name, outcome in outcomes.items():
+        # repr() keeps int/float, key-order and exception-type differences visible.
+        if repr(outcome) != repr(reference):
+            _error(
+                f"Parser engines disagree ({name} vs legacy): "
+                f"{outcome[0]} {outcome[1]!r} != {reference[0]} {reference[1]!r}"
+            )
+            raise SystemExit(1)
+    if reference[0] == "error":
+        raise reference[1]
+    return reference[1]
+
+
 def _error(message: str) -> None:
     print(f"::error::{message}", file=sys.stderr)
 
 
+PROFILE_MODES = ("timing", "memory", "cprofile")
+DEFAULT_PROFILE_OUTPUT = "load_terraform_config.profile.json"
+
+
+class PhaseProfiler:
+    """Time named loader phases and optionally track allocations and calls.
+
+    Phases nest; a phase entered inside another is reported as
+    ``outer/inner``. Memory peaks come from ``tracemalloc`` and are reset at
+    the start of each phase.
+    """
+
+    def __init__(self, memory: bool = False, cprofile: bool = False) -> None:
+        self.memory = memory
+        self.cprofile = cprofile
+        self.phases: list[dict[str, Any]] = []
+        self.total_s = 0.0
+        self.stats: Any = None
+        self._stack: list[str] = []
+        self._peaks: list[int] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        self._stack.append(name)
+        record: dict[str, Any] = {"phase": "/".join(self._stack)}
+        # Reserve the slot so phases are reported in start order.
+        self.phases.append(record)
+        if self.memory:
+            self._fold_peak()
+            self._peaks.append(0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            if self.memory:
+                self._fold_peak()
+                peak = self._peaks.pop()
+                record["peak_memory_bytes"] = peak
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+            self._stack.pop()
+
+    def _fold_peak(self) -> None:
+        # Nested phases reset the tracemalloc peak, so carry it into the
+        # enclosing phase's running maximum first.
+        if self._peaks:
+            self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+
+    def run(self, func: Callable[[], None]) -> None:
+        profile = None
+        if self.memory:
+            tracemalloc.start()
+        if self.cprofile:
+            import cProfile
+
+            profile = cProfile.Profile()
+            profile.enable()
+        start = time.perf_counter()
+        try:
+            func()
+        finally:
+            self.total_s = time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+                import pstats
+
+                self.stats = pstats.Stats(profile)
+            if self.memory:
+                tracemalloc.stop()
+
+    def _top_functions(self, limit: int = 20) -> list[dict[str, Any]]:
+        if self.stats is None:
+            return []
+        rows = []
+        for (filename, line, function), (_, calls, _, cumulative, _) in self.stats.stats.items():
+            rows.append(
+                {
+                    "function": f"{Path(filename).name}:{line}({function})",
+                    "calls": calls,
+                    "cumulative_s": cumulative,
+                }
+            )
+        rows.sort(key=lambda row: row["cumulative_s"], reverse=True)
+        return rows[:limit]
+
+    def write_report(self, output: Path) -> None:
+        report = {
+            "total_s": self.total_s,
+            "phases": self.phases,
+            "top_functions": self._top_functions(),
+        }
+        _ensure_parent(output)
+        output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        if self.stats is not None:
+            self.stats.dump_stats(str(output.with_suffix(".prof")))
+        summary = os.environ.get("GITHUB_STEP_SUMMARY")
+        if summary:
+            with open(summary, "a", encoding="utf-8") as handle:
+                handle.write(self._markdown())
+
+    def _markdown(self) -> str:
+        lines = ["### load_terraform_config.py profile", ""]
+        if self.memory:
+            lines += ["| Phase | Time (ms) | Peak memory (KiB) |", "| --- | ---: | ---: |"]
+        else:
+            lines += ["| Phase | Time (ms) |", "| --- | ---: |"]
+        for record in self.phases:
+            row = f"| `{record['phase']}` | {record['seconds'] * 1000:.2f} |"
+            if self.memory:
+                row += f" {record['peak_memory_bytes'] / 1024:.1f} |"
+            lines.append(row)
+        lines.append(f"| **total** | {self.total_s * 1000:.2f} |" + (" |" if self.memory else ""))
+        top = self._top_functions(10)
+        if top:
+            lines += ["", "| Function | Calls | Cumulative (ms) |", "| --- | ---: | ---: |"]
+            for row in top:
+                lines.append(f"| `{row['function']}` | {row['calls']} | {row['cumulative_s'] * 1000:.2f} |")
+        return "\n".join(lines) + "\n\n"
+
+
+# Profiling is opt-in; ``_phase`` hands out a shared no-op context otherwise.
+_NULL_PHASE = contextlib.nullcontext()
+_PROFILER: PhaseProfiler | None = None
+
+
+def _phase(name: str) -> contextlib.AbstractContextManager[None]:
+    if _PROFILER is None:
+        return _NULL_PHASE
+    return _PROFILER.phase(name)
+
+
+def _profile_modes(requested: list[str] | None) -> set[str]:
+    """Return the profiling modes from ``--profile`` or ``TFVARS_PROFILE``."""
+
+    if requested is None:
+        raw = (os.environ.get("TFVARS_PROFILE") or "").strip().lower()
+        if raw in {"", "0", "off", "false", "no"}:
+            return set()
+        requested = ["timing"] if raw in {"1", "on", "true", "yes"} else raw.split(",")
+    modes = {mode.strip() for mode in requested if mode.strip()} or {"timing"}
+    unknown = modes.difference(PROFILE_MODES)
+    if unknown:
+        choices = ", ".join(PROFILE_MODES)
+        _error(f"Unknown profile mode '{sorted(unknown)[0]}'. Expected one of: {choices}.")
+        raise SystemExit(1)
+    return modes
+
+
 def _load_secret() -> str:
     raw = os.environ.get("TERRAFORM_TFVARS") or os.environ.get("TERRAFORM_TFVARS_JSON")
     if not raw:
@@ -321,38 +1040,223 @@ def _load_secret() -> str:
     return raw
 
 
-def _parse_tfvars(raw: str) -> dict[str, Any]:
-    parser = TfvarsParser(raw)
+# Packed payloads ----------------------------------------------------------------
+# GitHub rejects secrets larger than 48 KB.
+GITHUB_SECRET_MAX_BYTES = 48 * 1024
+PACKED_PAYLOAD_ENV = "TERRAFORM_TFVARS_PACKED"
+PACKED_PREFIXES = {"gzip+base64:": "gzip", "zstd+base64:": "zstd"}
+_CODEC_MAGIC = {b"\x1f\x8b": "gzip", b"\x28\xb5\x2f\xfd": "zstd"}
+# Base64 characters decoded per step; a multiple of 4.
+_PACKED_CHUNK_CHARS = 16 * 1024
+_ZSTD_ERRORS: tuple[type[Exception], ...] = tuple(
+    error
+    for error in (getattr(_stdlib_zstd, "ZstdError", None), getattr(zstandard, "ZstdError", None))
+    if error is not None
+)
+
+
+@dataclass(frozen=True)
+class PackedPayload:
+    """A base64-encoded, compressed tfvars payload, decoded lazily."""
+
+    encoded: str
+    label: str
+    codec: str | None = None  # None: detect from the magic bytes
+
+
+def _packed_payload() -> PackedPayload | None:
+    """Return the packed payload from the environment, if one was provided.
+
+    ``TERRAFORM_TFVARS_PACKED`` always holds a packed payload (the prefix is
+    optional there). ``TERRAFORM_TFVARS`` is packed only when it starts with
+    ``gzip+base64:`` or ``zstd+base64:``, which no tfvars file can.
+    """
+
+    for name in (PACKED_PAYLOAD_ENV, "TERRAFORM_TFVARS"):
+        raw = (os.environ.get(name) or "").strip()
+        if not raw:
+            continue
+        for prefix, codec in PACKED_PREFIXES.items():
+            if raw.startswith(prefix):
+                return PackedPayload(raw[len(prefix) :], f"{name} ({codec})", codec)
+        if name == PACKED_PAYLOAD_ENV:
+            return PackedPayload(raw, name)
+    return None
+
+
+def _zstd_available() -> bool:
+    return _stdlib_zstd is not None or zstandard is not None
+
+
+def _decompressor(codec: str) -> Any:
+    """Return an object with ``decompress(data)`` and ``eof`` for ``codec``."""
+
+    if codec == "gzip":
+        return zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    if _stdlib_zstd is not None:
+        return _stdlib_zstd.ZstdDecompressor()
+    if zstandard is not None:
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise PackedPayloadError(
+        "zstd payloads need Python 3.14+ or the 'zstandard' package (pip install zstandard)"
+    )
+
+
+def _packed_byte_reader(payload: PackedPayload) -> Callable[[int], bytes]:
+    """Return ``read_bytes(size)`` over the decompressed payload.
+
+    Base64 is decoded a slice at a time and each slice goes straight through
+    the decompressor, so only one chunk of compressed and decompressed bytes
+    is alive at once. ``size`` is advisory; a call returns what one slice
+    inflates to.
+    """
+
+    encoded = payload.encoded
+    position = 0
+    pending = ""
+    decompressor: Any = None
+
+    def next_compressed() -> bytes:
+        nonlocal position, pending
+        while position < len(encoded):
+            piece = encoded[position : position + _PACKED_CHUNK_CHARS]
+            position += len(piece)
+            pending += "".join(piece.split())
+            usable = len(pending) - len(pending) % 4
+            if usable:
+                data, pending = pending[:usable], pending[usable:]
+                return base64.b64decode(data, validate=True)
+        if pending:
+            raise PackedPayloadError("base64 text is truncated")
+        return b""
+
+    def read_bytes(size: int) -> bytes:
+        nonlocal decompressor
+        try:
+            while True:
+                data = next_compressed()
+                if not data:
+                    if decompressor is not None and not getattr(decompressor, "eof", True):
+                        raise PackedPayloadError("compressed stream is truncated")
+                    return b""
+                if decompressor is None:
+                    codec = payload.codec or next(
+                        (name for magic, name in _CODEC_MAGIC.items() if data.startswith(magic)), None
+                    )
+                    if codec is None:
+                        raise PackedPayloadError("payload is neither gzip nor zstd data")
+                    decompressor = _decompressor(codec)
+                output = decompressor.decompress(data)
+                if output:
+                    return output
+        except PackedPayloadError:
+            raise
+        except (binascii.Error, ValueError, EOFError, zlib.error, *_ZSTD_ERRORS) as exc:
+            raise PackedPayloadError(str(exc)) from exc
+
+    return read_bytes
+
+
+def _pack_encodings(data: bytes) -> dict[str, str]:
+    """Return every encoding of ``data`` that the loader accepts, by name."""
+
+    encodings = {"raw": data.decode("utf-8")}
+    packed = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    if _stdlib_zstd is not None:
+        packed["zstd"] = _stdlib_zstd.compress(data, level=19)
+    elif zstandard is not None:
+        packed["zstd"] = zstandard.ZstdCompressor(level=19).compress(data)
+    for codec, blob in packed.items():
+        encodings[codec] = f"{codec}+base64:" + base64.b64encode(blob).decode("ascii")
+    return encodings
+
+
+def _pack(source: str) -> None:
+    """Print the smallest encoding of the tfvars file at ``source``."""
+
+    label = _input_label(source)
     try:
-        return parser.parse_assignments()
+        data = sys.stdin.buffer.read() if source == "-" else Path(source).read_bytes()
+        text = data.decode("utf-8")
+    except OSError as exc:
+        _error(f"Unable to read tfvars input {label}: {exc}")
+        raise SystemExit(1)
+    except UnicodeDecodeError as exc:
+        _error(f"Tfvars input {label} is not valid UTF-8: {exc}")
+        raise SystemExit(1)
+    # Refuse to pack something the loader would reject after unpacking.
+    _parse_payload(text)
+    encodings = _pack_encodings(data)
+    if not _zstd_available():
+        print("zstd unavailable (needs Python 3.14+ or 'zstandard'); comparing raw and gzip only.", file=sys.stderr)
+    for name, encoded in sorted(encodings.items(), key=lambda item: len(item[1])):
+        print(f"{name:<5} {len(encoded.encode('utf-8')):>9} bytes", file=sys.stderr)
+    best = min(encodings, key=lambda name: len(encodings[name]))
+    size = len(encodings[best].encode("utf-8"))
+    if size > GITHUB_SECRET_MAX_BYTES:
+        print(
+            f"::warning::The smallest encoding ({best}, {size} bytes) is still over the "
+            f"{GITHUB_SECRET_MAX_BYTES}-byte GitHub secret limit.",
+            file=sys.stderr,
+        )
+    sys.stdout.write(encodings[best])
+    if sys.stdout.isatty():
+        sys.stdout.write("\n")
+
+
+# A tfvars payload is a list of assignments, so a leading ``{`` means JSON.
+_JSON_PAYLOAD_RE = re.compile(r"\s*\{")
+
+
+def _is_json_payload(text: str) -> bool:
+    return _JSON_PAYLOAD_RE.match(text) is not None
+
+
+def _finite_json_float(raw: str) -> float:
+    value = float(raw)
+    if not math.isfinite(value):
+        raise ValueError(f"number {raw} is out of range")
+    return value
+
+
+def _reject_json_constant(name: str) -> Any:
+    # json accepts NaN/Infinity by default; HCL has no spelling for them.
+    raise ValueError(f"{name} is not a valid number")
+
+
+def _parse_json_payload(raw: str, label: str) -> dict[str, Any]:
+    try:
+        return json.loads(raw, parse_float=_finite_json_float, parse_constant=_reject_json_constant)
+    except ValueError as exc:
+        _error(f"Failed to parse {label} as JSON: {exc}")
+        raise SystemExit(1)
+
+
+def _parse_payload(raw: str) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Parse tfvars assignments and ``workflow.*`` metadata in one pass.
+
+    JSON payloads (``.tfvars.json`` syntax) go straight to the ``json``
+    module; they cannot carry ``workflow.*`` comment directives.
+    """
+
+    if _is_json_payload(raw):
+        return _parse_json_payload(raw, "TERRAFORM_TFVARS"), {}
+    try:
+        tfvars, directives = _parse_with_engine(raw, "parse_with_directives")
+    except WorkflowDirectiveError as exc:
+        _error(str(exc))
+        raise SystemExit(1)
     except TfvarsParseError as exc:
         _error(f"Failed to parse TERRAFORM_TFVARS as tfvars: {exc}")
         raise SystemExit(1)
+    with _phase("metadata"):
+        return tfvars, _metadata_from_directives(directives)
 
 
-def _parse_metadata(raw: str) -> dict[str, Any]:
+def _metadata_from_directives(directives: list[WorkflowDirective]) -> dict[str, Any]:
     metadata: dict[str, Any] = {}
-    for line in raw.splitlines():
-        stripped = line.strip()
-        body = None
-        if stripped.startswith("#"):
-            body = stripped[1:].strip()
-        elif stripped.startswith("//"):
-            body = stripped[2:].strip()
-        if not body or not body.startswith("workflow."):
-            continue
-        if "=" not in body:
-            _error(f"Invalid workflow directive (missing '='): {line.strip()}")
-            raise SystemExit(1)
-        key_path, value_raw = body[len("workflow.") :].split("=", 1)
-        key_path = key_path.strip()
-        value_raw = value_raw.strip()
-        try:
-            value = TfvarsParser(value_raw).parse_value()
-        except TfvarsParseError as exc:
-            _error(f"Unable to parse workflow directive '{line.strip()}': {exc}")
-            raise SystemExit(1)
-        _metadata_set(metadata, key_path.split('.'), value)
+    for directive in directives:
+        _metadata_set(metadata, directive.path.split('.'), directive.value)
     return metadata
 
 
@@ -388,12 +1292,12 @@ def _append_env(lines: list[str]) -> None:
                 handle.write("\n")
 
 
-def _format_with_terraform(path: Path) -> None:
-    """Run ``terraform fmt`` on ``path`` when the CLI is available."""
+def _format_with_terraform(path: Path) -> bool:
+    """Run ``terraform fmt`` on ``path`` when the CLI is available; True if it ran."""
 
     terraform = shutil.which("terraform")
     if not terraform:
-        return
+        return False
     try:
         subprocess.run(
             [terraform, "fmt", str(path)],
@@ -409,6 +1313,62 @@ def _format_with_terraform(path: Path) -> None:
         if details:
             message = f"{message} Details: {details}"
         print(f"::warning::{message}", file=sys.stderr)
+        return False
+    return True
+
+
+def _verify_with_terraform(path: Path) -> None:
+    """Compare ``path`` with ``terraform fmt`` and reformat it on a mismatch."""
+
+    terraform = shutil.which("terraform")
+    if not terraform:
+        print("::warning::terraform CLI not found; cannot verify the generated tfvars.", file=sys.stderr)
+        return
+    try:
+        result = subprocess.run(
+            [terraform, "fmt", "-check", "-diff", str(path)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+    except OSError as exc:
+        print(f"::warning::Failed to run terraform fmt -check on {path}: {exc}", file=sys.stderr)
+        return
+    if result.returncode == 0:
+        return
+    diff = (result.stdout + result.stderr).decode("utf-8", "ignore").strip()
+    print(
+        f"::warning::Generated {path} differs from terraform fmt output; reformatting.\n{diff}",
+        file=sys.stderr,
+    )
+    _format_with_terraform(path)
+
+
+def _finalize_tfvars_file(path: Path, verify_with_terraform: bool, round_trips: bool) -> None:
+    """Only spend a ``terraform fmt`` subprocess when asked to or when needed.
+
+    Output that fails the self-check must be repaired by ``terraform fmt``
+    and parse afterwards; otherwise Terraform would read a broken var-file.
+    """
+
+    if round_trips:
+        if verify_with_terraform:
+            with _phase("terraform_fmt"):
+                _verify_with_terraform(path)
+        return
+    print(
+        f"::warning::Generated {path} failed the emitter self-check; running terraform fmt.",
+        file=sys.stderr,
+    )
+    with _phase("terraform_fmt"):
+        repaired = _format_with_terraform(path)
+    if repaired:
+        try:
+            RegexTfvarsParser(path.read_text(encoding="utf-8")).parse_assignments()
+        except TfvarsParseError:
+            repaired = False
+    if not repaired:
+        _error(f"Generated {path} failed the emitter self-check and terraform fmt could not repair it.")
+        raise SystemExit(1)
 
 
 def _serialize_for_env(value: Any) -> str:
@@ -448,109 +1408,337 @@ def _indent(level: int) -> str:
     return "  " * level
 
 
-def _format_list(value: list[Any], level: int) -> str:
+def _is_multiline(value: Any) -> bool:
+    return isinstance(value, (dict, list)) and bool(value)
+
+
+def _alignment_widths(keys: list[str], values: list[Any]) -> list[int]:
+    """Return the width each key is padded to, the way ``terraform fmt`` does.
+
+    ``terraform fmt`` aligns ``=`` across a run of consecutive single-line
+    assignments; an assignment that opens a multi-line value is left
+    unpadded and ends the run.
+    """
+
+    widths = [len(key) for key in keys]
+    run_start = 0
+    for index, value in enumerate([*values, None]):
+        if index < len(values) and not _is_multiline(value):
+            continue
+        if index > run_start:
+            width = max(widths[run_start:index])
+            widths[run_start:index] = [width] * (index - run_start)
+        run_start = index + 1
+    return widths
+
+
+def _write_list(out: TextIO, value: list[Any], level: int) -> None:
     if not value:
-        return "[]"
-    lines: list[str] = ["["]
+        out.write("[]")
+        return
+    out.write("[\n")
+    indent = _indent(level + 1)
     last_index = len(value) - 1
     for index, item in enumerate(value):
-        rendered = _format_value(item, level + 1).splitlines()
-        indent = _indent(level + 1)
-        suffix = "," if index != last_index else ""
-        if len(rendered) == 1:
-            lines.append(f"{indent}{rendered[0]}{suffix}")
-            continue
-        lines.append(f"{indent}{rendered[0]}")
-        for inner in rendered[1:-1]:
-            lines.append(inner)
-        lines.append(f"{rendered[-1]}{suffix}")
-    lines.append(f"{_indent(level)}]")
-    return "\n".join(lines)
+        out.write(indent)
+        _write_value(out, item, level + 1)
+        out.write(",\n" if index != last_index else "\n")
+    out.write(f"{_indent(level)}]")
 
 
-def _format_object(value: dict[str, Any], level: int) -> str:
+def _write_object(out: TextIO, value: dict[str, Any], level: int) -> None:
     if not value:
-        return "{}"
-    lines: list[str] = ["{"]
-    keys = list(value.keys())
-    formatted_keys = [_format_key(str(key)) for key in keys]
-    padding = 0
-    if formatted_keys:
-        padding = max(len(key) for key in formatted_keys)
-    for original_key, formatted_key in zip(keys, formatted_keys):
-        rendered = _format_value(value[original_key], level + 1).splitlines()
-        indent = _indent(level + 1)
-        pad = " " * (padding - len(formatted_key))
-        prefix = f"{indent}{formatted_key}{pad} = "
-        if len(rendered) == 1:
-            lines.append(f"{prefix}{rendered[0]}")
-            continue
-        lines.append(f"{prefix}{rendered[0]}")
-        for inner in rendered[1:]:
-            lines.append(inner)
-    lines.append(f"{_indent(level)}}}")
-    return "\n".join(lines)
+        out.write("{}")
+        return
+    formatted_keys = [_format_key(str(key)) for key in value]
+    items = list(value.values())
+    widths = _alignment_widths(formatted_keys, items)
+    indent = _indent(level + 1)
+    out.write("{\n")
+    for item, formatted_key, width in zip(items, formatted_keys, widths):
+        out.write(f"{indent}{formatted_key.ljust(width)} = ")
+        _write_value(out, item, level + 1)
+        out.write("\n")
+    out.write(f"{_indent(level)}}}")
+
 
+def _write_value(out: TextIO, value: Any, level: int = 0) -> None:
+    """Write ``value`` to ``out`` in a single walk of the value tree.
+
+    Nested values are written in place at their final indentation, so each
+    node is emitted once regardless of how deeply it is nested.
+    """
 
-def _format_value(value: Any, level: int = 0) -> str:
     if isinstance(value, dict):
-        return _format_object(value, level)
-    if isinstance(value, list):
-        return _format_list(value, level)
-    return _format_scalar(value)
+        _write_object(out, value, level)
+    elif isinstance(value, list):
+        _write_list(out, value, level)
+    else:
+        out.write(_format_scalar(value))
+
+
+class TfvarsWriter:
+    """Write top-level assignments in ``terraform fmt`` canonical layout.
+
+    Single-line assignments are held back until their alignment run ends, so
+    assignments can be written one at a time (as the streaming loader does)
+    and still line up like a whole-file ``terraform fmt`` pass.
+    """
+
+    def __init__(self, out: TextIO) -> None:
+        self.out = out
+        self._pending: list[tuple[str, str]] = []
+        self._written = False
+
+    def write(self, key: str, value: Any) -> None:
+        self._written = True
+        if not _is_multiline(value):
+            buffer = io.StringIO()
+            _write_value(buffer, value, 0)
+            self._pending.append((key, buffer.getvalue()))
+            return
+        self._flush()
+        self.out.write(f"{key} = ")
+        _write_value(self.out, value, 0)
+        self.out.write("\n")
+
+    def close(self) -> None:
+        self._flush()
+        if not self._written:
+            self.out.write("\n")
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        width = max(len(key) for key, _ in self._pending)
+        for key, rendered in self._pending:
+            self.out.write(f"{key.ljust(width)} = {rendered}\n")
+        self._pending.clear()
+
+
+def _write_tfvars(tfvars: dict[str, Any], out: TextIO) -> None:
+    writer = TfvarsWriter(out)
+    for key, value in tfvars.items():
+        writer.write(key, value)
+    writer.close()
 
 
 def _dump_tfvars(tfvars: dict[str, Any]) -> str:
-    lines: list[str] = []
+    buffer = io.StringIO()
+    _write_tfvars(tfvars, buffer)
+    return buffer.getvalue()
+
+
+class TfvarsJsonWriter:
+    """Write top-level assignments as a ``.tfvars.json`` object.
+
+    Each variable goes on its own line with a compact value: ``json.dumps``
+    only uses its C encoder when no ``indent`` is requested.
+    """
+
+    def __init__(self, out: TextIO) -> None:
+        self.out = out
+        self._written = False
+
+    def write(self, key: str, value: Any) -> None:
+        self.out.write(",\n  " if self._written else "{\n  ")
+        self._written = True
+        self.out.write(f"{json.dumps(key, ensure_ascii=False)}: {json.dumps(value, ensure_ascii=False)}")
+
+    def close(self) -> None:
+        self.out.write("\n}\n" if self._written else "{}\n")
+
+
+def _write_tfvars_json(tfvars: dict[str, Any], out: TextIO) -> None:
+    writer = TfvarsJsonWriter(out)
     for key, value in tfvars.items():
-        rendered = _format_value(value, 0).splitlines()
-        if not rendered:
-            continue
-        lines.append(f"{key} = {rendered[0]}")
-        for inner in rendered[1:]:
-            lines.append(inner)
-    return "\n".join(lines) + "\n"
-
-
-def main() -> None:
-    raw = _load_secret()
-    tfvars = _parse_tfvars(raw)
-    # Keep the original assume_role_arn for GH credential configuration,
-    # but scrub it from the generated tfvars file to prevent provider-level
-    # re-assume during CI runs where the workflow already assumes the role.
-    original_assume_role = tfvars.get("assume_role_arn")
+        writer.write(key, value)
+    writer.close()
+
+
+TFVARS_WRITERS: dict[str, type[TfvarsWriter] | type[TfvarsJsonWriter]] = {
+    "hcl": TfvarsWriter,
+    "json": TfvarsJsonWriter,
+}
+DEFAULT_OUTPUT_FORMAT = "hcl"
+
+
+def _output_format(requested: str | None) -> str:
+    """Return the var-file format from ``--output-format`` or ``TF_VARS_FORMAT``."""
+
+    output_format = (requested or os.environ.get("TF_VARS_FORMAT") or DEFAULT_OUTPUT_FORMAT).strip().lower()
+    if output_format not in TFVARS_WRITERS:
+        choices = ", ".join(sorted(TFVARS_WRITERS))
+        _error(f"Unknown tfvars output format '{output_format}'. Expected one of: {choices}.")
+        raise SystemExit(1)
+    return output_format
+
+
+def _round_trips(rendered: str, tfvars: dict[str, Any]) -> bool:
+    """Self-check that ``rendered`` parses back to exactly ``tfvars``.
+
+    A failure means the emitter produced something ``terraform fmt`` may
+    need to repair, so the caller falls back to running it.
+    """
+
+    try:
+        reparsed = RegexTfvarsParser(rendered).parse_assignments()
+    except TfvarsParseError:
+        return False
+    return repr(reparsed) == repr(tfvars)
+
+
+def _scrub_assume_role(key: str, value: Any) -> Any:
+    """Return the value to write for ``key`` in the generated var-file.
+
+    Keep the original assume_role_arn for GH credential configuration, but
+    scrub it from the generated tfvars file to prevent provider-level
+    re-assume during CI runs where the workflow already assumes the role.
+    """
+
     if (
-        isinstance(original_assume_role, str)
-        and original_assume_role
+        key == "assume_role_arn"
+        and isinstance(value, str)
+        and value
         and os.environ.get("GITHUB_ACTIONS") == "true"
     ):
         # Ensure subsequent Terraform CLI calls using -var-file do NOT pass a
         # non-empty assume_role_arn to the provider.
-        tfvars["assume_role_arn"] = ""
-    metadata = _parse_metadata(raw)
+        return ""
+    return value
+
+
+def _tfvar_env_entry(key: str, value: Any) -> str:
+    env_key = f"TF_VAR_{key}"
+    serialized = _serialize_for_env(value)
+    if isinstance(value, str):
+        return f"{env_key}={serialized}"
+    return f"{env_key}<<EOF\n{serialized}\nEOF"
+
+
+# Variables that workflow steps and scripts read from the environment, so they
+# are exported whatever their size.
+_ALWAYS_EXPORTED_TFVARS = frozenset(
+    {
+        "region",
+        "assume_role_arn",
+        "vpc_id",
+        "subnet_ids",
+        "cluster_name",
+        "collector_sg_name",
+        "consumer_sg_name",
+    }
+)
+DEFAULT_EXPORT_MAX_BYTES = 4096
+
+
+def _export_max_bytes(requested: int | None) -> int:
+    if requested is not None:
+        return requested
+    raw = os.environ.get("TFVARS_EXPORT_MAX_BYTES")
+    if not raw:
+        return DEFAULT_EXPORT_MAX_BYTES
+    try:
+        return int(raw)
+    except ValueError:
+        _error(f"TFVARS_EXPORT_MAX_BYTES must be an integer, got '{raw}'.")
+        raise SystemExit(1)
+
 
+def _spill_path(tf_vars_file: Path) -> Path:
+    configured = os.environ.get("TF_VARS_SPILL_FILE")
+    if configured:
+        return Path(configured)
+    return tf_vars_file.with_name("tfvars.spilled.json")
+
+
+class TfvarExporter:
+    """Decide per variable whether to export ``TF_VAR_<key>`` or spill it.
+
+    Values whose env entry exceeds ``max_bytes`` are left to the var-file
+    (which Terraform reads anyway) and collected in a JSON side file for
+    workflow steps, instead of being injected into every later process
+    environment. ``max_bytes <= 0`` exports everything.
+    """
+
+    def __init__(self, max_bytes: int, spill_file: Path) -> None:
+        self.max_bytes = max_bytes
+        self.spill_file = spill_file
+        self.exported: list[tuple[str, int]] = []
+        self.spilled: list[tuple[str, int]] = []
+        self._handle: TextIO | None = None
+        self._writer: TfvarsJsonWriter | None = None
+
+    def entry(self, key: str, value: Any) -> str | None:
+        """Return the ``GITHUB_ENV`` entry for ``key``, or None if it was spilled."""
+
+        line = _tfvar_env_entry(key, value)
+        size = len(line.encode("utf-8"))
+        if self.max_bytes <= 0 or size <= self.max_bytes or key in _ALWAYS_EXPORTED_TFVARS:
+            self.exported.append((key, size))
+            return line
+        if self._writer is None:
+            _ensure_parent(self.spill_file)
+            self._handle = self.spill_file.open("w", encoding="utf-8")
+            self._writer = TfvarsJsonWriter(self._handle)
+        self._writer.write(key, value)
+        self.spilled.append((key, size))
+        return None
+
+    def close(self) -> list[str]:
+        """Finish the side file and return the env lines that point to it."""
+
+        if self._writer is None or self._handle is None:
+            return []
+        self._writer.close()
+        self._handle.close()
+        self._writer = None
+        return [f"TF_VARS_SPILL_FILE={self.spill_file}"]
+
+    def report(self, tf_vars_file: Path) -> None:
+        exported_bytes = sum(size for _, size in self.exported)
+        spilled_bytes = sum(size for _, size in self.spilled)
+        print(
+            f"TF_VAR_* exports: {len(self.exported)} exported ({exported_bytes} bytes), "
+            f"{len(self.spilled)} spilled ({spilled_bytes} bytes); threshold {self.max_bytes} bytes."
+        )
+        for key, size in self.exported:
+            print(f"  exported  TF_VAR_{key:<32} {size:>10} bytes")
+        for key, size in self.spilled:
+            print(f"  spilled   TF_VAR_{key:<32} {size:>10} bytes -> {tf_vars_file}, {self.spill_file}")
+
+
+def _output_paths(output_format: str = DEFAULT_OUTPUT_FORMAT) -> tuple[Path, Path]:
     tf_vars_file = Path(os.environ.get("TF_VARS_FILE", "ci.auto.tfvars"))
+    if output_format == "json" and tf_vars_file.suffix != ".json":
+        # Terraform picks the var-file syntax from the .json suffix.
+        tf_vars_file = tf_vars_file.with_name(f"{tf_vars_file.name}.json")
     backend_file = Path(os.environ.get("TF_BACKEND_FILE", "backend.auto.tfbackend"))
+    return tf_vars_file, backend_file
 
-    _ensure_parent(tf_vars_file)
-    formatted_tfvars = _dump_tfvars(tfvars)
-    tf_vars_file.write_text(formatted_tfvars, encoding="utf-8")
-    _format_with_terraform(tf_vars_file)
 
-    env_lines: list[str] = []
+def _workflow_env_lines(
+    tfvars: dict[str, Any],
+    original_assume_role: Any,
+    metadata: dict[str, Any],
+    tf_vars_file: Path,
+    backend_file: Path,
+) -> list[str]:
+    """Build the GITHUB_ENV lines that follow the ``TF_VAR_*`` exports.
 
-    for key, value in tfvars.items():
-        env_key = f"TF_VAR_{key}"
-        serialized = _serialize_for_env(value)
-        if isinstance(value, str):
-            env_lines.append(f"{env_key}={serialized}")
-        else:
-            env_lines.append(f"{env_key}<<EOF\n{serialized}\nEOF")
+    Writes the backend config file when ``workflow.backend`` directives are
+    present.
+    """
+
+    env_lines: list[str] = []
 
     region = tfvars.get("region")
     if isinstance(region, str) and region:
         env_lines.append(f"AWS_REGION={region}")
         env_lines.append(f"AWS_REGION_EFFECTIVE={region}")
+    vpc_id = tfvars.get("vpc_id")
+    if isinstance(vpc_id, str) and vpc_id:
+        env_lines.append(f"VPC_ID={vpc_id}")
 
     # Use the original (pre-scrubbed) value to drive GH credential assumption.
     if isinstance(original_assume_role, str) and original_assume_role:
@@ -593,8 +1781,9 @@ def main() -> None:
             elif lowered == "region" and isinstance(value, str) and value:
                 backend_region = value
         if backend_lines:
-            _ensure_parent(backend_file)
-            backend_file.write_text("\n".join(backend_lines) + "\n", encoding="utf-8")
+            with _phase("backend_file"):
+                _ensure_parent(backend_file)
+                backend_file.write_text("\n".join(backend_lines) + "\n", encoding="utf-8")
             env_lines.append(f"TF_BACKEND_FILE={backend_file}")
 
     backend_bucket = (
@@ -638,8 +1827,1237 @@ def main() -> None:
         env_lines.append(f"USE_EXISTING={'true' if use_existing else 'false'}")
 
     env_lines.append(f"TF_VARS_FILE={tf_vars_file}")
+    return env_lines
+
+
+# Capacity report -----------------------------------------------------------------
+_CAPACITY_SCOPE_KEYS = ("producer_topic_prefixes", "consumer_group_names")
+
+
+def _capacity_inputs(tfvars: dict[str, Any], metadata: dict[str, Any]) -> dict[str, Any] | None:
+    """Return what the capacity report needs, or None without ``workflow.capacity``.
+
+    The inputs are small and JSON-safe, so cache entries keep them and a
+    cache hit prints the same report.
+    """
+
+    if "capacity" not in metadata:
+        return None
+    return {
+        "spec": metadata["capacity"],
+        "tfvars": {key: tfvars[key] for key in _CAPACITY_SCOPE_KEYS if key in tfvars},
+    }
+
+
+def _capacity_report(inputs: dict[str, Any] | None) -> None:
+    """Print the MSK Serverless capacity plan for the ``workflow.capacity`` directives.
+
+    Findings are warnings; ``workflow.capacity.strict = true`` fails the load
+    when anything would be throttled.
+    """
+
+    if inputs is None:
+        return
+    # Only payloads with capacity directives pay for the import.
+    import capacity_plan
+
+    try:
+        plan = capacity_plan.build_plan(inputs["spec"], inputs["tfvars"])
+    except capacity_plan.CapacitySpecError as exc:
+        _error(f"Invalid workflow.capacity directive: {exc}")
+        raise SystemExit(1)
+    capacity_plan.print_plan(plan)
+    if plan.throttled and inputs["spec"].get("strict") is True:
+        _error("The workflow.capacity traffic exceeds MSK Serverless quotas; see the capacity plan above.")
+        raise SystemExit(1)
+
+
+# Tfvars keys that the workflow env lines and the capacity report read back
+# after the TF_VAR_* exports.
+_STREAM_RETAINED_KEYS = frozenset(
+    {"region", "vpc_id", "TF_BACKEND_BUCKET", "S3_BUCKET", "TF_BACKEND_KEY", "TF_BACKEND_REGION"}
+    | set(_CAPACITY_SCOPE_KEYS)
+)
+
+
+def _peek_reader(reader: Callable[[int], str]) -> tuple[str, Callable[[int], str]]:
+    """Read up to the first non-blank chunk and return it with a replaying reader."""
+
+    consumed: list[str] = []
+    while True:
+        chunk = reader(TfvarsParser.STREAM_CHUNK_SIZE)
+        consumed.append(chunk)
+        if not chunk or not chunk.isspace():
+            break
+    pending = "".join(consumed)
+    head = pending
+
+    def read(size: int) -> str:
+        nonlocal pending
+        if pending:
+            text, pending = pending, ""
+            return text
+        return reader(size)
+
+    return head, read
+
+
+def _input_label(source: str | PackedPayload) -> str:
+    if isinstance(source, PackedPayload):
+        return source.label
+    return "standard input" if source == "-" else source
+
+
+@contextmanager
+def _open_input_reader(source: str | PackedPayload) -> Iterator[Callable[[int], str]]:
+    """Yield a ``reader(size) -> str`` over ``source`` (a path, ``-`` or a packed payload).
+
+    Files are memory-mapped and decoded chunk by chunk, and packed payloads
+    are inflated chunk by chunk, so the loader never materializes the whole
+    payload as one ``str``.
+    """
+
+    decoder = codecs.getincrementaldecoder("utf-8")()
+
+    def _reader(read_bytes: Callable[[int], bytes]) -> Callable[[int], str]:
+        def read(size: int) -> str:
+            while True:
+                data = read_bytes(size)
+                text = decoder.decode(data, final=not data)
+                # A chunk can end inside a multi-byte character.
+                if text or not data:
+                    return text
+
+        return read
+
+    if isinstance(source, PackedPayload):
+        yield _reader(_packed_byte_reader(source))
+        return
+    if source == "-":
+        yield _reader(sys.stdin.buffer.read)
+        return
+    with open(source, "rb") as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            yield _reader(lambda size: b"")
+            return
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            offset = 0
+
+            def read_bytes(size: int) -> bytes:
+                nonlocal offset
+                chunk = buffer[offset : offset + size]
+                offset += len(chunk)
+                return chunk
+
+            yield _reader(read_bytes)
+
+
+def _stream_tfvars(
+    source: str | PackedPayload,
+    tf_vars_file: Path,
+    env_handle: TextIO,
+    exporter: TfvarExporter,
+    output_format: str = DEFAULT_OUTPUT_FORMAT,
+    validator: TfvarsValidator | None = None,
+) -> tuple[dict[str, Any], Any, dict[str, Any], bool]:
+    """Parse ``source`` lazily, writing each assignment as soon as it is parsed.
+
+    Returns the handful of small string values the workflow env lines need,
+    the original ``assume_role_arn``, the workflow metadata and whether every
+    assignment passed the emitter self-check. JSON input is decoded in one
+    ``json.loads`` call (the module has no incremental parser) and then
+    written out the same way.
+    """
+
+    engine = _parser_engine()
+    if engine == "compare":
+        _error("TFVARS_PARSER_ENGINE=compare is not supported with --input.")
+        raise SystemExit(1)
+    retained: dict[str, Any] = {}
+    original_assume_role: Any = None
+    round_trips = True
+    directives: list[WorkflowDirective] = []
+    label = _input_label(source)
+    try:
+        with _open_input_reader(source) as reader, tf_vars_file.open("w", encoding="utf-8") as out:
+            head, reader = _peek_reader(reader)
+            if _is_json_payload(head):
+                remainder = "".join(iter(lambda: reader(TfvarsParser.STREAM_CHUNK_SIZE), ""))
+                assignments: Iterator[tuple[str, Any]] = iter(
+                    _parse_json_payload(remainder, label).items()
+                )
+            else:
+                parser = PARSER_ENGINES[engine]("", reader=reader)
+                directives = parser.directives
+                assignments = parser.iter_assignments(directives=True)
+            writer = TFVARS_WRITERS[output_format](out)
+            for key, value in assignments:
+                if validator is not None:
+                    validator.check(key, value)
+                if key == "assume_role_arn":
+                    original_assume_role = value
+                value = _scrub_assume_role(key, value)
+                if key in _STREAM_RETAINED_KEYS:
+                    retained[key] = value
+                if round_trips and output_format == "hcl":
+                    round_trips = _round_trips(_dump_tfvars({key: value}), {key: value})
+                writer.write(key, value)
+                env_line = exporter.entry(key, value)
+                if env_line is not None:
+                    env_handle.write(env_line + "\n")
+            writer.close()
+    except OSError as exc:
+        _error(f"Unable to read tfvars input {label}: {exc}")
+        raise SystemExit(1)
+    except UnicodeDecodeError as exc:
+        _error(f"Tfvars input {label} is not valid UTF-8: {exc}")
+        raise SystemExit(1)
+    except WorkflowDirectiveError as exc:
+        _error(str(exc))
+        raise SystemExit(1)
+    except PackedPayloadError as exc:
+        _error(f"Unable to unpack {label}: {exc}")
+        raise SystemExit(1)
+    except TfvarsParseError as exc:
+        _error(f"Failed to parse {label} as tfvars: {exc}")
+        raise SystemExit(1)
+    if validator is not None:
+        validator.finish()
+    metadata = _metadata_from_directives(directives)
+    return retained, original_assume_role, metadata, round_trips
+
+
+# prepare ----------------------------------------------------------------------
+def _versions_backend(workdir: Path) -> dict[str, str]:
+    """Return bucket/key/region from the ``backend "s3"`` block in versions.tf."""
+
+    try:
+        body = read_hcl_file(workdir / "versions.tf")
+    except FileNotFoundError:
+        return {}
+    values: dict[str, str] = {}
+    for terraform in body.blocks_of("terraform"):
+        for backend in terraform.blocks_of("backend", "s3"):
+            for key in ("bucket", "key", "region"):
+                value = backend.get(key)
+                if isinstance(value, str) and value:
+                    values[key] = value
+    return values
+
+
+def _read_backend_file(path: Path) -> dict[str, Any]:
+    """Parse a backend config file; an empty dict means missing or unusable."""
+
+    try:
+        values = TfvarsParser(path.read_text(encoding="utf-8")).parse_assignments()
+    except (FileNotFoundError, TfvarsParseError):
+        return {}
+    if not (values.get("bucket") or values.get("key")):
+        return {}
+    return values
+
+
+def _env_values(env_lines: list[str]) -> dict[str, str]:
+    """Map the single-line ``NAME=value`` entries in ``env_lines``."""
+
+    values: dict[str, str] = {}
+    for chunk in env_lines:
+        name, sep, value = chunk.split("\n", 1)[0].partition("=")
+        if sep and "<<" not in name:
+            values[name] = value
+    return values
+
+
+def _prepare_env_lines(env_lines: list[str]) -> list[str]:
+    """Derive the backend and tfvars values the workflows used to compute in extra steps.
+
+    Drops an unusable backend config file, falls back to the ``backend "s3"``
+    block in versions.tf when no backend file is left, fills in the bucket
+    from the backend file and reads ``vpc_id``/``region`` from
+    terraform.tfvars when the payload did not set them.
+    """
+
+    env = _env_values(env_lines)
+
+    def current(name: str) -> str:
+        return env.get(name) or os.environ.get(name) or ""
+
+    workdir = Path(os.environ.get("TF_WORKING_DIR") or ".")
+    lines: list[str] = []
+    backend_file = Path(current("TF_BACKEND_FILE") or "backend.auto.tfbackend")
+    backend = _read_backend_file(backend_file)
+    if not backend and backend_file.is_file():
+        print(f"::notice::Invalid backend config in {backend_file}; removing so init can use default/backend args.")
+        backend_file.unlink()
+    if backend:
+        bucket = backend.get("bucket")
+        if isinstance(bucket, str) and bucket and not current("TF_BACKEND_BUCKET"):
+            lines.append(f"TF_BACKEND_BUCKET={bucket}")
+    else:
+        # Same precedence as before: versions.tf wins when there is no backend file.
+        for key, value in _versions_backend(workdir).items():
+            lines.append(f"TF_BACKEND_{key.upper()}={value}")
+
+    if not (current("VPC_ID") and current("AWS_REGION")):
+        try:
+            fallback = TfvarsParser(
+                (workdir / "terraform.tfvars").read_text(encoding="utf-8")
+            ).parse_assignments()
+        except FileNotFoundError:
+            fallback = {}
+        for key, name in (("vpc_id", "VPC_ID"), ("region", "AWS_REGION")):
+            value = fallback.get(key)
+            if isinstance(value, str) and value and not current(name):
+                lines.append(f"{name}={value}")
+    return lines
+
+
+def _with_prepare(env_lines: list[str], prepare: bool) -> list[str]:
+    if not prepare:
+        return env_lines
+    with _phase("prepare"):
+        return env_lines + _prepare_env_lines(env_lines)
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=("load", "prepare", "pack", "batch"),
+        default="load",
+        help=(
+            "load (default) writes the var-file and GITHUB_ENV entries; prepare "
+            "also drops an invalid backend config file, falls back to the "
+            "versions.tf backend block and reads terraform.tfvars for missing "
+            "VPC_ID/AWS_REGION, in the same GITHUB_ENV block; pack prints the "
+            "smallest secret encoding (raw, gzip+base64: or zstd+base64:) of the "
+            "tfvars file given with --input; batch loads every environment in "
+            "--batch-source into its own directory under --batch-output"
+        ),
+    )
+    parser.add_argument(
+        "--input",
+        metavar="PATH",
+        help=(
+            "Read the tfvars payload from PATH ('-' for stdin) instead of "
+            "TERRAFORM_TFVARS; the file is parsed and written out one "
+            "assignment at a time"
+        ),
+    )
+    parser.add_argument(
+        "--batch-source",
+        type=Path,
+        metavar="PATH",
+        help=(
+            "batch: a directory of <env>.tfvars / <env>.tfvars.json / <env>.packed "
+            "files, or a JSON manifest mapping environment names to payload files "
+            "and environment overrides"
+        ),
+    )
+    parser.add_argument(
+        "--batch-output",
+        type=Path,
+        default=Path(DEFAULT_BATCH_OUTPUT),
+        metavar="DIR",
+        help=f"batch: directory for the per-environment outputs and index.json (default: {DEFAULT_BATCH_OUTPUT})",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        metavar="N",
+        help="batch: worker processes (default: one per CPU, at most one per environment)",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=sorted(TFVARS_WRITERS),
+        help=(
+            "Var-file syntax to write (default: $TF_VARS_FORMAT or hcl); 'json' "
+            "writes <TF_VARS_FILE>.json and skips the HCL formatter and terraform fmt"
+        ),
+    )
+    parser.add_argument(
+        "--export-max-bytes",
+        type=int,
+        metavar="BYTES",
+        help=(
+            "Spill TF_VAR_* entries larger than BYTES to the var-file and "
+            "TF_VARS_SPILL_FILE instead of GITHUB_ENV (default: "
+            f"$TFVARS_EXPORT_MAX_BYTES or {DEFAULT_EXPORT_MAX_BYTES}; 0 exports everything)"
+        ),
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="timing",
+        metavar="MODES",
+        help=(
+            "Time each loader phase and write a JSON report plus a GITHUB_STEP_SUMMARY "
+            "table; MODES is a comma list of timing, memory (tracemalloc) and cprofile "
+            "(default: $TFVARS_PROFILE, off)"
+        ),
+    )
+    parser.add_argument(
+        "--profile-output",
+        type=Path,
+        metavar="PATH",
+        help=f"Where to write the profile report (default: $TFVARS_PROFILE_OUTPUT or {DEFAULT_PROFILE_OUTPUT})",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Regenerate the outputs even if the loader cache has them (same as TFVARS_CACHE=off)",
+    )
+    parser.add_argument(
+        "--no-validate",
+        action="store_true",
+        help=(
+            "Skip checking the tfvars against the variable declarations in "
+            "$TF_WORKING_DIR/*.tf (same as TFVARS_VALIDATE=off)"
+        ),
+    )
+    parser.add_argument(
+        "--verify-with-terraform",
+        action="store_true",
+        help=(
+            "Check the generated var-file against 'terraform fmt' and reformat "
+            "it on a mismatch (by default terraform fmt only runs when the "
+            "built-in formatter's self-check fails)"
+        ),
+    )
+    return parser.parse_args(argv)
+
+
+def _load_streaming(
+    source: str | PackedPayload,
+    verify_with_terraform: bool,
+    output_format: str,
+    export_max_bytes: int,
+    prepare: bool,
+    validate: bool,
+) -> None:
+    github_env = os.environ.get("GITHUB_ENV")
+    if not github_env:
+        _error("GITHUB_ENV is not available; cannot set environment variables.")
+        raise SystemExit(1)
+    tf_vars_file, backend_file = _output_paths(output_format)
+    _ensure_parent(tf_vars_file)
+    exporter = TfvarExporter(export_max_bytes, _spill_path(tf_vars_file))
+    label = _input_label(source)
+    validator = TfvarsValidator(_declarations_for_validation(validate), label) if validate else None
+    with _phase("stream_tfvars"), open(github_env, "a", encoding="utf-8") as env_handle:
+        try:
+            retained, original_assume_role, metadata, round_trips = _stream_tfvars(
+                source, tf_vars_file, env_handle, exporter, output_format, validator
+            )
+        finally:
+            spill_lines = exporter.close()
+    if output_format == "hcl":
+        _finalize_tfvars_file(tf_vars_file, verify_with_terraform, round_trips)
+    with _phase("workflow_env"):
+        env_lines = spill_lines + _workflow_env_lines(
+            retained, original_assume_role, metadata, tf_vars_file, backend_file
+        )
+    with _phase("capacity_report"):
+        _capacity_report(_capacity_inputs(retained, metadata))
+    env_lines = _with_prepare(env_lines, prepare)
+    with _phase("append_env"):
+        _append_env(env_lines)
+    exporter.report(tf_vars_file)
+
+
+# Environment the generated files and env lines depend on, besides the payload.
+_CACHE_ENV_INPUTS = (
+    "GITHUB_ACTIONS",
+    "TF_VARS_FILE",
+    "TF_BACKEND_FILE",
+    "TF_BACKEND_BUCKET",
+    "S3_BUCKET",
+    "TF_BACKEND_KEY",
+    "TF_BACKEND_REGION",
+    "AWS_REGION",
+    "TFVARS_PARSER_ENGINE",
+    "TF_VARS_SPILL_FILE",
+)
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _cache_dir() -> Path | None:
+    """Return the output cache directory, or None when caching is disabled."""
+
+    if (os.environ.get("TFVARS_CACHE") or "").strip().lower() in {"0", "off", "false", "no"}:
+        return None
+    configured = os.environ.get("TFVARS_CACHE_DIR")
+    if configured:
+        return Path(configured)
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "load_terraform_config"
+
+
+def _cache_max_bytes() -> int:
+    raw = os.environ.get("TFVARS_CACHE_MAX_BYTES")
+    if not raw:
+        return DEFAULT_CACHE_MAX_BYTES
+    try:
+        return int(raw)
+    except ValueError:
+        _error(f"TFVARS_CACHE_MAX_BYTES must be an integer, got '{raw}'.")
+        raise SystemExit(1)
+
+
+def _cache_key(
+    raw: str,
+    output_format: str,
+    verify_with_terraform: bool,
+    export_max_bytes: int,
+    declarations: dict[str, VariableDeclaration],
+) -> str:
+    """Hash everything that can change the loader's outputs.
+
+    The loader's own source stands in for its version, so editing the script
+    invalidates every entry. Entries are only stored after validation passed,
+    so the variable declarations are part of the key as well, together with
+    the names (never the values) of the ``TF_VAR_*`` variables that satisfy
+    the required-variable check.
+    """
+
+    digest = hashlib.sha256()
+    digest.update(Path(__file__).read_bytes())
+    inputs = {
+        "payload": raw,
+        "cwd": os.getcwd(),
+        "output_format": output_format,
+        "verify_with_terraform": verify_with_terraform,
+        "export_max_bytes": export_max_bytes,
+        "variables": [
+            [item.name, item.type_source, item.required, item.nullable] for item in declarations.values()
+        ],
+        "terraform": shutil.which("terraform"),
+        "env": {name: os.environ.get(name) for name in _CACHE_ENV_INPUTS},
+        "tf_var_env": sorted(name for name in os.environ if name.startswith("TF_VAR_")),
+    }
+    digest.update(json.dumps(inputs, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _restore_cached_outputs(cache_dir: Path, key: str, prepare: bool) -> bool:
+    """Rewrite the cached files and env lines for ``key``; False on a miss.
+
+    The ``prepare`` lines depend on files outside the payload, so they are
+    derived again rather than cached.
+    """
+
+    entry = cache_dir / f"{key}.json"
+    try:
+        cached = json.loads(entry.read_text(encoding="utf-8"))
+        files = [(Path(path), text) for path, text in cached["files"]]
+        env_lines = list(cached["env"])
+        capacity = cached.get("capacity")
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+    for path, text in files:
+        _ensure_parent(path)
+        path.write_text(text, encoding="utf-8")
+    _append_env(_with_prepare(env_lines, prepare))
+    try:
+        # Mark the entry as recently used for LRU eviction.
+        os.utime(entry)
+    except OSError:
+        pass
+    print(f"Restored loader outputs from cache entry {key[:12]}.")
+    _capacity_report(capacity)
+    return True
+
+
+def _store_cached_outputs(
+    cache_dir: Path,
+    key: str,
+    files: list[Path],
+    env_lines: list[str],
+    capacity: dict[str, Any] | None = None,
+) -> None:
+    """Save the generated outputs under ``key`` and evict down to the size bound.
+
+    Entries hold the same secrets as the generated var-file, so the cache is
+    only readable by the current user.
+    """
+
+    entry = cache_dir / f"{key}.json"
+    payload = {
+        "files": [[str(path), path.read_text(encoding="utf-8")] for path in files],
+        "env": env_lines,
+        "capacity": capacity,
+    }
+    try:
+        cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        temp = entry.with_name(f".{entry.name}.{os.getpid()}.tmp")
+        fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump(payload, handle)
+        os.replace(temp, entry)
+        _evict_cache(cache_dir, _cache_max_bytes())
+    except OSError as exc:
+        print(f"::warning::Unable to update the loader cache in {cache_dir}: {exc}", file=sys.stderr)
+
+
+def _evict_cache(cache_dir: Path, max_bytes: int) -> None:
+    """Delete least recently used entries until the cache fits ``max_bytes``.
+
+    HCL pickles count too: their names include the loader's hash, so every
+    loader change leaves the previous ones behind.
+    """
+
+    entries = []
+    for entry in itertools.chain(cache_dir.glob("*.json"), cache_dir.glob("hcl/*.pickle")):
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry))
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries, key=lambda item: item[0]):
+        if total <= max_bytes:
+            break
+        entry.unlink(missing_ok=True)
+        total -= size
+
+
+# HCL files ----------------------------------------------------------------------
+def _hcl_cache_entry(path: Path) -> Path | None:
+    cache_dir = _cache_dir()
+    if cache_dir is None:
+        return None
+    digest = hashlib.sha256(Path(__file__).read_bytes())
+    # Pickles name the defining module, which is __main__ when the loader
+    # runs as a script and load_terraform_config when another script imports it.
+    digest.update(f"{__name__}\0{path.resolve()}".encode("utf-8"))
+    return cache_dir / "hcl" / f"{digest.hexdigest()[:32]}.pickle"
+
+
+def read_hcl_file(path: Path) -> HclBlock:
+    """Parse ``path`` with :meth:`TfvarsParser.parse_body`, reusing a cached AST.
+
+    There is one pickle per file path, and it is valid while the file's
+    mtime and size are unchanged. The cache shares the loader's cache
+    directory, and ``TFVARS_CACHE=off`` disables it. Entries are owner-only,
+    because unpickling trusts its input.
+    """
+
+    stat = path.stat()
+    entry = _hcl_cache_entry(path)
+    if entry is not None:
+        try:
+            with entry.open("rb") as handle:
+                mtime_ns, size, body = pickle.load(handle)
+            if mtime_ns == stat.st_mtime_ns and size == stat.st_size:
+                # Mark the entry as recently used for _evict_cache.
+                os.utime(entry)
+                return body
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError, TypeError):
+            pass
+    body = _parse_with_engine(path.read_text(encoding="utf-8"), "parse_body")
+    if entry is not None:
+        try:
+            entry.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            temp = entry.with_name(f".{entry.name}.{os.getpid()}.tmp")
+            fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as handle:
+                pickle.dump((stat.st_mtime_ns, stat.st_size, body), handle, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, entry)
+        except OSError as exc:
+            print(f"::warning::Unable to update the HCL cache in {entry.parent}: {exc}", file=sys.stderr)
+    return body
+
+
+# Variable validation ------------------------------------------------------------
+# Tfvars keys the loader reads for itself; Terraform never sees them as variables.
+_WORKFLOW_TFVARS_KEYS = frozenset({"TF_BACKEND_BUCKET", "S3_BUCKET", "TF_BACKEND_KEY", "TF_BACKEND_REGION"})
+_TYPE_TOKEN_RE = re.compile(r"\s*(?:([A-Za-z_][\w-]*)|(.))")
+_ANY_TYPE = ("any",)
+
+
+@dataclass
+class VariableDeclaration:
+    name: str
+    type: tuple[Any, ...]
+    type_source: str
+    required: bool
+    nullable: bool
+    path: str
+    line: int
+
+
+class _TypeParser:
+    """Parse a Terraform type constraint such as ``list(object({a = string}))``.
+
+    Types become tuples: ``("string",)``, ``("list", element)``,
+    ``("object", {name: (type, optional)})``, ``("tuple", [types])``.
+    """
+
+    def __init__(self, source: str) -> None:
+        self.tokens = [name or symbol for name, symbol in _TYPE_TOKEN_RE.findall(source.strip())]
+        self.index = 0
+
+    def parse(self) -> tuple[Any, ...]:
+        result = self._type()
+        if self.index != len(self.tokens):
+            raise ValueError("trailing tokens")
+        return result
+
+    def _next(self) -> str:
+        if self.index >= len(self.tokens):
+            raise ValueError("unexpected end of type")
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def _expect(self, token: str) -> None:
+        if self._next() != token:
+            raise ValueError(f"expected {token!r}")
+
+    def _type(self) -> tuple[Any, ...]:
+        name = self._next()
+        if name in {"string", "number", "bool", "any"}:
+            return (name,)
+        self._expect("(")
+        if name in {"list", "set", "map"}:
+            result: tuple[Any, ...] = (name, self._type())
+        elif name == "object":
+            self._expect("{")
+            attributes: dict[str, tuple[tuple[Any, ...], bool]] = {}
+            while self.tokens[self.index] != "}":
+                attribute = self._next()
+                self._expect("=")
+                attributes[attribute] = self._attribute_type()
+                if self.tokens[self.index] == ",":
+                    self.index += 1
+            self._expect("}")
+            result = ("object", attributes)
+        elif name == "tuple":
+            self._expect("[")
+            elements = []
+            while self.tokens[self.index] != "]":
+                elements.append(self._type())
+                if self.tokens[self.index] == ",":
+                    self.index += 1
+            self._expect("]")
+            result = ("tuple", elements)
+        else:
+            raise ValueError(f"unknown type {name!r}")
+        self._expect(")")
+        return result
+
+    def _attribute_type(self) -> tuple[tuple[Any, ...], bool]:
+        if self.tokens[self.index] != "optional":
+            return self._type(), False
+        self.index += 1
+        self._expect("(")
+        attribute_type = self._type()
+        if self.tokens[self.index] == ",":
+            # Skip the default value; only its presence matters here.
+            depth = 0
+            while depth or self.tokens[self.index] != ")":
+                token = self._next()
+                depth += token in "([{"
+                depth -= token in ")]}"
+        self._expect(")")
+        return attribute_type, True
+
+
+def _format_type(constraint: tuple[Any, ...]) -> str:
+    kind = constraint[0]
+    if kind in {"list", "set", "map"}:
+        return f"{kind}({_format_type(constraint[1])})"
+    if kind == "object":
+        return "object"
+    if kind == "tuple":
+        return "tuple"
+    return kind
+
+
+def _describe_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, list):
+        return "list"
+    return "object"
+
+
+def _type_errors(value: Any, constraint: tuple[Any, ...], where: str) -> list[str]:
+    """Return the reasons ``value`` cannot convert to ``constraint``.
+
+    Follows Terraform's conversions: numbers and bools convert to strings,
+    numeric strings to numbers and "true"/"false" to bools. Nested nulls are
+    always accepted.
+    """
+
+    kind = constraint[0]
+    if value is None or kind == "any":
+        return []
+    mismatch = [f"{where} must be {_format_type(constraint)}, got {_describe_value(value)}"]
+    if kind == "string":
+        return [] if not isinstance(value, (list, dict)) else mismatch
+    if kind == "number":
+        if isinstance(value, bool):
+            return mismatch
+        if isinstance(value, (int, float)):
+            return []
+        if isinstance(value, str):
+            try:
+                float(value)
+            except ValueError:
+                return mismatch
+            return []
+        return mismatch
+    if kind == "bool":
+        return [] if isinstance(value, bool) or value in ("true", "false") else mismatch
+    if kind in {"list", "set"}:
+        if not isinstance(value, list):
+            return mismatch
+        errors: list[str] = []
+        for index, item in enumerate(value):
+            errors.extend(_type_errors(item, constraint[1], f"{where}[{index}]"))
+        return errors
+    if kind == "map":
+        if not isinstance(value, dict):
+            return mismatch
+        errors = []
+        for key, item in value.items():
+            errors.extend(_type_errors(item, constraint[1], f"{where}[{json.dumps(key)}]"))
+        return errors
+    if kind == "object":
+        if not isinstance(value, dict):
+            return mismatch
+        errors = []
+        for name, (attribute_type, optional) in constraint[1].items():
+            if name not in value:
+                if not optional:
+                    errors.append(f"{where} is missing required attribute '{name}'")
+                continue
+            errors.extend(_type_errors(value[name], attribute_type, f"{where}.{name}"))
+        return errors
+    if kind == "tuple":
+        if not isinstance(value, list) or len(value) != len(constraint[1]):
+            return [f"{where} must be a tuple of {len(constraint[1])} elements"]
+        errors = []
+        for index, (item, item_type) in enumerate(zip(value, constraint[1])):
+            errors.extend(_type_errors(item, item_type, f"{where}[{index}]"))
+        return errors
+    return []
+
+
+def _variable_declarations(workdir: Path) -> dict[str, VariableDeclaration]:
+    """Collect the ``variable`` blocks from the ``*.tf`` files in ``workdir``."""
+
+    declarations: dict[str, VariableDeclaration] = {}
+    for path in sorted(workdir.glob("*.tf")):
+        for block in read_hcl_file(path).blocks_of("variable"):
+            if len(block.labels) != 1:
+                continue
+            type_value = block.get("type")
+            type_source = type_value.source if isinstance(type_value, Expression) else "any"
+            try:
+                constraint = _TypeParser(type_source).parse()
+            except (ValueError, IndexError):
+                # Leave exotic constraints to Terraform rather than guess.
+                constraint = _ANY_TYPE
+            nullable = block.get("nullable", True)
+            declarations[block.labels[0]] = VariableDeclaration(
+                name=block.labels[0],
+                type=constraint,
+                type_source=type_source,
+                required="default" not in block.attributes,
+                nullable=nullable is not False,
+                path=str(path),
+                line=block.line,
+            )
+    return declarations
+
+
+def _validation_enabled(requested: bool) -> bool:
+    if not requested:
+        return False
+    return (os.environ.get("TFVARS_VALIDATE") or "").strip().lower() not in {"0", "off", "false", "no"}
+
+
+def _declarations_for_validation(validate: bool) -> dict[str, VariableDeclaration]:
+    if not validate:
+        return {}
+    try:
+        return _variable_declarations(Path(os.environ.get("TF_WORKING_DIR") or "."))
+    except (OSError, TfvarsParseError) as exc:
+        print(f"::warning::Skipping tfvars validation; unable to read variable declarations: {exc}", file=sys.stderr)
+        return {}
 
-    _append_env(env_lines)
+
+class TfvarsValidator:
+    """Check assignments against ``variable`` declarations as they are parsed."""
+
+    def __init__(self, declarations: dict[str, VariableDeclaration], label: str) -> None:
+        self.declarations = declarations
+        self.label = label
+        self.seen: set[str] = set()
+        self.errors: list[tuple[VariableDeclaration | None, str]] = []
+
+    def check(self, key: str, value: Any) -> None:
+        if not self.declarations or key in _WORKFLOW_TFVARS_KEYS:
+            return
+        self.seen.add(key)
+        declaration = self.declarations.get(key)
+        if declaration is None:
+            message = f"{self.label} sets undeclared variable '{key}'"
+            suggestions = difflib.get_close_matches(key, self.declarations, n=1)
+            if suggestions:
+                message += f" (did you mean '{suggestions[0]}'?)"
+            self.errors.append((None, message))
+            return
+        if value is None and not declaration.nullable:
+            self.errors.append((declaration, f"{self.label}: {key} is declared nullable = false but is null"))
+            return
+        for reason in _type_errors(value, declaration.type, key):
+            self.errors.append((declaration, f"{self.label}: {reason} (type = {declaration.type_source})"))
+
+    def finish(self) -> None:
+        """Report missing required variables and every error; exit if there were any."""
+
+        if not self.declarations:
+            return
+        for name, declaration in self.declarations.items():
+            if declaration.required and name not in self.seen and f"TF_VAR_{name}" not in os.environ:
+                self.errors.append((declaration, f"{self.label} does not set required variable '{name}'"))
+        if not self.errors:
+            return
+        for declaration, message in self.errors:
+            if declaration is None:
+                _error(message)
+            else:
+                print(f"::error file={declaration.path},line={declaration.line}::{message}", file=sys.stderr)
+        _error(f"{len(self.errors)} tfvars validation error(s); fix {self.label} before running Terraform.")
+        raise SystemExit(1)
+
+
+def _load(args: argparse.Namespace) -> None:
+    if args.command == "pack":
+        _pack(args.input or "-")
+        return
+    if args.command == "batch":
+        _batch(args)
+        return
+    output_format = _output_format(args.output_format)
+    export_max_bytes = _export_max_bytes(args.export_max_bytes)
+    prepare = args.command == "prepare"
+    validate = _validation_enabled(not args.no_validate)
+    # Packed secrets stream through the decompressor instead of being inflated
+    # into one string; like --input runs, they skip the output cache.
+    source = args.input if args.input is not None else _packed_payload()
+    if source is not None:
+        _load_streaming(
+            source, args.verify_with_terraform, output_format, export_max_bytes, prepare, validate
+        )
+        return
+    with _phase("load_secret"):
+        raw = _load_secret()
+    with _phase("variable_declarations"):
+        declarations = _declarations_for_validation(validate)
+    cache_dir = None if args.no_cache else _cache_dir()
+    cache_key = None
+    if cache_dir is not None:
+        with _phase("cache_lookup"):
+            cache_key = _cache_key(
+                raw, output_format, args.verify_with_terraform, export_max_bytes, declarations
+            )
+            if _restore_cached_outputs(cache_dir, cache_key, prepare):
+                return
+    with _phase("parse_payload"):
+        tfvars, metadata = _parse_payload(raw)
+    if validate:
+        with _phase("validate_tfvars"):
+            validator = TfvarsValidator(declarations, "TERRAFORM_TFVARS")
+            for key, value in tfvars.items():
+                validator.check(key, value)
+            validator.finish()
+    original_assume_role = tfvars.get("assume_role_arn")
+    if "assume_role_arn" in tfvars:
+        tfvars["assume_role_arn"] = _scrub_assume_role("assume_role_arn", original_assume_role)
+
+    tf_vars_file, backend_file = _output_paths(output_format)
+
+    _ensure_parent(tf_vars_file)
+    if output_format == "json":
+        # Terraform reads .tfvars.json natively; nothing to format.
+        with _phase("write_tfvars"), tf_vars_file.open("w", encoding="utf-8") as out:
+            _write_tfvars_json(tfvars, out)
+    else:
+        with _phase("write_tfvars"):
+            formatted_tfvars = _dump_tfvars(tfvars)
+            tf_vars_file.write_text(formatted_tfvars, encoding="utf-8")
+        with _phase("self_check"):
+            round_trips = _round_trips(formatted_tfvars, tfvars)
+        _finalize_tfvars_file(tf_vars_file, args.verify_with_terraform, round_trips)
+
+    exporter = TfvarExporter(export_max_bytes, _spill_path(tf_vars_file))
+    with _phase("export_tfvars"):
+        env_lines = []
+        for key, value in tfvars.items():
+            env_line = exporter.entry(key, value)
+            if env_line is not None:
+                env_lines.append(env_line)
+        env_lines.extend(exporter.close())
+    with _phase("workflow_env"):
+        env_lines.extend(
+            _workflow_env_lines(tfvars, original_assume_role, metadata, tf_vars_file, backend_file)
+        )
+    capacity = _capacity_inputs(tfvars, metadata)
+    with _phase("capacity_report"):
+        _capacity_report(capacity)
+    combined_lines = _with_prepare(env_lines, prepare)
+    with _phase("append_env"):
+        _append_env(combined_lines)
+    exporter.report(tf_vars_file)
+
+    if cache_key is not None:
+        written = [tf_vars_file]
+        if exporter.spilled:
+            written.append(exporter.spill_file)
+        if f"TF_BACKEND_FILE={backend_file}" in env_lines:
+            written.append(backend_file)
+        with _phase("cache_store"):
+            _store_cached_outputs(cache_dir, cache_key, written, env_lines, capacity)
+
+
+# Batch mode ---------------------------------------------------------------------
+DEFAULT_BATCH_OUTPUT = "tfvars-batch"
+_BATCH_SUFFIXES = (".tfvars.json", ".tfvars", ".packed")
+_ENV_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+# Payload and output settings that must never leak between environments.
+_BATCH_CLEARED_ENV = (
+    "TERRAFORM_TFVARS",
+    "TERRAFORM_TFVARS_JSON",
+    PACKED_PAYLOAD_ENV,
+    "TF_VARS_SPILL_FILE",
+    "GITHUB_OUTPUT",
+    "GITHUB_STEP_SUMMARY",
+)
+
+
+@dataclass
+class BatchEnvironment:
+    """One environment of a batch run: its payload file and env overrides."""
+
+    name: str
+    payload: Path
+    env: dict[str, str] = field(default_factory=dict)
+
+
+def _batch_environments(source: Path) -> list[BatchEnvironment]:
+    """Read the environments from a payload directory or a JSON manifest.
+
+    A manifest looks like ``{"environments": {"prod-eu": {"tfvars":
+    "envs/prod-eu.tfvars", "env": {"TF_BACKEND_KEY": "..."}}}}``; payload
+    paths are relative to the manifest.
+    """
+
+    environments: list[BatchEnvironment] = []
+    if source.is_dir():
+        for path in sorted(source.iterdir()):
+            suffix = next((suffix for suffix in _BATCH_SUFFIXES if path.name.endswith(suffix)), None)
+            if suffix and path.is_file():
+                environments.append(BatchEnvironment(path.name[: -len(suffix)], path))
+    else:
+        try:
+            manifest = json.loads(source.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as exc:
+            _error(f"Unable to read batch manifest {source}: {exc}")
+            raise SystemExit(1)
+        entries = manifest.get("environments") if isinstance(manifest, dict) else None
+        if not isinstance(entries, dict):
+            _error(f"Batch manifest {source} must contain an 'environments' object.")
+            raise SystemExit(1)
+        for name, entry in entries.items():
+            if not isinstance(entry, dict) or not isinstance(entry.get("tfvars"), str):
+                _error(f"Batch environment '{name}' in {source} needs a 'tfvars' path.")
+                raise SystemExit(1)
+            overrides = entry.get("env") or {}
+            if not isinstance(overrides, dict):
+                _error(f"Batch environment '{name}' in {source}: 'env' must be an object.")
+                raise SystemExit(1)
+            environments.append(
+                BatchEnvironment(
+                    name,
+                    source.parent / entry["tfvars"],
+                    {str(key): str(value) for key, value in overrides.items()},
+                )
+            )
+    seen: set[str] = set()
+    for environment in environments:
+        if not _ENV_NAME_RE.match(environment.name):
+            _error(f"Batch environment name '{environment.name}' is not a valid directory name.")
+            raise SystemExit(1)
+        # Directory listings can map two files (x.tfvars, x.packed) to one name.
+        if environment.name in seen:
+            _error(f"Batch environment '{environment.name}' is defined more than once in {source}.")
+            raise SystemExit(1)
+        seen.add(environment.name)
+    if not environments:
+        _error(f"No environments found in {source}.")
+        raise SystemExit(1)
+    return environments
+
+
+def _load_environment(
+    environment: BatchEnvironment, output_dir: Path, argv: list[str]
+) -> dict[str, Any]:
+    """Load one batch environment in a worker process; never raises.
+
+    Any failure, including unexpected exceptions such as ``RecursionError``,
+    becomes this environment's ``failed`` status so the others still finish.
+    """
+
+    env_dir = output_dir / environment.name
+    env_file = env_dir / "github.env"
+    log_file = env_dir / "load.log"
+    saved = dict(os.environ)
+    start = time.perf_counter()
+    status, error = "ok", ""
+    try:
+        env_dir.mkdir(parents=True, exist_ok=True)
+        env_file.write_text("", encoding="utf-8")
+        for name in _BATCH_CLEARED_ENV:
+            os.environ.pop(name, None)
+        os.environ.update(environment.env)
+        os.environ["GITHUB_ENV"] = str(env_file)
+        os.environ["TF_VARS_FILE"] = str(env_dir / "ci.auto.tfvars")
+        os.environ["TF_BACKEND_FILE"] = str(env_dir / "backend.auto.tfbackend")
+        child_argv = list(argv)
+        payload = str(environment.payload)
+        if environment.payload.name.endswith(".packed"):
+            # Packed payloads go through the same environment variable as in CI.
+            os.environ[PACKED_PAYLOAD_ENV] = environment.payload.read_text(encoding="utf-8")
+        else:
+            child_argv += ["--input", payload]
+        with log_file.open("w", encoding="utf-8") as log, contextlib.redirect_stdout(
+            log
+        ), contextlib.redirect_stderr(log):
+            _load(_parse_args(child_argv))
+    except SystemExit as exc:
+        if exc.code not in (None, 0):
+            status = "failed"
+            error = _last_error(log_file) or f"exit code {exc.code}"
+    except Exception as exc:
+        # One broken environment must not abort the batch or lose the others.
+        status, error = "failed", f"{type(exc).__name__}: {exc}"
+        try:
+            with log_file.open("a", encoding="utf-8") as log:
+                log.write(f"::error::{error}\n")
+        except OSError:
+            pass
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+    tf_vars_file, backend_file = (env_dir / "ci.auto.tfvars", env_dir / "backend.auto.tfbackend")
+    tf_vars_file = next(
+        (path for path in (tf_vars_file, tf_vars_file.with_name(f"{tf_vars_file.name}.json")) if path.exists()),
+        tf_vars_file,
+    )
+    return {
+        "name": environment.name,
+        "status": status,
+        "error": error,
+        "seconds": round(time.perf_counter() - start, 4),
+        "directory": str(env_dir),
+        "tf_vars_file": str(tf_vars_file) if status == "ok" else None,
+        "backend_file": str(backend_file) if status == "ok" and backend_file.exists() else None,
+        "env_file": str(env_file),
+        "log": str(log_file),
+    }
+
+
+def _last_error(log_file: Path) -> str:
+    try:
+        lines = log_file.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return ""
+    errors = [line.removeprefix("::error::") for line in lines if line.startswith("::error")]
+    return errors[-1] if errors else ""
+
+
+def _batch(args: argparse.Namespace) -> None:
+    """Load every environment of ``--batch-source`` in parallel and write an index."""
+
+    if args.batch_source is None:
+        _error("batch needs --batch-source (a payload directory or a JSON manifest).")
+        raise SystemExit(1)
+    if args.input is not None:
+        _error("batch reads its payloads from --batch-source; --input is not supported.")
+        raise SystemExit(1)
+    environments = _batch_environments(args.batch_source)
+    output_dir = args.batch_output.resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    argv = ["load"]
+    if args.no_cache:
+        argv.append("--no-cache")
+    if args.output_format:
+        argv += ["--output-format", args.output_format]
+    if args.export_max_bytes is not None:
+        argv += ["--export-max-bytes", str(args.export_max_bytes)]
+    if args.no_validate:
+        argv.append("--no-validate")
+    if args.verify_with_terraform:
+        argv.append("--verify-with-terraform")
+    jobs = max(1, min(args.jobs or os.cpu_count() or 1, len(environments)))
+    with _phase("batch"), ProcessPoolExecutor(max_workers=jobs) as pool:
+        results = list(
+            pool.map(
+                _load_environment,
+                environments,
+                [output_dir] * len(environments),
+                [argv] * len(environments),
+            )
+        )
+    succeeded = [result["name"] for result in results if result["status"] == "ok"]
+    index_file = output_dir / "index.json"
+    index_file.write_text(
+        json.dumps({"environments": results, "succeeded": succeeded}, indent=2) + "\n", encoding="utf-8"
+    )
+    github_output = os.environ.get("GITHUB_OUTPUT")
+    if github_output:
+        with open(github_output, "a", encoding="utf-8") as handle:
+            handle.write(f"environments={json.dumps(succeeded)}\n")
+            handle.write(f"batch_index={index_file}\n")
+    for result in results:
+        detail = f": {result['error']}" if result["error"] else ""
+        print(f"{result['name']:<24} {result['status']:<7} {result['seconds'] * 1000:>8.1f} ms{detail}")
+    print(f"Loaded {len(succeeded)}/{len(results)} environments with {jobs} workers; index at {index_file}.")
+    failed = [result for result in results if result["status"] != "ok"]
+    for result in failed:
+        _error(f"Environment '{result['name']}' failed: {result['error']} (log: {result['log']})")
+    if failed:
+        raise SystemExit(1)
+
+
+def main(argv: list[str] | None = None) -> None:
+    global _PROFILER
+
+    args = _parse_args(argv)
+    modes = _profile_modes(args.profile.split(",") if args.profile is not None else None)
+    if not modes:
+        _load(args)
+        return
+    profiler = PhaseProfiler(memory="memory" in modes, cprofile="cprofile" in modes)
+    _PROFILER = profiler
+    try:
+        profiler.run(lambda: _load(args))
+    finally:
+        _PROFILER = None
+        output = args.profile_output or Path(
+            os.environ.get("TFVARS_PROFILE_OUTPUT") or DEFAULT_PROFILE_OUTPUT
+        )
+        profiler.write_report(output)
+        print(f"Wrote loader profile to {output}.")
 
 
 if __name__ == "__main__":
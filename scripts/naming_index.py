@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""Compile naming.yml into a cached index of resource names for the tooling.
+
+``naming.tf`` reads naming.yml with ``yamldecode``; everything outside
+Terraform goes through this module instead. The index holds every resource
+name with the stack's defaults applied, the IAM policy ARN templates and the
+console URLs. It is cached as JSON keyed on the file's mtime and content hash,
+so repeated calls skip parsing.
+
+Print shell assignments for ``eval`` (one process instead of one ``awk`` per
+name)::
+
+    eval "$(python3 scripts/naming_index.py --account-id "$ACCOUNT_ID")"
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import sys
+from pathlib import Path
+from typing import Any, Mapping
+
+DEFAULT_NAMING_FILE = Path(__file__).resolve().parent.parent / "naming.yml"
+
+# Index key -> (naming.yml path, default). Mirrors the coalesce() calls in
+# naming.tf; the instance profile falls back to the role name.
+NAME_DEFAULTS: dict[str, tuple[tuple[str, ...], str | None]] = {
+    "cluster": (("cluster",), "msk-crypto-cluster"),
+    "collector_sg": (("security_groups", "collector"), "msk-crypto-sg-collectors"),
+    "consumer_sg": (("security_groups", "consumer"), "msk-crypto-sg-consumers"),
+    "broker_sg": (("security_groups", "brokers"), "msk-crypto-sg-brokers"),
+    "broker_log_group": (("cloudwatch", "broker_log_group"), "msk-crypto-cw-lg-broker"),
+    "collector_role": (("iam", "collector_role"), "msk-crypto-iam-collector"),
+    "collector_instance_profile": (("iam", "instance_profile"), None),
+    "control_policy": (("iam", "control_plane_policy"), "msk-crypto-iam-control"),
+    "producer_policy": (("iam", "producer_policy"), "msk-crypto-iam-producer"),
+    "consumer_policy": (("iam", "consumer_policy"), "msk-crypto-iam-consumer"),
+}
+
+# Variables that override the naming.yml defaults, as var.* does in naming.tf.
+NAME_OVERRIDES = {
+    "cluster": "TF_VAR_cluster_name",
+    "collector_sg": "TF_VAR_collector_sg_name",
+    "consumer_sg": "TF_VAR_consumer_sg_name",
+}
+
+POLICIES = ("control_policy", "producer_policy", "consumer_policy")
+
+# Console URLs for entries that do not set console_url in naming.yml.
+_CONSOLE_TEMPLATES = {
+    "cluster": "https://console.aws.amazon.com/msk/home?region={region}#/clusters/{name}",
+    "collector_sg": "https://console.aws.amazon.com/vpc/home?region={region}#SecurityGroups:search={name}",
+    "consumer_sg": "https://console.aws.amazon.com/vpc/home?region={region}#SecurityGroups:search={name}",
+    "broker_sg": "https://console.aws.amazon.com/vpc/home?region={region}#SecurityGroups:search={name}",
+    "broker_log_group": (
+        "https://console.aws.amazon.com/cloudwatch/home?region={region}#logsV2:log-groups/log-group/{name}"
+    ),
+    "collector_role": "https://console.aws.amazon.com/iam/home?region={region}#/roles/{name}",
+    "collector_instance_profile": "https://console.aws.amazon.com/iam/home?region={region}#/roles/{name}",
+    "control_policy": (
+        "https://console.aws.amazon.com/iam/home?region={region}#/policies/{arn}$permissions"
+    ),
+    "producer_policy": (
+        "https://console.aws.amazon.com/iam/home?region={region}#/policies/{arn}$permissions"
+    ),
+    "consumer_policy": (
+        "https://console.aws.amazon.com/iam/home?region={region}#/policies/{arn}$permissions"
+    ),
+}
+
+# Index key -> shell variable, as used by the Makefile targets.
+SHELL_NAMES = {
+    "cluster": "CLUSTER_NAME",
+    "collector_sg": "COLLECTOR_SG_NAME",
+    "consumer_sg": "CONSUMER_SG_NAME",
+    "broker_sg": "BROKER_SG_NAME",
+    "broker_log_group": "LOG_GROUP_NAME",
+    "collector_role": "ROLE_NAME",
+    "collector_instance_profile": "INSTANCE_PROFILE_NAME",
+    "control_policy": "CONTROL_POLICY_NAME",
+    "producer_policy": "PRODUCER_POLICY_NAME",
+    "consumer_policy": "CONSUMER_POLICY_NAME",
+}
+
+
+def parse_naming(text: str) -> dict[str, Any]:
+    """Parse the indented ``key: value`` maps in naming.yml."""
+
+    data: dict[str, Any] = {}
+    stack: list[tuple[int, dict[str, Any]]] = [(-2, data)]
+    for raw_line in text.splitlines():
+        stripped = raw_line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        indent = len(raw_line) - len(raw_line.lstrip(" "))
+        key, sep, value = stripped.partition(":")
+        if not sep:
+            continue
+        while stack and indent <= stack[-1][0]:
+            stack.pop()
+        parent = stack[-1][1]
+        value = value.strip()
+        if value:
+            if value.startswith('"') and value.endswith('"') and len(value) >= 2:
+                value = value[1:-1]
+            parent[key] = value
+        else:
+            child: dict[str, Any] = {}
+            parent[key] = child
+            stack.append((indent, child))
+    return data
+
+
+def _dig(data: dict[str, Any], keys: tuple[str, ...]) -> Any:
+    cursor: Any = data
+    for key in keys:
+        if not isinstance(cursor, dict) or key not in cursor:
+            return None
+        cursor = cursor[key]
+    return cursor
+
+
+def build_index(naming: dict[str, Any]) -> dict[str, Any]:
+    """Apply the defaults to parsed naming.yml data and derive ARNs and URLs."""
+
+    names: dict[str, str] = {}
+    console_urls: dict[str, str] = {}
+    for key, (path, default) in NAME_DEFAULTS.items():
+        entry = _dig(naming, path)
+        entry = entry if isinstance(entry, dict) else {}
+        name = entry.get("name")
+        names[key] = name if isinstance(name, str) and name else default or ""
+        console_url = entry.get("console_url")
+        if isinstance(console_url, str) and console_url:
+            console_urls[key] = console_url
+    if not names["collector_instance_profile"]:
+        names["collector_instance_profile"] = names["collector_role"]
+    return {
+        "names": names,
+        "policy_arn_templates": {
+            policy: f"arn:aws:iam::{{account_id}}:policy/{names[policy]}" for policy in POLICIES
+        },
+        "console_urls": console_urls,
+    }
+
+
+# Cache ------------------------------------------------------------------------
+def _cache_dir() -> Path | None:
+    """Return the index cache directory, or None when caching is disabled."""
+
+    if (os.environ.get("NAMING_INDEX_CACHE") or "").strip().lower() in {"0", "off", "false", "no"}:
+        return None
+    configured = os.environ.get("NAMING_INDEX_CACHE_DIR")
+    if configured:
+        return Path(configured)
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "naming_index"
+
+
+def _cache_path(cache_dir: Path, path: Path) -> Path:
+    # One entry per naming file; the module source is part of the key so a
+    # change to the defaults invalidates existing entries.
+    key = hashlib.sha256(Path(__file__).read_bytes())
+    key.update(str(path.resolve()).encode("utf-8"))
+    return cache_dir / f"{key.hexdigest()[:32]}.json"
+
+
+def _read_cache(entry: Path) -> dict[str, Any] | None:
+    try:
+        cached = json.loads(entry.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return cached if isinstance(cached, dict) and isinstance(cached.get("index"), dict) else None
+
+
+def _write_cache(entry: Path, cached: dict[str, Any]) -> None:
+    try:
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        temp = entry.with_name(f".{entry.name}.{os.getpid()}.tmp")
+        temp.write_text(json.dumps(cached), encoding="utf-8")
+        os.replace(temp, entry)
+    except OSError as exc:
+        print(f"::warning::Unable to update the naming index cache {entry}: {exc}", file=sys.stderr)
+
+
+def load_index(path: Path = DEFAULT_NAMING_FILE) -> dict[str, Any]:
+    """Return the index for ``path``, reusing the cached copy when it is current.
+
+    An unchanged mtime and size is trusted without reading the file; otherwise
+    the content hash decides whether the cached index still applies. A
+    missing naming file yields the defaults.
+    """
+
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return build_index({})
+    cache_dir = _cache_dir()
+    entry = _cache_path(cache_dir, path) if cache_dir else None
+    cached = _read_cache(entry) if entry else None
+    if cached and cached.get("mtime_ns") == stat.st_mtime_ns and cached.get("size") == stat.st_size:
+        return cached["index"]
+
+    raw = path.read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()
+    if cached and cached.get("sha256") == digest:
+        index = cached["index"]
+    else:
+        index = build_index(parse_naming(raw.decode("utf-8")))
+    if entry:
+        _write_cache(
+            entry,
+            {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": digest, "index": index},
+        )
+    return index
+
+
+# Accessors --------------------------------------------------------------------
+def resource_names(index: dict[str, Any], environ: Mapping[str, str] = os.environ) -> dict[str, str]:
+    """Return the index names with the ``TF_VAR_*`` overrides applied."""
+
+    names = dict(index["names"])
+    for key, env_var in NAME_OVERRIDES.items():
+        override = environ.get(env_var)
+        if override:
+            names[key] = override
+    return names
+
+
+def policy_arn(index: dict[str, Any], policy: str, account_id: str) -> str:
+    return index["policy_arn_templates"][policy].format(account_id=account_id)
+
+
+def console_url(index: dict[str, Any], key: str, region: str, account_id: str = "") -> str:
+    """Return the console URL for ``key``, from naming.yml or derived from the name."""
+
+    if key in index["console_urls"]:
+        return index["console_urls"][key]
+    name = index["names"][key]
+    arn = policy_arn(index, key, account_id) if key in POLICIES else ""
+    return _CONSOLE_TEMPLATES[key].format(region=region, name=name, arn=arn)
+
+
+def shell_exports(names: dict[str, str], index: dict[str, Any], account_id: str = "") -> list[str]:
+    """Return ``VAR=value`` lines for the Makefile, quoted for ``eval``."""
+
+    lines = [f"{var}={shlex.quote(names[key])}" for key, var in SHELL_NAMES.items()]
+    if account_id:
+        for policy in POLICIES:
+            var = SHELL_NAMES[policy].replace("_NAME", "_ARN")
+            lines.append(f"{var}={shlex.quote(policy_arn(index, policy, account_id))}")
+    return lines
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--naming-file",
+        type=Path,
+        default=DEFAULT_NAMING_FILE,
+        help="naming.yml to compile (default: the repository's naming.yml)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=("shell", "json"),
+        default="shell",
+        help="shell: VAR=value lines for eval; json: the full index (default: shell)",
+    )
+    parser.add_argument(
+        "--account-id",
+        default="",
+        help="AWS account ID; adds the *_POLICY_ARN variables to the shell output",
+    )
+    args = parser.parse_args(argv)
+
+    index = load_index(args.naming_file)
+    names = resource_names(index)
+    if args.format == "json":
+        print(json.dumps({**index, "names": names}, indent=2))
+    else:
+        print("\n".join(shell_exports(names, index, args.account_id)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""Share saved Terraform plans between the Validate and Apply workflows.
+
+A plan is stored under a key derived from everything that decides its
+contents: the normalized var-file and the ``.tf``/lock/naming.yml hashes
+(the same fingerprint as ``detect_changes.py``), the ``TF_VAR_*`` and
+``TF_CLI_ARGS*`` environment, the backend bucket and key, the state lineage
+and serial, and the Terraform version. ``save`` uploads a plan after
+``terraform plan -out``. ``restore`` downloads the plan for the current key
+when one exists and is younger than the maximum age. Otherwise it removes
+any stale plan file so the caller plans again. A plan is only restored on
+the git ref it was saved from (``GITHUB_REF``), so a plan from a pull
+request or another branch is never applied.
+
+The store is a local directory or an ``s3://bucket/prefix`` URI. S3 access
+goes through the AWS CLI, and ``PLAN_CACHE_ENDPOINT_URL`` points it at an
+S3-compatible stand-in (MinIO, LocalStack) for testing. Saved plans contain
+variable values, so keep the store as private as the state bucket.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import detect_changes  # noqa: E402
+
+KEY_VERSION = 2
+DEFAULT_LOCAL_STORE = ".terraform/plan-cache"
+DEFAULT_MAX_AGE = 24 * 3600
+
+
+class PlanCacheError(Exception):
+    """Raised when the cache key cannot be computed or the store fails."""
+
+
+def _error(message: str) -> None:
+    print(f"::error::{message}", file=sys.stderr)
+
+
+# Key ---------------------------------------------------------------------------
+def _terraform_json(terraform: str, workdir: Path, *args: str) -> dict[str, Any]:
+    result = subprocess.run(
+        [terraform, f"-chdir={workdir}", *args],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise PlanCacheError(f"terraform {' '.join(args)} failed: {result.stderr.strip()}")
+    try:
+        data = json.loads(result.stdout) if result.stdout.strip() else {}
+    except ValueError as exc:
+        raise PlanCacheError(f"terraform {' '.join(args)} printed invalid JSON: {exc}") from exc
+    return data if isinstance(data, dict) else {}
+
+
+def _state_identity(terraform: str, workdir: Path) -> dict[str, Any]:
+    # A new serial means someone applied since the plan was made; Terraform
+    # would reject the plan as stale anyway.
+    state = _terraform_json(terraform, workdir, "state", "pull")
+    return {"lineage": state.get("lineage", ""), "serial": state.get("serial", 0)}
+
+
+def _environment_digests() -> dict[str, str]:
+    # Hashes, not values: TF_VAR_* carries secrets.
+    return {
+        name: hashlib.sha256(value.encode("utf-8")).hexdigest()
+        for name, value in sorted(os.environ.items())
+        if name.startswith("TF_VAR_") or name in {"TF_CLI_ARGS", "TF_CLI_ARGS_plan"}
+    }
+
+
+def cache_key(terraform: str, workdir: Path, tf_vars_file: Path) -> str:
+    """Return the cache key for a plan of ``workdir`` with the current inputs."""
+
+    inputs = detect_changes.input_fingerprint(workdir, tf_vars_file)
+    # Apply replaces TF_BACKEND_REGION with the detected bucket region and
+    # Validate does not; the bucket, key and state identity pin the state.
+    inputs["backend"].pop("TF_BACKEND_REGION", None)
+    material = {
+        "version": KEY_VERSION,
+        "inputs": inputs,
+        "environment": _environment_digests(),
+        "state": _state_identity(terraform, workdir),
+        "terraform": _terraform_json(terraform, workdir, "version", "-json").get("terraform_version", ""),
+    }
+    canonical = json.dumps(material, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# Stores ------------------------------------------------------------------------
+class LocalStore:
+    """Plans as ``<key>.tfplan`` files in a private local directory."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def get(self, name: str, dest: Path) -> bool:
+        source = self.root / name
+        if not source.is_file():
+            return False
+        shutil.copyfile(source, dest)
+        return True
+
+    def put(self, source: Path, name: str) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        os.chmod(self.root, 0o700)
+        temp = self.root / f".{name}.{os.getpid()}.tmp"
+        shutil.copyfile(source, temp)
+        os.chmod(temp, 0o600)
+        os.replace(temp, self.root / name)
+
+
+class S3Store:
+    """Plans as objects under an ``s3://bucket/prefix`` URI, via the AWS CLI."""
+
+    def __init__(self, uri: str, endpoint_url: str | None) -> None:
+        self.uri = uri.rstrip("/")
+        self.endpoint_args = ["--endpoint-url", endpoint_url] if endpoint_url else []
+
+    def _cp(self, source: str, dest: str) -> subprocess.CompletedProcess[str]:
+        return subprocess.run(
+            ["aws", "s3", "cp", "--only-show-errors", *self.endpoint_args, source, dest],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+
+    def get(self, name: str, dest: Path) -> bool:
+        result = self._cp(f"{self.uri}/{name}", str(dest))
+        if result.returncode != 0:
+            # Missing objects and access errors both mean "no cached plan".
+            print(f"No cached object {self.uri}/{name}: {result.stderr.strip()}", file=sys.stderr)
+            return False
+        return True
+
+    def put(self, source: Path, name: str) -> None:
+        result = self._cp(str(source), f"{self.uri}/{name}")
+        if result.returncode != 0:
+            raise PlanCacheError(f"Unable to upload {self.uri}/{name}: {result.stderr.strip()}")
+
+
+def _default_store() -> str:
+    configured = os.environ.get("PLAN_CACHE_URI")
+    if configured:
+        return configured
+    bucket = os.environ.get("TF_BACKEND_BUCKET")
+    key = os.environ.get("TF_BACKEND_KEY")
+    if bucket and key:
+        return f"s3://{bucket}/{key}.plans"
+    return DEFAULT_LOCAL_STORE
+
+
+def _open_store(location: str) -> LocalStore | S3Store:
+    if location.startswith("s3://"):
+        return S3Store(location, os.environ.get("PLAN_CACHE_ENDPOINT_URL") or None)
+    return LocalStore(Path(location))
+
+
+# Commands ----------------------------------------------------------------------
+def _save(store: LocalStore | S3Store, key: str, plan_file: Path) -> None:
+    if not plan_file.is_file():
+        raise PlanCacheError(f"Plan file {plan_file} does not exist; run terraform plan -out first")
+    metadata = {
+        "created_at": int(time.time()),
+        "commit": os.environ.get("GITHUB_SHA", ""),
+        "ref": os.environ.get("GITHUB_REF", ""),
+        "run_id": os.environ.get("GITHUB_RUN_ID", ""),
+        "sha256": hashlib.sha256(plan_file.read_bytes()).hexdigest(),
+    }
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as handle:
+        json.dump(metadata, handle)
+    try:
+        # Plan first: a metadata object always points at a complete plan.
+        store.put(plan_file, f"{key}.tfplan")
+        store.put(Path(handle.name), f"{key}.json")
+    finally:
+        os.unlink(handle.name)
+    print(f"Saved {plan_file} to the plan cache (key {key[:12]}).")
+
+
+def _restore(store: LocalStore | S3Store, key: str, plan_file: Path, max_age: int) -> bool:
+    # A plan file left over from another run must never be applied by mistake.
+    plan_file.unlink(missing_ok=True)
+    with tempfile.TemporaryDirectory(prefix="plan-cache-") as workdir:
+        meta_path = Path(workdir) / "meta.json"
+        plan_path = Path(workdir) / "plan"
+        if not store.get(f"{key}.json", meta_path):
+            print(f"No cached plan for key {key[:12]}; Terraform will plan again.")
+            return False
+        try:
+            metadata = json.loads(meta_path.read_text(encoding="utf-8"))
+        except ValueError:
+            print("::warning::Ignoring unreadable plan cache metadata", file=sys.stderr)
+            return False
+        ref = os.environ.get("GITHUB_REF", "")
+        if metadata.get("ref", "") != ref:
+            print(
+                f"Cached plan for key {key[:12]} was saved from {metadata.get('ref') or 'an unknown ref'}, "
+                f"not {ref or 'this checkout'}; planning again."
+            )
+            return False
+        age = int(time.time()) - int(metadata.get("created_at", 0))
+        if max_age and age > max_age:
+            # The key cannot see drift made outside Terraform; bound the risk.
+            print(f"Cached plan for key {key[:12]} is {age}s old (limit {max_age}s); planning again.")
+            return False
+        if not store.get(f"{key}.tfplan", plan_path):
+            return False
+        if hashlib.sha256(plan_path.read_bytes()).hexdigest() != metadata.get("sha256"):
+            print("::warning::Cached plan does not match its checksum; planning again", file=sys.stderr)
+            return False
+        shutil.copyfile(plan_path, plan_file)
+    source = f" from commit {metadata['commit'][:12]}" if metadata.get("commit") else ""
+    print(f"Restored a validated plan{source} ({age}s old) to {plan_file}.")
+    return True
+
+
+def _export(hit: bool) -> None:
+    line = f"PLAN_CACHE_HIT={'true' if hit else 'false'}\n"
+    for name in ("GITHUB_ENV", "GITHUB_OUTPUT"):
+        target = os.environ.get(name)
+        if target:
+            with open(target, "a", encoding="utf-8") as handle:
+                handle.write(line)
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("key", "save", "restore"))
+    parser.add_argument(
+        "--plan-file",
+        type=Path,
+        default=Path(os.environ.get("TF_PLAN") or os.environ.get("PLAN_FILE") or "tfplan.out"),
+        help="Plan file to save or restore (default: $TF_PLAN, $PLAN_FILE or tfplan.out)",
+    )
+    parser.add_argument(
+        "--store",
+        help=(
+            "Local directory or s3:// URI (default: $PLAN_CACHE_URI, else <backend key>.plans "
+            f"in the state bucket, else {DEFAULT_LOCAL_STORE})"
+        ),
+    )
+    parser.add_argument(
+        "--working-dir",
+        type=Path,
+        default=Path(os.environ.get("TF_WORKING_DIR") or "."),
+        help="Terraform configuration directory (default: $TF_WORKING_DIR or .)",
+    )
+    parser.add_argument(
+        "--max-age",
+        type=int,
+        default=int(os.environ.get("PLAN_CACHE_MAX_AGE") or DEFAULT_MAX_AGE),
+        help=f"Oldest plan restore accepts, in seconds; 0 disables the limit (default: {DEFAULT_MAX_AGE})",
+    )
+    parser.add_argument(
+        "--terraform",
+        default=os.environ.get("TF", "terraform"),
+        help="Terraform binary (default: $TF or terraform)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv)
+    tf_vars_file = Path(os.environ.get("TF_VARS_FILE") or "ci.auto.tfvars")
+    try:
+        key = cache_key(args.terraform, args.working_dir, tf_vars_file)
+        if args.command == "key":
+            print(key)
+            return 0
+        store = _open_store(args.store or _default_store())
+        if args.command == "save":
+            _save(store, key, args.plan_file)
+        else:
+            _export(_restore(store, key, args.plan_file, args.max_age))
+    except (PlanCacheError, detect_changes.ChangeDetectionError, OSError) as exc:
+        if args.command != "restore":
+            _error(str(exc))
+            return 1
+        # The cache is an optimization; a fresh plan is always a valid fallback.
+        print(f"::warning::Plan cache unavailable, planning again: {exc}", file=sys.stderr)
+        args.plan_file.unlink(missing_ok=True)
+        _export(False)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
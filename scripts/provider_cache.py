@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Manage a Terraform provider plugin cache pinned to .terraform.lock.hcl.
+
+``key`` prints the cache key for the providers, versions and hashes in the
+lock file on this platform. It also exports ``TF_PLUGIN_CACHE_DIR``, so the
+workflows can restore and save the directory under that key. ``verify``
+checks every cached provider against the lock's ``h1:`` hashes and removes
+entries that do not match, so Terraform downloads them again. When every
+locked provider is present and verified, it writes a CLI config that
+installs them from the cache as a filesystem mirror. ``terraform init`` then
+makes no registry calls at all.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import platform
+import shutil
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import load_terraform_config as loader  # noqa: E402
+
+KEY_PREFIX = "terraform-providers"
+DEFAULT_CACHE_DIR = Path.home() / ".terraform.d" / "plugin-cache"
+CLI_CONFIG_NAME = "provider-cache.tfrc"
+
+_ARCHES = {"x86_64": "amd64", "amd64": "amd64", "aarch64": "arm64", "arm64": "arm64", "i386": "386", "i686": "386"}
+
+
+@dataclass(frozen=True)
+class LockedProvider:
+    address: str
+    version: str
+    hashes: tuple[str, ...]
+
+    @property
+    def h1_hashes(self) -> set[str]:
+        return {value for value in self.hashes if value.startswith("h1:")}
+
+    def cache_path(self, cache_dir: Path, target: str) -> Path:
+        # Unpacked layout shared by plugin_cache_dir and filesystem_mirror.
+        return cache_dir.joinpath(*self.address.split("/"), self.version, target)
+
+
+def _error(message: str) -> None:
+    print(f"::error::{message}", file=sys.stderr)
+
+
+def platform_target() -> str:
+    """Return Terraform's ``<os>_<arch>`` name for this machine."""
+
+    machine = platform.machine().lower()
+    return f"{platform.system().lower()}_{_ARCHES.get(machine, machine)}"
+
+
+def read_lock_file(path: Path) -> list[LockedProvider]:
+    """Return the providers recorded in a dependency lock file."""
+
+    providers = []
+    for block in loader.read_hcl_file(path).blocks_of("provider"):
+        hashes = block.get("hashes") or []
+        providers.append(
+            LockedProvider(
+                address=block.labels[0],
+                version=str(block.get("version", "")),
+                hashes=tuple(sorted(str(value) for value in hashes)),
+            )
+        )
+    return sorted(providers, key=lambda provider: provider.address)
+
+
+def cache_key(providers: list[LockedProvider], target: str) -> str:
+    material = json.dumps(
+        [[provider.address, provider.version, list(provider.hashes)] for provider in providers],
+        separators=(",", ":"),
+    )
+    return f"{KEY_PREFIX}-{target}-{hashlib.sha256(material.encode('utf-8')).hexdigest()[:32]}"
+
+
+def package_hash(directory: Path) -> str:
+    """Return the ``h1:`` hash of an unpacked provider package.
+
+    This is Go's ``dirhash.Hash1``: a SHA-256 over ``"<sha256>  <path>\\n"``
+    lines for every file, sorted by slash-separated relative path.
+    """
+
+    files = sorted(
+        path.relative_to(directory).as_posix() for path in directory.rglob("*") if path.is_file()
+    )
+    summary = hashlib.sha256()
+    for name in files:
+        digest = hashlib.sha256((directory / name).read_bytes()).hexdigest()
+        summary.update(f"{digest}  {name}\n".encode("utf-8"))
+    return "h1:" + base64.b64encode(summary.digest()).decode("ascii")
+
+
+def _export(values: dict[str, str], *, env: bool = True) -> None:
+    for name in ("GITHUB_ENV", "GITHUB_OUTPUT") if env else ("GITHUB_OUTPUT",):
+        target = os.environ.get(name)
+        if target:
+            with open(target, "a", encoding="utf-8") as handle:
+                handle.writelines(f"{key}={value}\n" for key, value in values.items())
+
+
+def _cli_config(cache_dir: Path, providers: list[LockedProvider]) -> str:
+    addresses = ", ".join(json.dumps(provider.address) for provider in providers)
+    # No plugin_cache_dir: Terraform must not use one directory as both.
+    return (
+        "provider_installation {\n"
+        "  filesystem_mirror {\n"
+        f"    path    = {json.dumps(str(cache_dir))}\n"
+        f"    include = [{addresses}]\n"
+        "  }\n"
+        "  direct {\n"
+        f"    exclude = [{addresses}]\n"
+        "  }\n"
+        "}\n"
+    )
+
+
+def verify(cache_dir: Path, providers: list[LockedProvider], target: str) -> bool:
+    """Drop cache entries that fail the lock hashes; return True if all are warm."""
+
+    warm = True
+    for provider in providers:
+        path = provider.cache_path(cache_dir, target)
+        if not path.is_dir():
+            print(f"{provider.address} {provider.version}: not cached")
+            warm = False
+            continue
+        if not provider.h1_hashes:
+            # zh: hashes cover release zips, which the cache does not keep.
+            print(f"{provider.address} {provider.version}: lock file has no h1: hash to verify against")
+            warm = False
+            continue
+        actual = package_hash(path)
+        if actual in provider.h1_hashes:
+            print(f"{provider.address} {provider.version}: cached, {actual}")
+            continue
+        print(
+            f"::warning::{provider.address} {provider.version}: cached package {actual} "
+            "does not match .terraform.lock.hcl; removing it",
+            file=sys.stderr,
+        )
+        shutil.rmtree(path)
+        warm = False
+    return warm
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("key", "verify"))
+    parser.add_argument(
+        "--lock-file",
+        type=Path,
+        default=Path(os.environ.get("TF_WORKING_DIR") or ".") / ".terraform.lock.hcl",
+        help="Dependency lock file (default: $TF_WORKING_DIR/.terraform.lock.hcl)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=Path(os.environ.get("TF_PLUGIN_CACHE_DIR") or DEFAULT_CACHE_DIR),
+        help=f"Plugin cache directory (default: $TF_PLUGIN_CACHE_DIR or {DEFAULT_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--target",
+        default=platform_target(),
+        help="Provider platform, as <os>_<arch> (default: this machine)",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        providers = read_lock_file(args.lock_file)
+    except (OSError, loader.TfvarsParseError) as exc:
+        _error(f"Unable to read {args.lock_file}: {exc}")
+        return 1
+    cache_dir = args.cache_dir.resolve()
+
+    if args.command == "key":
+        key = cache_key(providers, args.target)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        _export({"TF_PLUGIN_CACHE_DIR": str(cache_dir)})
+        _export({"key": key, "dir": str(cache_dir)}, env=False)
+        print(key)
+        return 0
+
+    if not verify(cache_dir, providers, args.target):
+        print("Provider cache is cold; terraform init will download the missing providers into it.")
+        _export({"PROVIDER_CACHE_WARM": "false"})
+        return 0
+    if os.environ.get("TF_CLI_CONFIG_FILE"):
+        print("TF_CLI_CONFIG_FILE is already set; leaving provider installation to it.")
+        _export({"PROVIDER_CACHE_WARM": "true"})
+        return 0
+    config = cache_dir.parent / CLI_CONFIG_NAME
+    config.write_text(_cli_config(cache_dir, providers), encoding="utf-8")
+    print(f"All {len(providers)} locked providers are cached; init will install them offline via {config}.")
+    # An empty TF_PLUGIN_CACHE_DIR is treated as unset.
+    _export({"PROVIDER_CACHE_WARM": "true", "TF_CLI_CONFIG_FILE": str(config), "TF_PLUGIN_CACHE_DIR": ""})
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
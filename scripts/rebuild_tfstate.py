@@ -0,0 +1,831 @@
+#!/usr/bin/env python3
+"""Rebuild remote Terraform state by importing existing AWS resources.
+
+All AWS lookups (security groups, broker rules, the MSK cluster, the log
+group and IAM artifacts) run concurrently on a thread pool alongside
+``terraform init``. Every resource that is found becomes a Terraform
+``import {}`` block in a single generated file, and the imports are applied
+through one targeted plan instead of one ``terraform import`` per resource.
+Each CLI call is timed and reported at the end.
+
+Progress is checkpointed in a journal (lookups that found something and
+finished imports, keyed by address and cloud identifier), so a rerun after
+a failure resumes instead of repeating every lookup and import.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import load_terraform_config as loader  # noqa: E402
+import naming_index  # noqa: E402
+
+IMPORTS_FILE = "rebuild_tfstate_imports.tf"
+PLAN_FILE = "rebuild-tfstate.tfplan"
+DEFAULT_JOURNAL = ".rebuild-tfstate.journal"
+DEFAULT_MAX_WORKERS = 8
+BROKER_IAM_PORT = 9098
+
+# AWS CLI error codes that mean "this resource does not exist".
+_NOT_FOUND_CODES = ("NoSuchEntity", "ResourceNotFoundException", "NotFoundException")
+
+
+class RebuildError(Exception):
+    """Raised when the rebuild cannot continue."""
+
+
+def _error(message: str) -> None:
+    print(f"::error::{message}", file=sys.stderr)
+
+
+@dataclass
+class CallRecord:
+    """Latency of one CLI invocation."""
+
+    label: str
+    seconds: float
+    returncode: int
+
+
+class CommandRunner:
+    """Run ``aws``/``terraform`` commands and record how long each one took."""
+
+    def __init__(self, aws: str, terraform: str, debug: bool = False) -> None:
+        self.aws_cli = aws
+        self.terraform_cli = terraform
+        self.debug = debug
+        self.records: list[CallRecord] = []
+
+    def run(
+        self,
+        label: str,
+        argv: list[str],
+        capture: bool = True,
+        env: dict[str, str] | None = None,
+    ) -> subprocess.CompletedProcess[str]:
+        if self.debug:
+            print("+ " + " ".join(argv), file=sys.stderr)
+        start = time.perf_counter()
+        result = subprocess.run(
+            argv,
+            stdout=subprocess.PIPE if capture else None,
+            stderr=subprocess.PIPE if capture else None,
+            text=True,
+            env=env,
+        )
+        # list.append is atomic, so worker threads can share the log.
+        self.records.append(CallRecord(label, time.perf_counter() - start, result.returncode))
+        return result
+
+    def aws(self, label: str, *args: str, missing_ok: bool = False) -> str | None:
+        """Return the stripped stdout of an ``aws`` call.
+
+        With ``missing_ok``, a not-found error yields None instead of failing.
+        """
+
+        result = self.run(label, [self.aws_cli, *args])
+        if result.returncode == 0:
+            return result.stdout.strip()
+        if missing_ok and any(code in result.stderr for code in _NOT_FOUND_CODES):
+            return None
+        raise RebuildError(f"{label} failed: {result.stderr.strip()}")
+
+    def terraform(
+        self, label: str, *args: str, capture: bool = False, env: dict[str, str] | None = None
+    ) -> subprocess.CompletedProcess[str]:
+        result = self.run(label, [self.terraform_cli, *args], capture=capture, env=env)
+        if result.returncode != 0:
+            details = f": {result.stderr.strip()}" if capture and result.stderr else ""
+            raise RebuildError(f"{label} failed with exit code {result.returncode}{details}")
+        return result
+
+
+@dataclass
+class RebuildConfig:
+    backend_bucket: str
+    backend_key: str
+    backend_region: str
+    vpc_id: str
+    names: dict[str, str]
+
+
+@dataclass
+class ImportTarget:
+    """One resource to import, with the variable that disables it in config."""
+
+    address: str
+    identifier: str | None
+    description: str
+    existing_var: str | None = None
+
+
+@dataclass
+class Discovery:
+    account_id: str
+    found: dict[str, str | None] = field(default_factory=dict)
+    state: set[str] = field(default_factory=set)
+
+
+def _is_missing(value: str | None) -> bool:
+    return not value or value == "None"
+
+
+class RebuildJournal:
+    """Append-only JSON-lines checkpoint of a rebuild in progress.
+
+    The first line fingerprints the backend, VPC and resource names; a
+    journal written for a different target is ignored. Lookups are only
+    recorded when they found something, because a missing resource may have
+    been created since.
+    """
+
+    def __init__(self, path: Path, fingerprint: dict[str, Any]) -> None:
+        self.path = path
+        self.fingerprint = fingerprint
+        self.lookups: dict[str, Any] = {}
+        self.imported: dict[str, str] = {}
+        self.resumed: list[str] = []
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        try:
+            lines = self.path.read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            lines = []
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # A run killed mid-write leaves a truncated last line.
+                continue
+        if entries and entries[0].get("fingerprint") != self.fingerprint:
+            print(f"Ignoring {self.path}: it was written for a different backend or VPC", file=sys.stderr)
+            entries = []
+        for entry in entries[1:]:
+            if "lookup" in entry:
+                self.lookups[entry["lookup"]] = entry["value"]
+            elif "imported" in entry:
+                self.imported[entry["imported"]] = entry["id"]
+        if not entries:
+            self.path.write_text(json.dumps({"fingerprint": self.fingerprint}) + "\n", encoding="utf-8")
+        elif self.lookups or self.imported:
+            print(
+                f"Resuming from {self.path}: {len(self.lookups)} lookups, {len(self.imported)} imports",
+                file=sys.stderr,
+            )
+
+    def lookup(self, name: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Return the journaled value for ``name``, or run ``func`` and record it."""
+
+        if name in self.lookups:
+            with self._lock:
+                self.resumed.append(name)
+            return self.lookups[name]
+        value = func(*args, **kwargs)
+        if value not in (None, "", "None", []):
+            self._append({"lookup": name, "value": value})
+        return value
+
+    def record_import(self, target: ImportTarget) -> None:
+        self.imported[target.address] = target.identifier or ""
+        self._append({"imported": target.address, "id": target.identifier})
+
+    def discard(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+    def _append(self, entry: dict[str, Any]) -> None:
+        with self._lock, self.path.open("a", encoding="utf-8") as handle:
+            handle.write(json.dumps(entry) + "\n")
+
+
+# Environment ------------------------------------------------------------------
+def _find_terraform() -> str:
+    terraform = shutil.which("terraform")
+    cli_path = os.environ.get("TERRAFORM_CLI_PATH")
+    if not terraform and cli_path:
+        directory = cli_path if os.path.isdir(cli_path) else os.path.dirname(cli_path)
+        terraform = shutil.which("terraform", path=directory)
+    if not terraform:
+        raise RebuildError("terraform CLI is required")
+    return terraform
+
+
+def _require_env(name: str, hint: str = "") -> str:
+    value = os.environ.get(name)
+    if not value:
+        raise RebuildError(f"Environment variable {name} must be set{hint}")
+    return value
+
+
+def _load_config(naming_file: Path) -> RebuildConfig:
+    backend_bucket = _require_env("TF_BACKEND_BUCKET")
+    backend_key = _require_env("TF_BACKEND_KEY")
+    region = os.environ.get("AWS_REGION") or os.environ.get("TF_VAR_region")
+    backend_region = os.environ.get("TF_BACKEND_REGION") or region
+    if not backend_region:
+        raise RebuildError(
+            "Set TF_BACKEND_REGION, AWS_REGION or TF_VAR_region so the backend region can be determined"
+        )
+    if not region:
+        raise RebuildError("Set AWS_REGION or TF_VAR_region to target the correct AWS region")
+    # Every aws/terraform child process inherits the effective region.
+    os.environ["AWS_REGION"] = region
+    vpc_id = _require_env("TF_VAR_vpc_id", " (for filtering existing security groups)")
+    _require_env("TF_VAR_subnet_ids", " (JSON encoded list)")
+    return RebuildConfig(
+        backend_bucket=backend_bucket,
+        backend_key=backend_key,
+        backend_region=backend_region,
+        vpc_id=vpc_id,
+        names=naming_index.resource_names(naming_index.load_index(naming_file)),
+    )
+
+
+# Discovery --------------------------------------------------------------------
+def _lookup_security_group(runner: CommandRunner, name: str, vpc_id: str) -> str | None:
+    return runner.aws(
+        f"ec2 describe-security-groups ({name})",
+        "ec2",
+        "describe-security-groups",
+        "--filters",
+        f"Name=group-name,Values={name}",
+        f"Name=vpc-id,Values={vpc_id}",
+        "--query",
+        "SecurityGroups[0].GroupId",
+        "--output",
+        "text",
+    )
+
+
+def _lookup_broker_rules(runner: CommandRunner, broker_sg: Future[str | None]) -> list[dict[str, Any]]:
+    """Fetch every broker rule once; the three rule lookups filter it locally."""
+
+    group_id = broker_sg.result()
+    if _is_missing(group_id):
+        return []
+    output = runner.aws(
+        "ec2 describe-security-group-rules (brokers)",
+        "ec2",
+        "describe-security-group-rules",
+        "--filters",
+        f"Name=group-id,Values={group_id}",
+        "--output",
+        "json",
+    )
+    return json.loads(output or "{}").get("SecurityGroupRules", [])
+
+
+def _ingress_rule_from(rules: list[dict[str, Any]], source_group: str | None) -> str | None:
+    if _is_missing(source_group):
+        return None
+    for rule in rules:
+        if (
+            not rule.get("IsEgress")
+            and rule.get("IpProtocol") == "tcp"
+            and rule.get("FromPort") == BROKER_IAM_PORT
+            and rule.get("ToPort") == BROKER_IAM_PORT
+            and (rule.get("ReferencedGroupInfo") or {}).get("GroupId") == source_group
+        ):
+            return rule.get("SecurityGroupRuleId")
+    return None
+
+
+def _egress_rule(rules: list[dict[str, Any]]) -> str | None:
+    for rule in rules:
+        if (
+            rule.get("IsEgress")
+            and rule.get("IpProtocol") == "-1"
+            and rule.get("CidrIpv4") == "0.0.0.0/0"
+        ):
+            return rule.get("SecurityGroupRuleId")
+    return None
+
+
+def _exists(runner: CommandRunner, label: str, identifier: str, *args: str) -> str | None:
+    """Return ``identifier`` when the ``aws`` probe finds the resource."""
+
+    return identifier if runner.aws(label, *args, missing_ok=True) is not None else None
+
+
+def _policy_arn(account: Future[str | None], name: str) -> str:
+    return f"arn:aws:iam::{account.result()}:policy/{name}"
+
+
+def _state_addresses(runner: CommandRunner, init: Future[Any]) -> set[str]:
+    init.result()
+    result = runner.run("terraform state list", [runner.terraform_cli, "state", "list"])
+    # An empty backend makes `state list` fail; treat it as an empty state.
+    if result.returncode != 0:
+        return set()
+    return {line.strip() for line in result.stdout.splitlines() if line.strip()}
+
+
+def _discover(
+    runner: CommandRunner, cfg: RebuildConfig, journal: RebuildJournal, max_workers: int
+) -> Discovery:
+    """Run ``terraform init`` and every AWS lookup concurrently.
+
+    Tasks that depend on another lookup are submitted after it and block on
+    its future; the pool is FIFO, so this cannot deadlock even with one
+    worker. Lookups already in the journal are not repeated.
+    """
+
+    names = cfg.names
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+
+        def submit(name: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Future[Any]:
+            return pool.submit(journal.lookup, name, func, *args, **kwargs)
+
+        init = pool.submit(
+            runner.terraform,
+            "terraform init",
+            "init",
+            "-input=false",
+            "-reconfigure",
+            f"-backend-config=bucket={cfg.backend_bucket}",
+            f"-backend-config=key={cfg.backend_key}",
+            f"-backend-config=region={cfg.backend_region}",
+        )
+        account = submit(
+            "account_id",
+            runner.aws,
+            "sts get-caller-identity",
+            "sts",
+            "get-caller-identity",
+            "--query",
+            "Account",
+            "--output",
+            "text",
+        )
+        groups = {
+            role: submit(f"{role}_sg", _lookup_security_group, runner, names[f"{role}_sg"], cfg.vpc_id)
+            for role in ("collector", "consumer", "broker")
+        }
+        rules = submit("broker_rules", _lookup_broker_rules, runner, groups["broker"])
+        lookups: dict[str, Future[str | None]] = {
+            "cluster": submit(
+                "cluster",
+                runner.aws,
+                "kafka list-clusters-v2",
+                "kafka",
+                "list-clusters-v2",
+                "--cluster-name-filter",
+                names["cluster"],
+                "--query",
+                "ClusterInfoList[0].ClusterArn",
+                "--output",
+                "text",
+            ),
+            "broker_log_group": submit(
+                "broker_log_group",
+                runner.aws,
+                "logs describe-log-groups",
+                "logs",
+                "describe-log-groups",
+                "--log-group-name-prefix",
+                names["broker_log_group"],
+                "--query",
+                f"logGroups[?logGroupName=='{names['broker_log_group']}'].logGroupName | [0]",
+                "--output",
+                "text",
+            ),
+            "collector_role": submit(
+                "collector_role",
+                _exists,
+                runner,
+                "iam get-role",
+                names["collector_role"],
+                "iam",
+                "get-role",
+                "--role-name",
+                names["collector_role"],
+            ),
+            "collector_instance_profile": submit(
+                "collector_instance_profile",
+                _exists,
+                runner,
+                "iam get-instance-profile",
+                names["collector_instance_profile"],
+                "iam",
+                "get-instance-profile",
+                "--instance-profile-name",
+                names["collector_instance_profile"],
+            ),
+            "attached_policies": submit(
+                "attached_policies",
+                runner.aws,
+                "iam list-attached-role-policies",
+                "iam",
+                "list-attached-role-policies",
+                "--role-name",
+                names["collector_role"],
+                "--query",
+                "AttachedPolicies[].PolicyArn",
+                "--output",
+                "json",
+                missing_ok=True,
+            ),
+        }
+        for policy in ("control_policy", "producer_policy", "consumer_policy"):
+            lookups[policy] = submit(
+                policy,
+                lambda policy=policy: _exists(
+                    runner,
+                    f"iam get-policy ({names[policy]})",
+                    _policy_arn(account, names[policy]),
+                    "iam",
+                    "get-policy",
+                    "--policy-arn",
+                    _policy_arn(account, names[policy]),
+                ),
+            )
+        state = pool.submit(_state_addresses, runner, init)
+
+        account_id = account.result()
+        if _is_missing(account_id):
+            raise RebuildError("Unable to determine AWS account ID")
+        found = {f"{role}_sg": future.result() for role, future in groups.items()}
+        found.update({name: future.result() for name, future in lookups.items()})
+        broker_rules = rules.result()
+        found["collector_rule"] = _ingress_rule_from(broker_rules, found["collector_sg"])
+        found["consumer_rule"] = _ingress_rule_from(broker_rules, found["consumer_sg"])
+        found["egress_rule"] = _egress_rule(broker_rules) if not _is_missing(found["broker_sg"]) else None
+        return Discovery(account_id=account_id or "", found=found, state=state.result())
+
+
+# Import planning --------------------------------------------------------------
+def _counted_resources(workdir: Path) -> set[str]:
+    """Return ``type.name`` for resources declared with ``count``."""
+
+    counted: set[str] = set()
+    for path in workdir.glob("*.tf"):
+        for block in loader.read_hcl_file(path).blocks_of("resource"):
+            if "count" in block.attributes and len(block.labels) == 2:
+                counted.add(".".join(block.labels))
+    return counted
+
+
+def _import_targets(
+    cfg: RebuildConfig, discovery: Discovery, journal: RebuildJournal, counted: set[str]
+) -> tuple[list[ImportTarget], list[str], list[str]]:
+    """Map discovered identifiers to import targets.
+
+    Returns the targets still to import, the descriptions of missing
+    resources and the addresses skipped because state already tracks them.
+    """
+
+    names = cfg.names
+    found = discovery.found
+    attached = set(json.loads(found.get("attached_policies") or "[]") or [])
+    control_arn = f"arn:aws:iam::{discovery.account_id}:policy/{names['control_policy']}"
+    producer_arn = f"arn:aws:iam::{discovery.account_id}:policy/{names['producer_policy']}"
+
+    def attachment(policy_arn: str) -> str | None:
+        if found.get("collector_role") and policy_arn in attached:
+            return f"{names['collector_role']}/{policy_arn}"
+        return None
+
+    candidates = [
+        ImportTarget(
+            "aws_cloudwatch_log_group.msk_broker",
+            found.get("broker_log_group"),
+            f"CloudWatch log group {names['broker_log_group']}",
+            "existing_broker_log_group_name",
+        ),
+        ImportTarget(
+            "aws_security_group.collector",
+            found.get("collector_sg"),
+            f"collector security group {names['collector_sg']} in VPC {cfg.vpc_id}",
+            "existing_collector_security_group_id",
+        ),
+        ImportTarget(
+            "aws_security_group.consumers",
+            found.get("consumer_sg"),
+            f"consumer security group {names['consumer_sg']} in VPC {cfg.vpc_id}",
+            "existing_consumer_security_group_id",
+        ),
+        ImportTarget(
+            "aws_security_group.msk_brokers",
+            found.get("broker_sg"),
+            f"MSK broker security group {names['broker_sg']} in VPC {cfg.vpc_id}",
+            "existing_msk_broker_security_group_id",
+        ),
+        ImportTarget(
+            "aws_vpc_security_group_ingress_rule.msk_iam_9098_from_collector",
+            found.get("collector_rule"),
+            "security group ingress rule for collectors -> brokers",
+        ),
+        ImportTarget(
+            "aws_vpc_security_group_ingress_rule.msk_iam_9098_from_consumers",
+            found.get("consumer_rule"),
+            "security group ingress rule for consumers -> brokers",
+        ),
+        ImportTarget(
+            "aws_vpc_security_group_egress_rule.msk_all_egress",
+            found.get("egress_rule"),
+            "security group egress rule for brokers",
+        ),
+        ImportTarget(
+            "aws_msk_serverless_cluster.this",
+            found.get("cluster"),
+            f"MSK Serverless cluster named {names['cluster']}",
+        ),
+        ImportTarget(
+            "aws_iam_role.collector_role",
+            found.get("collector_role"),
+            f"collector IAM role {names['collector_role']}",
+            "existing_collector_role_name",
+        ),
+        ImportTarget(
+            "aws_iam_instance_profile.collector_profile",
+            found.get("collector_instance_profile"),
+            f"collector instance profile {names['collector_instance_profile']}",
+            "existing_collector_instance_profile_name",
+        ),
+        ImportTarget(
+            "aws_iam_policy.msk_control_plane",
+            found.get("control_policy"),
+            f"MSK control plane policy {names['control_policy']}",
+            "existing_msk_control_policy_arn",
+        ),
+        ImportTarget(
+            "aws_iam_policy.producer",
+            found.get("producer_policy"),
+            f"producer policy {names['producer_policy']}",
+            "existing_producer_policy_arn",
+        ),
+        ImportTarget(
+            "aws_iam_policy.consumer",
+            found.get("consumer_policy"),
+            f"consumer policy {names['consumer_policy']}",
+            "existing_consumer_policy_arn",
+        ),
+        ImportTarget(
+            "aws_iam_role_policy_attachment.collector_control_attach",
+            attachment(control_arn),
+            "collector role to control plane policy attachment",
+        ),
+        ImportTarget(
+            "aws_iam_role_policy_attachment.collector_producer_attach",
+            attachment(producer_arn),
+            "collector role to producer policy attachment",
+        ),
+    ]
+
+    targets: list[ImportTarget] = []
+    missing: list[str] = []
+    skipped: list[str] = []
+    for target in candidates:
+        existing = os.environ.get(f"TF_VAR_{target.existing_var}") if target.existing_var else None
+        if existing and existing != "null":
+            # The resource block has count = 0; the stack reads it as data.
+            continue
+        if target.address in counted:
+            target.address = f"{target.address}[0]"
+        if target.address in discovery.state:
+            skipped.append(target.address)
+            continue
+        if target.address in journal.imported:
+            print(
+                f"::warning::{journal.path} lists {target.address} as imported but state does "
+                "not track it; importing it again.",
+                file=sys.stderr,
+            )
+        if _is_missing(target.identifier):
+            missing.append(f"{target.description} (identifier not found)")
+            continue
+        targets.append(target)
+    return targets, missing, skipped
+
+
+def _render_import_blocks(targets: list[ImportTarget]) -> str:
+    blocks = [
+        f"import {{\n  to = {target.address}\n  id = {json.dumps(target.identifier)}\n}}\n"
+        for target in targets
+    ]
+    header = "# Generated by scripts/rebuild_tfstate.py; removed after the import run.\n"
+    return header + "\n" + "\n".join(blocks)
+
+
+def _unexpected_changes(runner: CommandRunner, plan_file: str) -> list[str]:
+    """Return plan changes other than pure imports (no-op actions)."""
+
+    shown = runner.terraform("terraform show -json", "show", "-json", plan_file, capture=True)
+    plan = json.loads(shown.stdout)
+    changes = []
+    for change in plan.get("resource_changes") or []:
+        actions = change.get("change", {}).get("actions", [])
+        if change.get("mode") == "managed" and actions != ["no-op"]:
+            changes.append(f"{change.get('address')}: {'/'.join(actions)}")
+    return changes
+
+
+def _import_with_plan(runner: CommandRunner, targets: list[ImportTarget], keep_file: bool) -> bool:
+    """Apply every import through one targeted plan.
+
+    Returns False, without applying, when the plan would do more than
+    import (for example update drifted attributes), so the caller can fall
+    back to ``terraform import``, which never changes infrastructure.
+    """
+
+    imports_file = Path(IMPORTS_FILE)
+    imports_file.write_text(_render_import_blocks(targets), encoding="utf-8")
+    try:
+        target_args = [f"-target={target.address}" for target in targets]
+        runner.terraform(
+            "terraform plan (imports)", "plan", "-input=false", f"-out={PLAN_FILE}", *target_args
+        )
+        changes = _unexpected_changes(runner, PLAN_FILE)
+        if changes:
+            print(
+                "::warning::The import plan would also change infrastructure; "
+                "falling back to terraform import:\n  " + "\n  ".join(changes),
+                file=sys.stderr,
+            )
+            return False
+        # A saved plan already carries its variables; Terraform rejects the
+        # -var flags the workflows inject through TF_CLI_ARGS_apply.
+        apply_env = {
+            key: value for key, value in os.environ.items() if key not in ("TF_CLI_ARGS", "TF_CLI_ARGS_apply")
+        }
+        runner.terraform("terraform apply (imports)", "apply", "-input=false", PLAN_FILE, env=apply_env)
+        return True
+    finally:
+        Path(PLAN_FILE).unlink(missing_ok=True)
+        if not keep_file:
+            imports_file.unlink(missing_ok=True)
+
+
+def _import_one_by_one(
+    runner: CommandRunner, targets: list[ImportTarget], journal: RebuildJournal
+) -> list[str]:
+    failed = []
+    for target in targets:
+        print(f"Importing {target.description}", file=sys.stderr)
+        result = runner.run(
+            f"terraform import {target.address}",
+            [runner.terraform_cli, "import", target.address, target.identifier or ""],
+            capture=False,
+        )
+        if result.returncode != 0:
+            failed.append(f"{target.description} (terraform import failed)")
+            continue
+        journal.record_import(target)
+    return failed
+
+
+# Reporting --------------------------------------------------------------------
+def _print_latency(records: list[CallRecord], report: Path | None) -> None:
+    print(f"\n{'call':<72} {'seconds':>9} {'exit':>5}", file=sys.stderr)
+    for record in records:
+        print(f"{record.label:<72} {record.seconds:>9.2f} {record.returncode:>5}", file=sys.stderr)
+    if report is not None:
+        report.write_text(
+            json.dumps([record.__dict__ for record in records], indent=2) + "\n", encoding="utf-8"
+        )
+
+
+def _print_summary(
+    discovery_s: float,
+    journal: RebuildJournal,
+    skipped: list[str],
+    imported: list[ImportTarget],
+    import_s: float,
+    missing: list[str],
+) -> None:
+    print("\nRebuild summary", file=sys.stderr)
+    print(
+        f"  discovery  {discovery_s:>7.2f}s  {len(journal.resumed)} lookups resumed from the journal",
+        file=sys.stderr,
+    )
+    print(f"  skipped    {len(skipped):>7}   already in state", file=sys.stderr)
+    for address in skipped:
+        print(f"    - {address}", file=sys.stderr)
+    print(f"  imported   {len(imported):>7}   in {import_s:.2f}s", file=sys.stderr)
+    for target in imported:
+        print(f"    - {target.address} = {target.identifier}", file=sys.stderr)
+    print(f"  missing    {len(missing):>7}", file=sys.stderr)
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help=f"Concurrent AWS/terraform lookups (default: {DEFAULT_MAX_WORKERS})",
+    )
+    parser.add_argument(
+        "--naming-file",
+        type=Path,
+        default=Path("naming.yml"),
+        help="Naming conventions file (default: naming.yml)",
+    )
+    parser.add_argument("--report", type=Path, help="Write per-call latencies as JSON to this path")
+    parser.add_argument(
+        "--journal",
+        type=Path,
+        default=Path(os.environ.get("REBUILD_JOURNAL") or DEFAULT_JOURNAL),
+        help=f"Checkpoint journal to resume from (default: $REBUILD_JOURNAL or {DEFAULT_JOURNAL})",
+    )
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="Discard the journal and start the rebuild from scratch",
+    )
+    parser.add_argument(
+        "--keep-import-file",
+        action="store_true",
+        help=f"Keep the generated {IMPORTS_FILE} after the run",
+    )
+    return parser.parse_args(argv)
+
+
+def _rebuild(args: argparse.Namespace, runner: CommandRunner) -> int:
+    cfg = _load_config(args.naming_file)
+    journal = RebuildJournal(
+        args.journal,
+        {
+            "backend": f"{cfg.backend_bucket}/{cfg.backend_key}",
+            "region": os.environ["AWS_REGION"],
+            "vpc_id": cfg.vpc_id,
+            "names": cfg.names,
+        },
+    )
+    if args.fresh:
+        journal.discard()
+    journal.load()
+    try:
+        start = time.perf_counter()
+        discovery = _discover(runner, cfg, journal, max(1, args.max_workers))
+        discovery_s = time.perf_counter() - start
+        targets, missing, skipped = _import_targets(
+            cfg, discovery, journal, _counted_resources(Path.cwd())
+        )
+        batched = False
+        imported: list[ImportTarget] = []
+        start = time.perf_counter()
+        if targets:
+            print(f"Importing {len(targets)} resources through one plan", file=sys.stderr)
+            batched = _import_with_plan(runner, targets, args.keep_import_file)
+            if batched:
+                for target in targets:
+                    journal.record_import(target)
+            else:
+                missing.extend(_import_one_by_one(runner, targets, journal))
+            imported = [target for target in targets if target.address in journal.imported]
+        _print_summary(discovery_s, journal, skipped, imported, time.perf_counter() - start, missing)
+
+        if missing:
+            print(
+                "One or more resources could not be imported. Skipping terraform refresh/plan.",
+                file=sys.stderr,
+            )
+            for description in missing:
+                print(f"  - {description}", file=sys.stderr)
+            return 0
+
+        if not batched:
+            # A plan-based import already refreshed the imported resources.
+            print("Refreshing state to verify imports", file=sys.stderr)
+            runner.terraform(
+                "terraform apply -refresh-only", "apply", "-refresh-only", "-input=false", "-auto-approve"
+            )
+        runner.terraform("terraform plan", "plan", "-input=false")
+        # Everything is in state; the next rebuild should start from scratch.
+        journal.discard()
+        return 0
+    finally:
+        _print_latency(runner.records, args.report)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv)
+    try:
+        terraform = _find_terraform()
+        aws = shutil.which("aws")
+        if not aws:
+            raise RebuildError("aws CLI is required")
+        runner = CommandRunner(aws, terraform, debug=os.environ.get("STATE_DEBUG") == "1")
+        return _rebuild(args, runner)
+    except RebuildError as exc:
+        _error(str(exc))
+        return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())